@@ -0,0 +1,487 @@
+"""Automatic fraud_alerts rows for flagged predictions, and the analysts' triage queue.
+
+Every prediction at or above the model threshold becomes an `open` row in the
+fraud_alerts table of `Banking _Fraud Detection.sql`.  Request handlers only
+append to an in-memory list; a writer thread inserts the list with one
+`executemany` every `flush_interval` seconds and keeps the rows for the next
+attempt while the database is down.
+
+The triage queue is a heap ordered like the review query in the SQL file
+(model_score DESC, alert_time DESC).  It is filled from the table, not from
+the requests: after each flush the writer reads the open alerts added since
+the last alert_id it saw, and every `resync_interval` it reloads all open
+alerts.  So with several API workers every heap converges on the same
+backlog, and a claim is settled by the database: the claimed ids are locked,
+checked to be still `open` and set to `under_review` in one transaction.  An
+alert another worker claimed first is dropped from the heap.
+
+The dump's fraud_alerts numbers alert_id by hand; ensure() makes it
+AUTO_INCREMENT and adds an index on (status, model_score, alert_time).
+A flagged decision sent without a transaction_id, or with one that is not
+an integer (a CSV batch), cannot be joined back to its transaction, so it
+is not queued; the two cases are counted as `skipped_no_transaction_id`
+and `invalid_transaction_ids`.  (The prediction log still has the row.)
+An alert whose transaction_id is not in `transactions` yet is stored with a
+NULL transaction_id rather than failing the foreign key for the whole batch.
+
+Run `python alerts.py` to compare the review query on SQLite with reading
+and claiming from the queue.
+"""
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+
+
+STATUSES = ["open", "under_review", "closed"]
+ALERT_FIELDS = ["alert_id", "transaction_id", "model_score", "alert_time", "alert_reason", "status"]
+
+MYSQL_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS fraud_alerts (
+        alert_id INT AUTO_INCREMENT PRIMARY KEY,
+        transaction_id INT,
+        model_score DECIMAL(5,2),
+        alert_time DATETIME,
+        alert_reason VARCHAR(255),
+        status VARCHAR(20),
+        INDEX idx_status_score (status, model_score, alert_time)
+    )
+"""
+
+SQLITE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS fraud_alerts (
+        alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id INTEGER,
+        model_score REAL,
+        alert_time TEXT,
+        alert_reason TEXT,
+        status TEXT
+    )
+"""
+SQLITE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_status_score ON fraud_alerts (status, model_score, alert_time)"
+
+# the customer columns of the review query, for the few alerts being claimed
+MYSQL_DETAILS_SQL = """
+    SELECT fa.alert_id, t.amount, t.txn_type, t.channel, t.is_international, c.customer_id, c.full_name
+    FROM fraud_alerts fa
+    LEFT JOIN transactions t ON fa.transaction_id = t.transaction_id
+    LEFT JOIN accounts a     ON t.account_id = a.account_id
+    LEFT JOIN customers c    ON a.customer_id = c.customer_id
+    WHERE fa.alert_id IN ({ids})
+"""
+DETAIL_FIELDS = ["amount", "txn_type", "channel", "is_international", "customer_id", "full_name"]
+
+
+def _transaction_id(value):
+    """int transaction id, or None for a missing or non-integer one."""
+    try:
+        number = int(value)
+        return None if isinstance(value, bool) or number != float(value) else number
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _time(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _entry(row):
+    """Heap entry for an (alert_id, transaction_id, model_score, alert_time, alert_reason) row."""
+    alert_id, transaction_id, score, at, reason = row
+    at = _time(at)
+    # heapq pops the smallest: highest score first, then the newest
+    return (-float(score), -at.timestamp(), int(alert_id), transaction_id, at, reason)
+
+
+def _alert(entry, status="open"):
+    score, _, alert_id, transaction_id, at, reason = entry
+    return {"alert_id": alert_id, "transaction_id": transaction_id, "model_score": -score,
+            "alert_time": at.isoformat(sep=" "), "alert_reason": reason, "status": status}
+
+
+# ---------- Storage ----------
+
+class AlertTable:
+    """The fraud_alerts table in MySQL or SQLite."""
+
+    def __init__(self, connect, dialect="mysql"):
+        # connect: callable returning a new DB-API connection
+        self.connect = connect
+        self.dialect = dialect
+        self._ready = False
+        self._check_transactions = False
+        self.insert_sql = (
+            "INSERT INTO fraud_alerts (transaction_id, model_score, alert_time, alert_reason, status) "
+            f"VALUES ({', '.join([self._p] * 4)}, 'open')"
+        )
+
+    @property
+    def _p(self):
+        return "?" if self.dialect == "sqlite" else "%s"
+
+    def _run(self, fn):
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            if not self._ready:
+                # created on first use so a database that is down at boot does not block startup
+                self.ensure(cur)
+                self._ready = True
+            result = fn(cur)
+            conn.commit()
+            cur.close()
+            return result
+        finally:
+            conn.close()
+
+    def ensure(self, cur):
+        """Create fraud_alerts, or bring the dump's table up to what the writer needs."""
+        if self.dialect == "sqlite":
+            cur.execute(SQLITE_TABLE_SQL)
+            cur.execute(SQLITE_INDEX_SQL)
+            return
+        cur.execute(MYSQL_TABLE_SQL)
+        cur.execute("SELECT EXTRA FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fraud_alerts' AND COLUMN_NAME = 'alert_id'")
+        row = cur.fetchone()
+        if row is not None and "auto_increment" not in (row[0] or "").lower():
+            cur.execute("ALTER TABLE fraud_alerts MODIFY alert_id INT NOT NULL AUTO_INCREMENT")
+        cur.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fraud_alerts'")
+        if "idx_status_score" not in [r[0] for r in cur.fetchall()]:
+            cur.execute("CREATE INDEX idx_status_score ON fraud_alerts (status, model_score, alert_time)")
+        cur.execute("SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fraud_alerts' "
+                    "AND REFERENCED_TABLE_NAME = 'transactions'")
+        row = cur.fetchone()
+        self._check_transactions = bool(row and row[0])
+
+    def insert(self, rows):
+        """Insert (transaction_id, model_score, alert_time, alert_reason) rows as open alerts."""
+        def write(cur):
+            nonlocal rows
+            known = {r[0] for r in rows if r[0] is not None}
+            if known and self._check_transactions:
+                cur.execute(f"SELECT transaction_id FROM transactions WHERE transaction_id IN "
+                            f"({', '.join([self._p] * len(known))})", list(known))
+                found = {r[0] for r in cur.fetchall()}
+                rows = [(r[0] if r[0] in found else None,) + tuple(r[1:]) for r in rows]
+            cur.executemany(self.insert_sql, rows)
+        self._run(write)
+
+    def open_alerts(self, after_id=None):
+        """(alert_id, transaction_id, model_score, alert_time, alert_reason) of open alerts."""
+        def fetch(cur):
+            query = ("SELECT alert_id, transaction_id, model_score, alert_time, alert_reason "
+                     "FROM fraud_alerts WHERE status = 'open'")
+            if after_id is None:
+                cur.execute(query)
+            else:
+                cur.execute(query + f" AND alert_id > {self._p}", (after_id,))
+            return cur.fetchall()
+        return self._run(fetch)
+
+    def claim(self, alert_ids, status="under_review"):
+        """Move the alerts that are still open to `status`; returns {alert_id: details}."""
+        ids = ", ".join([self._p] * len(alert_ids))
+
+        def update(cur):
+            if self.dialect == "sqlite":
+                # take the write lock before reading, like SELECT ... FOR UPDATE
+                cur.execute("BEGIN IMMEDIATE")
+                lock = ""
+            else:
+                lock = " FOR UPDATE"
+            cur.execute(f"SELECT alert_id FROM fraud_alerts WHERE alert_id IN ({ids}) AND status = 'open'{lock}",
+                        list(alert_ids))
+            claimed = [r[0] for r in cur.fetchall()]
+            if not claimed:
+                return {}
+            cur.execute(f"UPDATE fraud_alerts SET status = {self._p} WHERE alert_id IN "
+                        f"({', '.join([self._p] * len(claimed))})", [status] + claimed)
+            if self.dialect == "sqlite":
+                return {alert_id: {} for alert_id in claimed}
+            cur.execute(MYSQL_DETAILS_SQL.format(ids=", ".join(["%s"] * len(claimed))), claimed)
+            return {r[0]: dict(zip(DETAIL_FIELDS, r[1:])) for r in cur.fetchall()}
+        return self._run(update)
+
+    def set_status(self, alert_id, status):
+        """Set one alert's status; returns False when there is no such alert."""
+        def update(cur):
+            cur.execute(f"UPDATE fraud_alerts SET status = {self._p} WHERE alert_id = {self._p}", (status, alert_id))
+            return cur.rowcount > 0
+        return self._run(update)
+
+
+def sqlite_table(path):
+    import sqlite3
+    return AlertTable(lambda: sqlite3.connect(path), "sqlite")
+
+
+def mysql_table(**connect_kwargs):
+    import mysql.connector
+    return AlertTable(lambda: mysql.connector.connect(**connect_kwargs), "mysql")
+
+
+# ---------- Writer and triage queue ----------
+
+class AlertQueue:
+    """Buffers new alerts for the table and serves open ones highest score first."""
+
+    def __init__(self, table, flush_interval=1.0, resync_interval=60.0, max_pending=100000):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.resync_interval = resync_interval
+        self.max_pending = max_pending
+        self._stats = {"created": 0, "inserted": 0, "flushes": 0, "write_errors": 0, "dropped": 0,
+                       "claimed": 0, "lost_claims": 0, "syncs": 0, "sync_errors": 0,
+                       "skipped_no_transaction_id": 0, "invalid_transaction_ids": 0}
+        self._start_worker()
+        # threads do not survive fork (gunicorn --preload): start a fresh one in the child
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    def add(self, transaction_id, probability, reason, at=None):
+        """Queue one flagged prediction for insertion; never waits on the database."""
+        self.add_many([transaction_id], [probability], [reason], at)
+
+    def add_many(self, transaction_ids, probabilities, reasons, at=None):
+        """Queue flagged predictions; ones without an integer transaction_id are counted and skipped."""
+        at = (at or datetime.now()).replace(microsecond=0)
+        ids = [_transaction_id(t) for t in transaction_ids]
+        missing = sum(t is None for t in transaction_ids)
+        invalid = sum(t is not None and i is None for t, i in zip(transaction_ids, ids))
+        rows = [(i, round(float(p), 2), at, (r or "")[:255])
+                for i, p, r in zip(ids, probabilities, reasons) if i is not None]
+        with self._lock:
+            self._pending.extend(rows)
+            self._stats["created"] += len(rows)
+            self._stats["skipped_no_transaction_id"] += missing
+            self._stats["invalid_transaction_ids"] += invalid
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                # database down for a long time: keep the newest alerts
+                del self._pending[:overflow]
+                self._stats["dropped"] += overflow
+
+    def flush(self):
+        """Insert the pending alerts now; on failure they are kept for the next attempt."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            self.table.insert(rows)
+        except Exception as e:
+            print("Alert write failed, keeping alerts for the next attempt:", e)
+            with self._lock:
+                self._pending[:0] = rows
+                self._stats["write_errors"] += 1
+            return 0
+        with self._lock:
+            self._stats["inserted"] += len(rows)
+            self._stats["flushes"] += 1
+        return len(rows)
+
+    def sync(self, full=False):
+        """Pull open alerts into the heap: new ones since the last seen id, or all (full)."""
+        # ids claimed or closed while the query runs: it may still see them as open
+        taken = set()
+        with self._lock:
+            self._taken.append(taken)
+        try:
+            rows = self.table.open_alerts(None if full else self._last_id)
+        except Exception as e:
+            print("Alert queue sync failed:", e)
+            with self._lock:
+                self._taken.remove(taken)
+                self._stats["sync_errors"] += 1
+            return
+        entries = [_entry(row) for row in rows]
+        with self._lock:
+            self._taken.remove(taken)
+            entries = [e for e in entries if e[2] not in taken]
+            if full:
+                self._heap = entries
+                heapq.heapify(self._heap)
+                self._queued = {e[2] for e in entries}
+            else:
+                for entry in entries:
+                    if entry[2] not in self._queued:
+                        heapq.heappush(self._heap, entry)
+                        self._queued.add(entry[2])
+            if entries:
+                self._last_id = max(self._last_id or 0, max(e[2] for e in entries))
+            self._stats["syncs"] += 1
+
+    def peek(self, n=20):
+        """The next n open alerts, without claiming them."""
+        with self._lock:
+            heap = self._heap
+            top, frontier = [], [(heap[0], 0)] if heap else []
+            # walk the heap from its root: n log n, not a scan of the whole backlog
+            while frontier and len(top) < n:
+                entry, i = heapq.heappop(frontier)
+                top.append(entry)
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+        return [_alert(e) for e in top]
+
+    def claim(self, n=10, status="under_review"):
+        """Take the next n open alerts; each is handed to exactly one caller across workers."""
+        claimed = []
+        while len(claimed) < n:
+            with self._lock:
+                batch = [heapq.heappop(self._heap) for _ in range(min(n - len(claimed), len(self._heap)))]
+                self._queued.difference_update(e[2] for e in batch)
+                self._mark_taken(e[2] for e in batch)
+            if not batch:
+                break
+            try:
+                details = self.table.claim([e[2] for e in batch], status)
+            except Exception:
+                with self._lock:
+                    for entry in batch:
+                        heapq.heappush(self._heap, entry)
+                        self._queued.add(entry[2])
+                raise
+            taken = [dict(_alert(e, status), **details[e[2]]) for e in batch if e[2] in details]
+            claimed.extend(taken)
+            with self._lock:
+                self._stats["claimed"] += len(taken)
+                # already claimed or closed by someone else
+                self._stats["lost_claims"] += len(batch) - len(taken)
+        return claimed
+
+    def set_status(self, alert_id, status):
+        """Change one alert's status; reopened alerts come back at the next sync."""
+        found = self.table.set_status(alert_id, status)
+        if found and status != "open":
+            with self._lock:
+                self._mark_taken([alert_id])
+                if alert_id in self._queued:
+                    self._heap = [e for e in self._heap if e[2] != alert_id]
+                    heapq.heapify(self._heap)
+                    self._queued.discard(alert_id)
+        elif found:
+            with self._lock:
+                # below the last seen id, so only a full sync would find it
+                self._last_id = min(self._last_id or 0, alert_id - 1)
+        return found
+
+    def close(self):
+        """Stop the writer and insert what is still pending."""
+        self._stop.set()
+        self._worker.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = len(self._pending)
+            snapshot["open_in_queue"] = len(self._heap)
+        return snapshot
+
+    def _mark_taken(self, alert_ids):
+        """Tell the syncs in progress to leave these ids out (caller holds the lock)."""
+        alert_ids = list(alert_ids)
+        for taken in self._taken:
+            taken.update(alert_ids)
+
+    # ---------- worker ----------
+
+    def _start_worker(self):
+        self._pending = []
+        self._heap = []
+        self._queued = set()
+        self._taken = []            # one set per sync in progress
+        self._last_id = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="alert-writer", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        last_resync = float("-inf")
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            # a full reload also drops alerts claimed or closed elsewhere
+            full = time.monotonic() - last_resync >= self.resync_interval
+            self.sync(full=full)
+            if full:
+                last_resync = time.monotonic()
+
+
+if __name__ == "__main__":
+    import sqlite3
+    import tempfile
+
+    import numpy as np
+
+    n_alerts, n_transactions = 200000, 1000000
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE customers (customer_id INTEGER PRIMARY KEY, full_name TEXT);
+            CREATE TABLE accounts (account_id INTEGER PRIMARY KEY, customer_id INTEGER);
+            CREATE TABLE transactions (transaction_id INTEGER PRIMARY KEY, account_id INTEGER, amount REAL,
+                                       txn_type TEXT, channel TEXT, is_international INTEGER);
+        """)
+        conn.executemany("INSERT INTO customers VALUES (?, ?)", ((i, f"Customer {i}") for i in range(50000)))
+        conn.executemany("INSERT INTO accounts VALUES (?, ?)", ((i, i % 50000) for i in range(80000)))
+        conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, 'UPI', 'mobile', 0)",
+                         ((i, i % 80000, 1000.0) for i in range(n_transactions)))
+        conn.commit()
+
+        table = sqlite_table(path)
+        queue = AlertQueue(table, flush_interval=3600)
+        txn_ids = rng.choice(n_transactions, n_alerts, replace=False).tolist()
+        scores = rng.uniform(0.4, 1.0, n_alerts).tolist()
+        start = time.perf_counter()
+        for t, p in zip(txn_ids, scores):
+            queue.add(t, p, "High amount at late hour")
+        add_us = (time.perf_counter() - start) / n_alerts * 1e6
+        start = time.perf_counter()
+        queue.flush()
+        insert_rate = n_alerts / (time.perf_counter() - start)
+        start = time.perf_counter()
+        queue.sync(full=True)
+        sync_ms = (time.perf_counter() - start) * 1000
+
+        review = """
+            SELECT fa.alert_id, fa.model_score, fa.alert_time, fa.alert_reason, fa.status,
+                   t.transaction_id, t.amount, t.txn_type, t.channel, t.is_international,
+                   c.customer_id, c.full_name
+            FROM fraud_alerts fa
+            JOIN transactions t ON fa.transaction_id = t.transaction_id
+            JOIN accounts a     ON t.account_id = a.account_id
+            JOIN customers c    ON a.customer_id = c.customer_id
+            WHERE fa.status IN ('open','under_review')
+            ORDER BY fa.model_score DESC, fa.alert_time DESC
+        """
+
+        def timed(fn, repeat):
+            fn()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            return (time.perf_counter() - start) / repeat * 1000
+
+        full_ms = timed(lambda: conn.execute(review).fetchall(), 5)
+        top_ms = timed(lambda: conn.execute(review + " LIMIT 20").fetchall(), 5)
+        peek_ms = timed(lambda: queue.peek(20), 200)
+        claim_ms = timed(lambda: queue.claim(10), 200)
+        queue.close()
+        conn.close()
+
+        print(f"{n_alerts:,} open alerts, {n_transactions:,} transactions (SQLite)")
+        print(f"  add() per flagged prediction     {add_us:10.2f} us")
+        print(f"  bulk insert                      {insert_rate:10,.0f} alerts/s")
+        print(f"  full queue load from the table   {sync_ms:10.1f} ms")
+        print(f"  review query (JOIN + ORDER BY)   {full_ms:10.2f} ms")
+        print(f"  review query, top 20             {top_ms:10.2f} ms")
+        print(f"  queue.peek(20)                   {peek_ms:10.3f} ms")
+        print(f"  queue.claim(10)                  {claim_ms:10.3f} ms")
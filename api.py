@@ -1,805 +1,882 @@
-from fastapi import FastAPI, Form
-from fastapi.responses import HTMLResponse
+import time
+_startup_clock = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated
+from fastapi import FastAPI, Form, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hmac
+import io
+import os
+import threading
 import pandas as pd
-from joblib import load
 
 # NEW:
 import mysql.connector
-from datetime import datetime
 
-# ---------- Load model + threshold ----------
-bundle = load("fraud_rf_pipeline.joblib")
-model = bundle["model"]
-threshold = bundle["threshold"]
+from alerts import STATUSES as ALERT_STATUSES, AlertQueue, AlertTable
+from alerts import sqlite_table as sqlite_alert_table
+from cache import LocalBackend, PredictionCache, RedisBackend
+from drift import DriftMonitor, load_baseline
+from feature_store import AccountFeatureStore
+from metrics import METRICS, SlowRequestSampler
+from parallel import ParallelScorer
+from prediction_log import MySQLSink, PredictionLogWriter, SQLiteSink
+from prediction_store import ensure_schema
+from reasons import REASON_RULES, SAFE_SHIFT
+from rollups import DIMENSIONS, GRANULARITIES, SOURCES, RollupAggregator, RollupTable
+from rollups import sqlite_table as sqlite_rollup_table
+from registry import ModelRegistry, load_version
+from schema import SchemaError, Transaction, error_detail, parse_transaction, parse_transaction_batch
+from scoring import AdmissionLimit, ScoringOverloaded, ScoringService, TooManyRequests, ValidationError
+from ui import FORM_PAGE, RESULT_CSS, render_result
+from velocity import VelocityEngine
+
+# seconds spent in each startup stage, in order (GET /metrics/startup)
+STARTUP_TIMINGS = {}
+
+
+def mark_startup(stage):
+    global _startup_clock
+    now = time.perf_counter()
+    STARTUP_TIMINGS[stage] = round(now - _startup_clock, 4)
+    _startup_clock = now
+
+
+mark_startup("imports")
+
+# ---------- Model location ----------
+MODEL_PATH = os.getenv("FRAUD_MODEL_PATH", "fraud_rf_pipeline.joblib")
+
+# Memory-map the bundle's arrays while loading it; sklearn still copies the tree
+# nodes into its own buffers on unpickle, so each process holds its own model
+MODEL_MMAP = os.getenv("FRAUD_MODEL_MMAP", "1") == "1"
+
+# Reload the bundle when MODEL_PATH changes on disk (0 = off); every worker polls on its own
+MODEL_WATCH_SECONDS = float(os.getenv("FRAUD_MODEL_WATCH_SECONDS", "0"))
+
+# Candidate bundle scored on a sample of live traffic, off the request path
+SHADOW_MODEL_PATH = os.getenv("FRAUD_SHADOW_MODEL_PATH", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("FRAUD_SHADOW_SAMPLE_RATE", "0.05"))
+
+# Token for the /models admin endpoints (unset = endpoints disabled)
+ADMIN_TOKEN = os.getenv("FRAUD_ADMIN_TOKEN", "")
+
+# Upper bound on records accepted by /predict/batch in one request
+MAX_BATCH_SIZE = int(os.getenv("FRAUD_MAX_BATCH_SIZE", "100000"))
+
+# Compiled NumPy inference path (set FRAUD_FAST_PATH=0 to score with sklearn)
+FAST_PATH_ENABLED = os.getenv("FRAUD_FAST_PATH", "1") == "1"
+
+# Prediction logging: "mysql", "sqlite" (local stand-in) or "off"
+LOG_SINK = os.getenv("FRAUD_LOG_SINK", "mysql")
+LOG_SQLITE_PATH = os.getenv("FRAUD_LOG_SQLITE_PATH", "fraud_predictions.db")
+LOG_BATCH_SIZE = int(os.getenv("FRAUD_LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.getenv("FRAUD_LOG_FLUSH_SECONDS", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("FRAUD_LOG_QUEUE_SIZE", "10000"))
+LOG_SPILL_PATH = os.getenv("FRAUD_LOG_SPILL_PATH", "prediction_log_spill.ndjson")
+# past this size rows that cannot be written are dropped (and counted) instead of spilled
+LOG_SPILL_MAX_MB = float(os.getenv("FRAUD_LOG_SPILL_MAX_MB", "512"))
+
+# Entries in the feature-attribution LRU cache (?explain=true)
+EXPLAIN_CACHE_SIZE = int(os.getenv("FRAUD_EXPLAIN_CACHE_SIZE", "10000"))
+
+# Worker processes for large /predict/batch requests (0 = score in the API process)
+SCORING_PROCESSES = int(os.getenv("FRAUD_SCORING_PROCESSES", "0"))
+PARALLEL_MIN_ROWS = int(os.getenv("FRAUD_PARALLEL_MIN_ROWS", "10000"))
+
+# Cache of probabilities for repeated identical transactions: "off", "local" or "redis"
+CACHE_BACKEND = os.getenv("FRAUD_CACHE", "off")
+CACHE_MAX_ENTRIES = int(os.getenv("FRAUD_CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_SECONDS = float(os.getenv("FRAUD_CACHE_TTL_SECONDS", "300"))
+CACHE_REDIS_URL = os.getenv("FRAUD_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Fraud-rate rollups fed by every decision: "off", "mysql" or "sqlite" (the FRAUD_LOG_SQLITE_PATH file)
+ROLLUPS_SINK = os.getenv("FRAUD_ROLLUPS", "off")
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("FRAUD_ROLLUP_FLUSH_SECONDS", "5"))
+ROLLUP_MINUTE_RETENTION_HOURS = float(os.getenv("FRAUD_ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+
+# fraud_alerts rows for flagged decisions + the /alerts triage queue: "off", "mysql" or "sqlite"
+ALERTS_SINK = os.getenv("FRAUD_ALERTS", "off")
+ALERT_FLUSH_INTERVAL = float(os.getenv("FRAUD_ALERT_FLUSH_SECONDS", "1.0"))
+ALERT_RESYNC_INTERVAL = float(os.getenv("FRAUD_ALERT_RESYNC_SECONDS", "60"))
+
+# Per-account feature store bootstrap: "" (off), "mysql", or a .sql dump / .npz / .csv snapshot
+FEATURE_STORE_SOURCE = os.getenv("FRAUD_FEATURE_STORE", "")
+
+# Per-account velocity windows (5 min / 1 h / 24 h) returned with account_id requests:
+# "" (off), "memory" (start empty) or "mysql" (warm from the last 24 h of transactions)
+VELOCITY_SOURCE = os.getenv("FRAUD_VELOCITY", "")
+# past this many accounts the least recently seen tenth is evicted (106 bytes each)
+VELOCITY_MAX_ACCOUNTS = int(os.getenv("FRAUD_VELOCITY_MAX_ACCOUNTS", "10000000"))
+
+# Drift of live scores / features against <bundle>.baseline.json, over a sliding window (opt-in)
+DRIFT_ENABLED = os.getenv("FRAUD_DRIFT", "0") == "1"
+# baselines with fewer held-out rows than this get no PSI / KS (too noisy to compare with)
+DRIFT_MIN_BASELINE_ROWS = int(os.getenv("FRAUD_DRIFT_MIN_BASELINE_ROWS", "1000"))
+DRIFT_WINDOW_HOURS = float(os.getenv("FRAUD_DRIFT_WINDOW_HOURS", "24"))
+DRIFT_SLICE_MINUTES = float(os.getenv("FRAUD_DRIFT_SLICE_MINUTES", "60"))
+
+# Micro-batching of single-record requests (/predict, /ui/predict)
+MICROBATCH_ENABLED = os.getenv("FRAUD_MICROBATCH", "1") == "1"
+MICROBATCH_WINDOW_MS = float(os.getenv("FRAUD_BATCH_WINDOW_MS", "2"))
+MICROBATCH_MAX_SIZE = int(os.getenv("FRAUD_BATCH_MAX_SIZE", "64"))
+
+# Threads running inference off the event loop (batches, attributions, unbatched singles);
+# tree traversal releases the GIL. For process-based scoring of big batches see
+# FRAUD_SCORING_PROCESSES / FRAUD_PARALLEL_MIN_ROWS.
+INFERENCE_THREADS = int(os.getenv("FRAUD_INFERENCE_THREADS", str(os.cpu_count() or 1)))
+
+# Admission control: requests in flight beyond these get 429 at once (0 = no limit)
+MAX_INFLIGHT = int(os.getenv("FRAUD_MAX_INFLIGHT", "1000"))
+MAX_INFLIGHT_BATCHES = int(os.getenv("FRAUD_MAX_INFLIGHT_BATCHES", str(2 * INFERENCE_THREADS)))
+
+# Prometheus /metrics stage histograms and counters (component stats are exported regardless)
+METRICS_ENABLED = os.getenv("FRAUD_METRICS", "0") == "1"
+
+# Sampling profiler: trace this fraction of requests, keep stacks of those slower than SLOW_MS
+PROFILE_SAMPLE_RATE = float(os.getenv("FRAUD_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("FRAUD_PROFILE_SLOW_MS", "250"))
+
+# Longest pause between attempts to create the MySQL table in the background
+DB_INIT_MAX_RETRY_SECONDS = float(os.getenv("FRAUD_DB_INIT_MAX_RETRY_SECONDS", "60"))
+
+# Monthly fraud_predictions partitions kept ready ahead of the clock (added at startup)
+DB_PARTITION_MONTHS_AHEAD = int(os.getenv("FRAUD_DB_PARTITION_MONTHS_AHEAD", "3"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # MySQL may be down at boot: create the table and bootstrap from it in the background
+    # instead of blocking import
+    stop = threading.Event()
+    if LOG_SINK == "mysql":
+        retry_in_background(stop, "db-init", init_db)
+    if FEATURE_STORE_SOURCE == "mysql":
+        retry_in_background(stop, "feature-store-init", install_feature_store)
+    if VELOCITY_SOURCE == "mysql":
+        retry_in_background(stop, "velocity-init", install_velocity_engine)
+    if MODEL_WATCH_SECONDS > 0:
+        registry.watch(MODEL_WATCH_SECONDS)
+    yield
+    stop.set()
+    registry.close()
+    inference_executor.shutdown(wait=True)
+    flush_prediction_log()
+
+
+app = FastAPI(title="Fraud Detection API", version="1.0.0", lifespan=lifespan)
+
+METRICS.enabled = METRICS_ENABLED
+slow_sampler = SlowRequestSampler(PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS) if PROFILE_SAMPLE_RATE > 0 else None
+
+
+# ---------- Model registry ----------
+
+# process pool for big batches, shared by every model version
+parallel_scorer = ParallelScorer(
+    processes=SCORING_PROCESSES,
+    min_rows=PARALLEL_MIN_ROWS
+) if SCORING_PROCESSES >= 2 else None
+
+
+def load_model_version(path, threshold=None, timings=None):
+    """Bundle -> ModelVersion with this deployment's fast-path / mmap / cache settings."""
+    return load_version(
+        path,
+        threshold,
+        mmap=MODEL_MMAP,
+        fast_path=FAST_PATH_ENABLED,
+        explain_cache_size=EXPLAIN_CACHE_SIZE,
+        parallel=parallel_scorer,
+        timings=timings
+    )
+
 
-app = FastAPI(title="Fraud Detection API", version="1.0.0")
+registry = ModelRegistry(load_model_version(MODEL_PATH, timings=STARTUP_TIMINGS), loader=load_model_version)
+_startup_clock = time.perf_counter()
+
+if SHADOW_MODEL_PATH:
+    registry.start_shadow(SHADOW_MODEL_PATH, SHADOW_SAMPLE_RATE)
+    mark_startup("shadow")
 
 
 # ---------- MySQL logging helpers ----------
 
+DB_CONFIG = dict(
+    host="host name ",
+    user="root",                 # change if your user is different
+    password="your_password",    # <-- PUT YOUR REAL PASSWORD HERE
+    database="banking_fraud_detection"
+)
+
 def get_db_connection():
     """Create and return a new MySQL connection."""
-    return mysql.connector.connect(
-        host="host name ",
-        user="root",                 # change if your user is different
-        password="your_password",    # <-- PUT YOUR REAL PASSWORD HERE
-        database="banking_fraud_detection"
-    )
+    return mysql.connector.connect(**DB_CONFIG)
+
+db_ready = threading.Event()
+
 
 def init_db():
-    """Create fraud_predictions table if it does not exist."""
+    """Create the managed fraud_predictions table (BIGINT key, indexes, monthly partitions)."""
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS fraud_predictions (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            created_at DATETIME,
-            amount DOUBLE,
-            balance DOUBLE,
-            hour INT,
-            day_of_week INT,
-            is_weekend TINYINT,
-            is_international_flag TINYINT,
-            age INT,
-            txns_per_account INT,
-            avg_amount_account DOUBLE,
-            txn_type VARCHAR(20),
-            channel VARCHAR(20),
-            account_type VARCHAR(20),
-            gender VARCHAR(5),
-            city VARCHAR(50),
-            state VARCHAR(50),
-            fraud_probability DOUBLE,
-            fraud_prediction TINYINT,
-            reason_text VARCHAR(255)
-        )
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def log_prediction_to_db(
-    amount, balance, hour, day_of_week,
-    is_weekend, is_international_flag, age,
-    txns_per_account, avg_amount_account,
-    txn_type, channel, account_type, gender,
-    city, state,
-    fraud_probability, fraud_prediction,
-    reason_text
-):
-    """Insert one prediction into fraud_predictions table."""
+    try:
+        ensure_schema(conn, "mysql", months_ahead=DB_PARTITION_MONTHS_AHEAD)
+    finally:
+        conn.close()
+    db_ready.set()
+
+
+def retry_in_background(stop, name, fn):
+    """Run fn on a daemon thread until it succeeds, backing off between attempts."""
+    def run():
+        delay = 1.0
+        while not stop.is_set():
+            try:
+                fn()
+                return
+            except Exception as e:
+                print(f"{name} failed, retrying in {delay:.0f}s:", e)
+                stop.wait(delay)
+                delay = min(delay * 2, DB_INIT_MAX_RETRY_SECONDS)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+def create_prediction_logger():
+    """Background writer for the configured sink (None when logging is off)."""
+    if LOG_SINK == "off":
+        return None
+    if LOG_SINK == "sqlite":
+        sink = SQLiteSink(LOG_SQLITE_PATH)
+    else:
+        sink = MySQLSink(**DB_CONFIG)
+    return PredictionLogWriter(
+        sink,
+        max_queue_size=LOG_QUEUE_SIZE,
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        spill_path=LOG_SPILL_PATH,
+        max_spill_bytes=int(LOG_SPILL_MAX_MB * 1024 * 1024)
+    )
+
+prediction_logger = create_prediction_logger()
+
+def create_feature_store():
+    """Load a snapshot-backed store now; a MySQL one is installed by the lifespan (None until then)."""
+    if not FEATURE_STORE_SOURCE or FEATURE_STORE_SOURCE == "mysql":
+        return None
+    try:
+        store = AccountFeatureStore.from_snapshot(FEATURE_STORE_SOURCE)
+    except Exception as e:
+        print("Feature store bootstrap failed, account_id lookups disabled:", e)
+        return None
+    print(f"Feature store loaded {len(store)} accounts from {FEATURE_STORE_SOURCE}")
+    return store
+
+
+def install_feature_store():
+    """Bulk-load per-account aggregates from MySQL and start using them."""
+    global feature_store
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO fraud_predictions (
-            created_at,
-            amount, balance, hour, day_of_week,
-            is_weekend, is_international_flag, age,
-            txns_per_account, avg_amount_account,
-            txn_type, channel, account_type, gender,
-            city, state,
-            fraud_probability, fraud_prediction, reason_text
-        )
-        VALUES (
-            %s,
-            %s, %s, %s, %s,
-            %s, %s, %s,
-            %s, %s,
-            %s, %s, %s, %s,
-            %s, %s,
-            %s, %s, %s
-        )
-    """, (
-        datetime.now(),
-        amount, balance, hour, day_of_week,
-        is_weekend, is_international_flag, age,
-        txns_per_account, avg_amount_account,
-        txn_type, channel, account_type, gender,
-        city, state,
-        fraud_probability, fraud_prediction,
-        reason_text[:250]  # limit text length for safety
-    ))
-    conn.commit()
-    cur.close()
-    conn.close()
-
-# call once when app starts
-init_db()
+    try:
+        store = AccountFeatureStore.from_mysql(conn)
+    finally:
+        conn.close()
+    feature_store = scorer.feature_store = store
+    print(f"Feature store loaded {len(store)} accounts from MySQL")
+
+
+feature_store = create_feature_store()
+mark_startup("feature_store")
+
+def create_velocity_engine():
+    """Empty-window engine; a MySQL-warmed one is installed by the lifespan (None until then)."""
+    if not VELOCITY_SOURCE or VELOCITY_SOURCE == "mysql":
+        return None
+    return VelocityEngine(max_accounts=VELOCITY_MAX_ACCOUNTS)
+
+
+def install_velocity_engine():
+    """Warm the windows from the last 24 h of transactions and start returning velocity features."""
+    global velocity_engine
+    conn = get_db_connection()
+    try:
+        engine = VelocityEngine.from_mysql(conn, max_accounts=VELOCITY_MAX_ACCOUNTS)
+    finally:
+        conn.close()
+    velocity_engine = scorer.velocity = engine
+    print(f"Velocity windows warmed for {len(engine)} accounts")
+
+
+velocity_engine = create_velocity_engine()
+mark_startup("velocity")
+
+def create_drift_monitor():
+    """Drift monitor against the active bundle's baseline; follows model swaps (None when off)."""
+    if not DRIFT_ENABLED:
+        return None
+    active = registry.active
+    baseline = load_baseline(active.path)
+    if baseline is None:
+        print("No drift baseline next to", active.path, "- run `python drift.py baseline` to create one")
+    elif baseline["rows"] < DRIFT_MIN_BASELINE_ROWS:
+        print(f"Drift baseline of {active.path} has only {baseline['rows']} rows - PSI / KS are not reported")
+    slice_seconds = DRIFT_SLICE_MINUTES * 60
+    monitor = DriftMonitor(baseline, active.version, slice_seconds=slice_seconds,
+                           slices=max(1, round(DRIFT_WINDOW_HOURS * 3600 / slice_seconds)),
+                           min_baseline_rows=DRIFT_MIN_BASELINE_ROWS)
+    registry.add_listener(monitor.on_model_swap)
+    return monitor
+
+
+drift_monitor = create_drift_monitor()
+
+def create_prediction_cache():
+    """Prediction cache for the configured backend (None when off or unavailable)."""
+    if CACHE_BACKEND == "off":
+        return None
+    try:
+        if CACHE_BACKEND == "redis":
+            backend = RedisBackend(CACHE_REDIS_URL, ttl_seconds=CACHE_TTL_SECONDS)
+        else:
+            backend = LocalBackend(CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS)
+    except ImportError as e:
+        print("Prediction cache disabled:", e)
+        return None
+    return PredictionCache(backend)
+
+
+prediction_cache = create_prediction_cache()
+
+def create_rollups():
+    """Rollup aggregator for the configured database (None when off)."""
+    if ROLLUPS_SINK == "off":
+        return None
+    if ROLLUPS_SINK == "sqlite":
+        table = sqlite_rollup_table(LOG_SQLITE_PATH)
+    else:
+        table = RollupTable(get_db_connection, "mysql")
+    return RollupAggregator(table, ROLLUP_FLUSH_INTERVAL, ROLLUP_MINUTE_RETENTION_HOURS)
+
+
+rollups = create_rollups()
+
+def create_alerts():
+    """Alert writer and triage queue for the configured database (None when off)."""
+    if ALERTS_SINK == "off":
+        return None
+    if ALERTS_SINK == "sqlite":
+        table = sqlite_alert_table(LOG_SQLITE_PATH)
+    else:
+        table = AlertTable(get_db_connection, "mysql")
+    return AlertQueue(table, ALERT_FLUSH_INTERVAL, ALERT_RESYNC_INTERVAL)
+
+
+alerts = create_alerts()
+
+# CPU-bound model work runs here, so it never waits behind other threadpool jobs
+inference_executor = ThreadPoolExecutor(INFERENCE_THREADS, thread_name_prefix="inference")
+
+# single-record endpoints and batch endpoints are admitted separately
+single_admission = AdmissionLimit(MAX_INFLIGHT, "requests")
+batch_admission = AdmissionLimit(MAX_INFLIGHT_BATCHES, "batch requests")
+
+# the one place every endpoint validates, scores, explains and logs
+scorer = ScoringService(
+    registry,
+    logger=prediction_logger,
+    microbatch=dict(
+        max_batch_size=MICROBATCH_MAX_SIZE,
+        max_wait_ms=MICROBATCH_WINDOW_MS
+    ) if MICROBATCH_ENABLED else None,
+    feature_store=feature_store,
+    cache=prediction_cache,
+    executor=inference_executor,
+    rollups=rollups,
+    alerts=alerts,
+    velocity=velocity_engine,
+    drift=drift_monitor
+)
+mark_startup("service")
+
+scorer.warm_up()
+mark_startup("warmup")
+print("Startup: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in STARTUP_TIMINGS.items()))
+
+
+@app.exception_handler(ValidationError)
+def validation_error_handler(request, exc):
+    return JSONResponse(status_code=422, content={"detail": exc.detail})
+
+
+@app.exception_handler(ScoringOverloaded)
+def overloaded_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(TooManyRequests)
+def too_many_requests_handler(request, exc):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+# ---------- Metrics ----------
+
+if METRICS_ENABLED or slow_sampler is not None:
+    # only installed when needed, so a default deployment pays nothing per request
+    @app.middleware("http")
+    async def observe_request(request: Request, call_next):
+        trace = slow_sampler.start() if slow_sampler is not None else None
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            route = request.scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            METRICS.observe_request(path, status, elapsed)
+            if trace is not None:
+                slow_sampler.finish(trace, path, elapsed)
+
+
+def component_metrics():
+    """Stats the batcher, log writer, cache, admission limits and registry keep anyway."""
+    active = registry.active
+    yield "model_info", "gauge", "Active model version", [({"version": active.version}, 1)]
+    yield "model_threshold", "gauge", "Decision threshold of the active model", [({}, active.threshold)]
+    if scorer.batcher is not None:
+        stats = scorer.batcher.stats()
+        yield "batcher_queue_depth", "gauge", "Records waiting for the micro-batcher", [({}, stats["queue_depth"])]
+        yield "batcher_batches_total", "counter", "Micro-batches scored", [({}, stats["batches"])]
+        yield "batcher_records_total", "counter", "Records scored by the micro-batcher", [({}, stats["records"])]
+        yield "batcher_rejected_total", "counter", "Records rejected with a full queue", [({}, stats["rejected"])]
+    if prediction_logger is not None:
+        stats = prediction_logger.stats()
+        yield "log_queue_depth", "gauge", "Prediction rows waiting for the writer", [({}, stats["queue_depth"])]
+        yield "log_rows_written_total", "counter", "Prediction rows written to the sink", [({}, stats["written"])]
+        yield "log_rows_spilled_total", "counter", "Prediction rows spilled to disk", [({}, stats["spilled"])]
+        yield "log_spill_corrupt_total", "counter", "Undecodable spill lines skipped on replay", [({}, stats["spill_corrupt"])]
+        yield "log_spill_dropped_total", "counter", "Prediction rows dropped with the spill file full", [({}, stats["spill_dropped"])]
+        yield "log_spill_bytes", "gauge", "Size of the prediction log spill file", [({}, stats["spill_bytes"])]
+        yield "log_write_errors_total", "counter", "Failed prediction log writes", [({}, stats["write_errors"])]
+    if rollups is not None:
+        stats = rollups.stats()
+        yield "rollup_pending_rows", "gauge", "Rollup rows waiting to be flushed", [({}, stats["pending_rows"])]
+        yield "rollup_flush_errors_total", "counter", "Failed rollup flushes", [({}, stats["flush_errors"])]
+    if alerts is not None:
+        stats = alerts.stats()
+        yield "alert_queue_depth", "gauge", "Open alerts in the triage queue", [({}, stats["open_in_queue"])]
+        yield "alert_pending", "gauge", "Alerts waiting to be inserted", [({}, stats["pending"])]
+        yield "alerts_created_total", "counter", "Alerts raised for flagged decisions", [({}, stats["created"])]
+        yield "alerts_skipped_total", "counter", "Flagged decisions without a usable transaction_id", [
+            ({"reason": "missing"}, stats["skipped_no_transaction_id"]),
+            ({"reason": "invalid"}, stats["invalid_transaction_ids"]),
+        ]
+        yield "alert_write_errors_total", "counter", "Failed alert inserts", [({}, stats["write_errors"])]
+    if drift_monitor is not None:
+        report = drift_monitor.report()
+        if report["rows"] and "score" in report:
+            yield "drift_window_rows", "gauge", "Scored rows in the drift window", [({}, report["rows"])]
+            yield "drift_psi", "gauge", "Population stability index against the bundle baseline", [
+                ({"feature": "score"}, report["score"]["psi"])
+            ] + [({"feature": name}, entry["psi"]) for name, entry in report["features"].items()]
+            yield "drift_ks", "gauge", "KS statistic against the bundle baseline", [
+                ({"feature": "score"}, report["score"]["ks"])
+            ] + [({"feature": name}, entry["ks"]) for name, entry in report["features"].items() if "ks" in entry]
+    if velocity_engine is not None:
+        yield "velocity_accounts", "gauge", "Accounts with velocity windows", [({}, len(velocity_engine))]
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        yield "cache_hits_total", "counter", "Prediction cache hits", [({}, stats["hits"])]
+        yield "cache_misses_total", "counter", "Prediction cache misses", [({}, stats["misses"])]
+        yield "cache_errors_total", "counter", "Prediction cache backend errors", [({}, stats["errors"])]
+    limits = {"single": single_admission.stats(), "batch": batch_admission.stats()}
+    yield "inflight_requests", "gauge", "Requests in flight per admission limit", [
+        ({"kind": kind}, stats["inflight"]) for kind, stats in limits.items()
+    ]
+    yield "rejected_requests_total", "counter", "Requests turned away with 429", [
+        ({"kind": kind}, stats["rejected"]) for kind, stats in limits.items()
+    ]
+
+
+METRICS.add_collector(component_metrics)
+
+
+def flush_prediction_log():
+    # write out whatever is still queued before the worker exits
+    if prediction_logger is not None:
+        prediction_logger.close()
+    if rollups is not None:
+        rollups.close()
+    if alerts is not None:
+        alerts.close()
+    if drift_monitor is not None:
+        drift_monitor.close()
+    if parallel_scorer is not None:
+        parallel_scorer.close()
 
 
 # ---------- JSON API (what you already had) ----------
 @app.get("/")
-def home():
+async def home():
     return {"message": "Fraud Detection API is running!"}
 
 
-@app.post("/predict")
-def predict(data: dict):
+@app.post(
+    "/predict",
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": Transaction.model_json_schema()}}
+    }}
+)
+async def predict(request: Request, reason_text: bool = False, explain: bool = False):
     """JSON endpoint – keep for programmatic use"""
-    X_new = pd.DataFrame([data])
-    fraud_probs = model.predict_proba(X_new)[:, 1]
-    decision = int(fraud_probs[0] >= threshold)
+    with single_admission:
+        # the body is validated from raw bytes by the Transaction schema (no json.loads dict)
+        body = await request.body()
+        try:
+            with METRICS.stage("parse"):
+                data = parse_transaction(body)
+        except SchemaError as e:
+            raise ValidationError(error_detail(e))
+        return await scorer.score_async(data, with_text=reason_text, explain=explain)
+
+
+@app.get("/reasons")
+async def reason_table():
+    """Bit layout of the reason_code returned by the prediction endpoints"""
+    return [
+        {"name": name, "risk_bit": bit, "safe_bit": bit + SAFE_SHIFT,
+         "risk_text": risk_text, "safe_text": safe_text}
+        for bit, (name, _, risk_text, _, safe_text) in enumerate(REASON_RULES)
+    ]
+
+
+# ---------- Batch scoring ----------
+
+def parse_batch_body(body, content_type):
+    """Turn a JSON array, NDJSON or CSV request body into a DataFrame of records."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type in ("text/csv", "application/csv"):
+        # columns are typed and checked together by validate_frame
+        with METRICS.stage("parse"):
+            return pd.read_csv(io.BytesIO(body))
 
+    try:
+        with METRICS.stage("parse"):
+            if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+                # one array, so errors carry row numbers like the other formats
+                body = b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]"
+            # accepts both a bare array and {"transactions": [...]}
+            transactions = parse_transaction_batch(body)
+    except SchemaError as e:
+        if any(err["type"] == "json_invalid" for err in e.errors()):
+            raise ValueError("invalid JSON")
+        raise ValidationError(error_detail(e, batch=True))
+    with METRICS.stage("frame"):
+        return pd.DataFrame([t.__dict__ for t in transactions], columns=list(Transaction.model_fields))
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request, reason_text: bool = False, explain: bool = False):
+    """Score many transactions (JSON array, NDJSON or CSV) in one model call"""
+    with batch_admission:
+        body = await request.body()
+        loop = asyncio.get_running_loop()
+        try:
+            # parsing a large CSV/JSON body is CPU work too: keep it off the event loop
+            df = await loop.run_in_executor(
+                inference_executor, parse_batch_body, body, request.headers.get("content-type")
+            )
+        except ValidationError:
+            raise
+        except (ValueError, pd.errors.ParserError) as e:
+            raise HTTPException(status_code=400, detail=f"Could not parse batch body: {e}")
+
+        if len(df) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch of {len(df)} records exceeds limit of {MAX_BATCH_SIZE}"
+            )
+        if len(df) == 0:
+            active = registry.active
+            return {"count": 0, "threshold": active.threshold, "model_version": active.version, "results": []}
+
+        return await scorer.score_batch_async(df, reason_text, explain)
+
+
+@app.get("/metrics/batcher")
+async def batcher_metrics():
+    """Queue depth and batch-size statistics of the micro-batcher"""
+    if scorer.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **scorer.batcher.stats()}
+
+
+@app.get("/metrics/logging")
+async def logging_metrics():
+    """Queue depth, written/spilled counts of the prediction log writer"""
+    if prediction_logger is None:
+        return {"enabled": False}
+    return {"enabled": True, "sink": LOG_SINK, **prediction_logger.stats()}
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit/miss counters and size of the prediction cache"""
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+
+@app.get("/metrics/drift")
+async def drift_metrics():
+    """PSI / KS of live scores and features against the bundle's baseline over the window"""
+    if drift_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **drift_monitor.report(), "monitor": drift_monitor.stats()}
+
+
+@app.get("/metrics/velocity")
+async def velocity_metrics():
+    """Accounts tracked and memory of the velocity windows"""
+    if velocity_engine is None:
+        return {"enabled": False}
+    return {"enabled": True, "accounts": len(velocity_engine), "max_accounts": velocity_engine.max_accounts,
+            "evictions": velocity_engine.evictions, "array_bytes": velocity_engine.nbytes(),
+            "features": velocity_engine.names}
+
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """In-flight, peak and rejected (429) counts of the admission limits"""
     return {
-        "fraud_probability": float(fraud_probs[0]),
-        "fraud_prediction": decision
+        "inference_threads": INFERENCE_THREADS,
+        "single": single_admission.stats(),
+        "batch": batch_admission.stats()
     }
 
-    # Save this prediction into MySQL
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text format: stage/request histograms (FRAUD_METRICS=1) and component stats"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/slow")
+async def slow_requests():
+    """Collapsed stacks of sampled requests slower than FRAUD_PROFILE_SLOW_MS"""
+    if slow_sampler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "sample_rate": slow_sampler.sample_rate,
+        "slow_ms": slow_sampler.slow * 1000,
+        "traces": list(slow_sampler.traces)
+    }
+
+
+@app.get("/metrics/startup")
+async def startup_metrics():
+    """Seconds per startup stage (imports, model load, warmup, ...) for cold-start tracking"""
+    return {
+        "stages": STARTUP_TIMINGS,
+        "total_seconds": round(sum(STARTUP_TIMINGS.values()), 4),
+        "model_mmap": MODEL_MMAP,
+        "db_ready": db_ready.is_set()
+    }
+
+
+@app.get("/metrics/rollups")
+async def rollup_metrics():
+    """Events counted, flushes and pending rows of the rollup aggregator"""
+    if rollups is None:
+        return {"enabled": False}
+    return {"enabled": True, "sink": ROLLUPS_SINK, **rollups.stats()}
+
+
+# ---------- Dashboard rollups ----------
+# Read from the fraud_rollups table, so every worker's (flushed) counts are included.
+
+def rollup_query(dimension, source, granularity=None):
+    if rollups is None:
+        raise HTTPException(status_code=404, detail="Rollups are off; set FRAUD_ROLLUPS")
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=422, detail=f"dimension must be one of {DIMENSIONS}")
+    if source not in SOURCES:
+        raise HTTPException(status_code=422, detail=f"source must be one of {SOURCES}")
+    if granularity is not None and granularity not in GRANULARITIES:
+        raise HTTPException(status_code=422, detail=f"granularity must be one of {list(GRANULARITIES)}")
+
+
+def parse_time(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} must be an ISO date/time")
+
+
+@app.get("/rollups/rates")
+async def rollup_rates(dimension: str = "channel", source: str = "predictions",
+                       start: str = None, end: str = None):
+    """Events, flagged and fraud_rate_pct per value of a dimension over [start, end) (default: last 24h)"""
+    rollup_query(dimension, source)
+    rows = await run_in_threadpool(rollups.table.rates, dimension, source,
+                                   parse_time(start, "start"), parse_time(end, "end"))
+    return {"dimension": dimension, "source": source, "rows": rows}
+
+
+@app.get("/rollups/series")
+async def rollup_series(dimension: str = "all", granularity: str = "hour", source: str = "predictions",
+                        start: str = None, end: str = None, value: str = None):
+    """Per-bucket events / flagged / fraud_rate_pct (default: last 24h)"""
+    rollup_query(dimension, source, granularity)
+    rows = await run_in_threadpool(rollups.table.series, dimension, granularity, source,
+                                   parse_time(start, "start"), parse_time(end, "end"), value)
+    return {"dimension": dimension, "granularity": granularity, "source": source, "rows": rows}
+
+
+@app.get("/metrics/alerts")
+async def alert_metrics():
+    """Created, inserted, claimed and queued counts of the alert queue"""
+    if alerts is None:
+        return {"enabled": False}
+    return {"enabled": True, "sink": ALERTS_SINK, **alerts.stats()}
+
+
+# ---------- Fraud alert triage ----------
+# Served from the in-memory queue; claims are settled in the fraud_alerts table,
+# so each alert goes to one analyst whichever worker they reach.
+
+def require_alerts():
+    if alerts is None:
+        raise HTTPException(status_code=404, detail="Alerts are off; set FRAUD_ALERTS")
+
+
+@app.get("/alerts/queue")
+async def alert_queue(limit: int = 20):
+    """Next open alerts, highest model_score first (newest first on ties), without claiming them"""
+    require_alerts()
+    return {"open": alerts.stats()["open_in_queue"], "alerts": alerts.peek(max(0, min(limit, 1000)))}
+
+
+@app.post("/alerts/claim")
+async def claim_alerts(limit: int = 10):
+    """Take the next open alerts and mark them under_review"""
+    require_alerts()
     try:
-        log_prediction_to_db(
-            amount=amount,
-            balance=balance,
-            hour=hour,
-            day_of_week=day_of_week,
-            is_weekend=is_weekend,
-            is_international_flag=is_international_flag,
-            age=age,
-            txns_per_account=txns_per_account,
-            avg_amount_account=avg_amount_account,
-            txn_type=txn_type,
-            channel=channel,
-            account_type=account_type,
-            gender=gender,
-            city=city,
-            state=state,
-            fraud_probability=fraud_prob,
-            fraud_prediction=decision,
-            reason_text=reason_text
-        )
+        claimed = await run_in_threadpool(alerts.claim, max(0, min(limit, 1000)))
     except Exception as e:
-        # Optional: print error in server logs but don't break UI
-        print("Error logging prediction to DB:", e)
+        print("Alert claim failed:", e)
+        raise HTTPException(status_code=503, detail="Alert store unavailable, retry later")
+    return {"count": len(claimed), "alerts": claimed}
+
+
+@app.post("/alerts/{alert_id}/status")
+async def set_alert_status(alert_id: int, body: dict):
+    """Set an alert's status ({"status": "open" | "under_review" | "closed"})"""
+    require_alerts()
+    status = body.get("status")
+    if status not in ALERT_STATUSES:
+        raise HTTPException(status_code=422, detail=f"status must be one of {ALERT_STATUSES}")
+    try:
+        found = await run_in_threadpool(alerts.set_status, alert_id, status)
+    except Exception as e:
+        print("Alert status update failed:", e)
+        raise HTTPException(status_code=503, detail="Alert store unavailable, retry later")
+    if not found:
+        raise HTTPException(status_code=404, detail=f"No alert {alert_id}")
+    return {"alert_id": alert_id, "status": status}
+
+
+# ---------- Model registry admin ----------
+# These act on the worker that receives the request; with several workers use
+# FRAUD_MODEL_WATCH_SECONDS (every worker reloads when the bundle file changes).
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model admin is disabled; set FRAUD_ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/models")
+async def models_info():
+    """Active model version, recent swaps and shadow comparison stats"""
+    return registry.info()
+
+
+@app.post("/models/reload", status_code=202)
+async def reload_model(request: Request, body: dict = None):
+    """Load a bundle in the background, warm it up and swap it in ({"path", "threshold"} optional)"""
+    require_admin(request)
+    body = body or {}
+    path = body.get("path") or registry.active.path
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=400, detail=f"No bundle at {path}")
+    registry.reload(path, body.get("threshold"))
+    return {"status": "reloading", "path": path, "active": registry.active.info()}
+
+
+@app.post("/models/threshold")
+async def set_threshold(request: Request, body: dict):
+    """Swap in a new decision threshold for the active model"""
+    require_admin(request)
+    try:
+        value = float(body["threshold"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="threshold must be a number")
+    if not 0.0 <= value <= 1.0:
+        raise HTTPException(status_code=422, detail="threshold must be between 0 and 1")
+    return registry.set_threshold(value).info()
+
+
+@app.post("/models/shadow")
+async def start_shadow(request: Request, body: dict):
+    """Shadow-score a candidate bundle on a sample of traffic ({"path", "sample_rate", "threshold"})"""
+    require_admin(request)
+    path = body.get("path")
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=400, detail=f"No bundle at {path}")
+    rate = float(body.get("sample_rate", SHADOW_SAMPLE_RATE))
+    shadow = await run_in_threadpool(registry.start_shadow, path, rate, body.get("threshold"))
+    return shadow.stats()
+
+
+@app.delete("/models/shadow")
+async def stop_shadow(request: Request):
+    """Stop shadow scoring and return its final stats"""
+    require_admin(request)
+    shadow = await run_in_threadpool(registry.stop_shadow)
+    return shadow.stats() if shadow is not None else {"shadow": None}
+
 
 # ---------- Simple HTML Frontend ----------
 @app.get("/ui", response_class=HTMLResponse)
-def ui_form():
+async def ui_form(request: Request):
     """Render HTML form for manual testing with nicer UI + tooltips"""
-    html = """
-    <html>
-    <head>
-        <title>SecureTrust Bank – Banking Fraud Detection</title>
-        <style>
-            * { box-sizing: border-box; }
-            body {
-                margin: 0;
-                padding: 0;
-                font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-                background: radial-gradient(circle at top left, #1f2937, #020617);
-                color: #0f172a;
-            }
-            .page {
-                min-height: 100vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                padding: 24px;
-            }
-            .card {
-                width: 100%;
-                max-width: 720px;
-                background: #ffffff;
-                border-radius: 16px;
-                box-shadow: 0 20px 40px rgba(15,23,42,0.35);
-                padding: 24px 28px 28px;
-                position: relative;
-                overflow: hidden;
-            }
-            .card::before {
-                content: "";
-                position: absolute;
-                inset: -80px auto auto -80px;
-                width: 180px;
-                height: 180px;
-                background: radial-gradient(circle, #38bdf8, transparent 60%);
-                opacity: 0.3;
-            }
-            .card::after {
-                content: "";
-                position: absolute;
-                inset: auto -60px -60px auto;
-                width: 160px;
-                height: 160px;
-                background: radial-gradient(circle, #22c55e, transparent 60%);
-                opacity: 0.25;
-            }
-            .card-content {
-                position: relative;
-                z-index: 1;
-            }
-            .header {
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-                margin-bottom: 10px;
-            }
-            .logo-wrap {
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }
-            .logo-circle {
-                width: 38px;
-                height: 38px;
-                border-radius: 999px;
-                background: linear-gradient(135deg, #0ea5e9, #22c55e);
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                color: white;
-                font-weight: 700;
-                font-size: 18px;
-                box-shadow: 0 6px 16px rgba(34,197,94,0.35);
-            }
-            .title {
-                font-size: 20px;
-                font-weight: 700;
-                color: #0f172a;
-            }
-            .subtitle {
-                font-size: 12px;
-                color: #64748b;
-            }
-            .badge {
-                font-size: 11px;
-                padding: 4px 10px;
-                border-radius: 999px;
-                background: #ecfdf5;
-                color: #16a34a;
-                border: 1px solid #bbf7d0;
-                font-weight: 600;
-            }
-            .demo-buttons {
-                display: flex;
-                gap: 10px;
-                margin-bottom: 10px;
-                flex-wrap: wrap;
-            }
-            .btn {
-                border-radius: 999px;
-                border: none;
-                padding: 8px 14px;
-                font-size: 13px;
-                font-weight: 600;
-                cursor: pointer;
-                display: inline-flex;
-                align-items: center;
-                gap: 6px;
-                box-shadow: 0 4px 10px rgba(15,23,42,0.15);
-            }
-            .btn-safe {
-                background: linear-gradient(135deg, #22c55e, #16a34a);
-                color: white;
-            }
-            .btn-fraud {
-                background: linear-gradient(135deg, #ef4444, #b91c1c);
-                color: white;
-            }
-            .btn span.icon {
-                font-size: 16px;
-            }
-            form {
-                margin-top: 4px;
-            }
-            .grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
-                gap: 12px 16px;
-            }
-            label {
-                display: block;
-                font-size: 12px;
-                font-weight: 600;
-                color: #0f172a;
-                margin-bottom: 3px;
-            }
-            input, select {
-                width: 100%;
-                padding: 7px 9px;
-                border-radius: 8px;
-                border: 1px solid #cbd5f5;
-                font-size: 13px;
-                outline: none;
-                transition: border-color 0.15s, box-shadow 0.15s, background 0.15s;
-                background: #f8fafc;
-            }
-            input:focus, select:focus {
-                border-color: #0ea5e9;
-                box-shadow: 0 0 0 1px rgba(14,165,233,0.3);
-                background: #ffffff;
-            }
-            .footer-actions {
-                margin-top: 16px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                gap: 10px;
-                flex-wrap: wrap;
-            }
-            .primary-submit {
-                background: linear-gradient(135deg, #0ea5e9, #2563eb);
-                color: white;
-                border-radius: 999px;
-                border: none;
-                padding: 9px 18px;
-                font-size: 14px;
-                font-weight: 600;
-                cursor: pointer;
-                box-shadow: 0 6px 16px rgba(37,99,235,0.45);
-                display: inline-flex;
-                align-items: center;
-                gap: 6px;
-            }
-            .primary-submit:hover {
-                filter: brightness(1.05);
-            }
-            .hint {
-                font-size: 11px;
-                color: #6b7280;
-            }
-            @media (max-width: 640px) {
-                .card {
-                    padding: 18px 16px 20px;
-                }
-            }
-        </style>
-    </head>
-    <body>
-        <div class="page">
-            <div class="card">
-                <div class="card-content">
-                    <div class="header">
-                        <div class="logo-wrap">
-                            <div class="logo-circle">ST</div>
-                            <div>
-                                <div class="title">SecureTrust Bank</div>
-                                <!-- subtitle removed as requested -->
-                                <div class="subtitle">Banking Fraud Detection</div>
-                            </div>
-                        </div>
-                        <div class="badge">ML Model · v1.0</div>
-                    </div>
-
-                    <!-- Tooltip / helper box -->
-                    <div id="helpBox"
-                        style="
-                            background:#1f2937;
-                            border:1px solid #374151;
-                            padding:8px 14px;
-                            border-radius:8px;
-                            font-size:13px;
-                            color:white;
-                            margin-bottom:12px;
-                            opacity:0;
-                            transition:opacity 0.25s;
-                        ">
-                    </div>
-
-                    <div class="demo-buttons">
-                        <button type="button" class="btn btn-safe" onclick="runSafeDemo()">
-                            <span class="icon">✅</span> Demo Safe Transaction
-                        </button>
-                        <button type="button" class="btn btn-fraud" onclick="runFraudDemo()">
-                            <span class="icon">⚠️</span> Demo Fraud Transaction
-                        </button>
-                    </div>
-
-                    <form id="fraudForm" action="/ui/predict" method="post">
-                        <div class="grid">
-                            <div>
-                                <label>Amount (₹)</label>
-                                <input type="number" step="0.01" name="amount" required
-                                       onfocus="showHelp('amount')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>Balance (₹)</label>
-                                <input type="number" step="0.01" name="balance" required
-                                       onfocus="showHelp('balance')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>Hour (0–23)</label>
-                                <input type="number" name="hour" min="0" max="23" required
-                                       onfocus="showHelp('hour')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>Day of Week</label>
-                                <select name="day_of_week"
-                                        onfocus="showHelp('day_of_week')" onblur="hideHelp()">
-                                    <option value="0">0 – Monday</option>
-                                    <option value="1">1 – Tuesday</option>
-                                    <option value="2">2 – Wednesday</option>
-                                    <option value="3">3 – Thursday</option>
-                                    <option value="4">4 – Friday</option>
-                                    <option value="5">5 – Saturday</option>
-                                    <option value="6">6 – Sunday</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>Is Weekend?</label>
-                                <select name="is_weekend"
-                                        onfocus="showHelp('is_weekend')" onblur="hideHelp()">
-                                    <option value="0">0 – No</option>
-                                    <option value="1">1 – Yes</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>Is International?</label>
-                                <select name="is_international_flag"
-                                        onfocus="showHelp('is_international_flag')" onblur="hideHelp()">
-                                    <option value="0">0 – No</option>
-                                    <option value="1">1 – Yes</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>Transactions per Account</label>
-                                <input type="number" name="txns_per_account" min="0" required
-                                       onfocus="showHelp('txns_per_account')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>Transaction Type</label>
-                                <select name="txn_type"
-                                        onfocus="showHelp('txn_type')" onblur="hideHelp()">
-                                    <option>ATM</option>
-                                    <option>POS</option>
-                                    <option>Online</option>
-                                    <option>Transfer</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>Channel</label>
-                                <select name="channel"
-                                        onfocus="showHelp('channel')" onblur="hideHelp()">
-                                    <option>Branch</option>
-                                    <option>ATM</option>
-                                    <option>Online</option>
-                                    <option>Mobile</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>Account Type</label>
-                                <select name="account_type"
-                                        onfocus="showHelp('account_type')" onblur="hideHelp()">
-                                    <option>savings</option>
-                                    <option>current</option>
-                                    <option>credit_card</option>
-                                </select>
-                            </div>
-
-                            <div>
-                                <label>City</label>
-                                <input type="text" name="city" value="Hyderabad"
-                                       onfocus="showHelp('city')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>State</label>
-                                <input type="text" name="state" value="Telangana"
-                                       onfocus="showHelp('state')" onblur="hideHelp()">
-                            </div>
-
-                            <div>
-                                <label>Country</label>
-                                <input type="text" name="country" value="India"
-                                       onfocus="showHelp('country')" onblur="hideHelp()">
-                            </div>
-                        </div>
-
-                        <!-- hidden defaults for model-only fields: age, avg_amount_account, gender -->
-                        <input type="hidden" name="age" value="35">
-                        <input type="hidden" name="avg_amount_account" value="2000">
-                        <input type="hidden" name="gender" value="M">
-
-                        <div class="footer-actions">
-                            <button type="submit" class="primary-submit">
-                                <span>Predict Fraud</span> <span class="icon">➜</span>
-                            </button>
-                            <div class="hint">
-                                Tip: hover / focus on any field to see what it means.  
-                                Use the demo buttons above for instant examples.
-                            </div>
-                        </div>
-                    </form>
-                </div>
-            </div>
-        </div>
-
-        <script>
-            // Help-text dictionary
-            const helpText = {
-                amount: "Total transaction amount in rupees.",
-                balance: "Customer's account balance before the transaction.",
-                hour: "Time of the transaction (0 = midnight, 23 = 11PM).",
-                day_of_week: "Day of the transaction (0=Mon … 6=Sun).",
-                is_weekend: "Whether the transaction happened on a weekend (Sat/Sun).",
-                is_international_flag: "Indicates if the transaction is international.",
-                txns_per_account: "Total number of previous transactions for this account.",
-                txn_type: "Type of transaction: ATM, POS, Online, Transfer, etc.",
-                channel: "Channel used for the transaction (Branch/ATM/Online/Mobile).",
-                account_type: "Account category: savings, current, or credit card.",
-                city: "City where the customer lives or account is registered.",
-                state: "State where the customer lives or account is registered.",
-                country: "Country of the customer (not used directly by the model, for display only)."
-            };
-
-            function showHelp(name) {
-                const helpBox = document.getElementById("helpBox");
-                helpBox.innerText = helpText[name] || "";
-                helpBox.style.opacity = "1";
-            }
-
-            function hideHelp() {
-                document.getElementById("helpBox").style.opacity = "0";
-            }
-
-            function setValue(name, value) {
-                const el = document.querySelector('[name="' + name + '"]');
-                if (el) el.value = value;
-            }
-
-            function runSafeDemo() {
-                setValue("amount", 1500);
-                setValue("balance", 25000);
-                setValue("hour", 14);
-                setValue("day_of_week", 2);
-                setValue("is_weekend", 0);
-                setValue("is_international_flag", 0);
-                setValue("txns_per_account", 120);
-                setValue("txn_type", "ATM");
-                setValue("channel", "Branch");
-                setValue("account_type", "savings");
-                setValue("city", "Hyderabad");
-                setValue("state", "Telangana");
-                setValue("country", "India");
-                // hidden model fields:
-                setValue("age", 35);
-                setValue("avg_amount_account", 1800);
-                setValue("gender", "M");
-
-                document.getElementById("fraudForm").submit();
-            }
-
-            function runFraudDemo() {
-                setValue("amount", 95000);
-                setValue("balance", 12000);
-                setValue("hour", 2);
-                setValue("day_of_week", 6);
-                setValue("is_weekend", 1);
-                setValue("is_international_flag", 1);
-                setValue("txns_per_account", 8);
-                setValue("txn_type", "Online");
-                setValue("channel", "Mobile");
-                setValue("account_type", "savings");
-                setValue("city", "Mumbai");
-                setValue("state", "Maharashtra");
-                setValue("country", "India");
-                // hidden model fields:
-                setValue("age", 22);
-                setValue("avg_amount_account", 1500);
-                setValue("gender", "M");
-
-                document.getElementById("fraudForm").submit();
-            }
-        </script>
-    </body>
-    </html>
-    """
-    return html
+    return FORM_PAGE.response(request)
 
 
+@app.get("/ui/static/result.css", include_in_schema=False)
+async def ui_result_css(request: Request):
+    return RESULT_CSS.response(request)
 
 
 @app.post("/ui/predict", response_class=HTMLResponse)
-def ui_predict(
-    amount: float = Form(...),
-    balance: float = Form(...),
-    hour: int = Form(...),
-    day_of_week: int = Form(...),
-    is_weekend: int = Form(...),
-    is_international_flag: int = Form(...),
-    age: int = Form(...),
-    txns_per_account: int = Form(...),
-    avg_amount_account: float = Form(...),
-    txn_type: str = Form(...),
-    channel: str = Form(...),
-    account_type: str = Form(...),
-    gender: str = Form(...),
-    city: str = Form(...),
-    state: str = Form(...)
-):
-    # Build DataFrame
-    data = {
-        "amount": [amount],
-        "balance": [balance],
-        "hour": [hour],
-        "day_of_week": [day_of_week],
-        "is_weekend": [is_weekend],
-        "is_international_flag": [is_international_flag],
-        "age": [age],
-        "txns_per_account": [txns_per_account],
-        "avg_amount_account": [avg_amount_account],
-        "txn_type": [txn_type],
-        "channel": [channel],
-        "account_type": [account_type],
-        "gender": [gender],
-        "city": [city],
-        "state": [state],
-    }
-
-    X_new = pd.DataFrame(data)
-    fraud_prob = float(model.predict_proba(X_new)[:, 1][0])
-    decision = int(fraud_prob >= threshold)
-
-    is_fraud = (decision == 1)
-    label = "FRAUD" if is_fraud else "NOT FRAUD"
-    badge_text = "High Risk" if is_fraud else "Low Risk"
-    card_class = "fraud" if is_fraud else "safe"
-
-    # reason generator
-    reasons = []
-    if amount > max(balance * 0.6, 50000):
-        reasons.append("high transaction amount compared to balance")
-    if is_international_flag == 1:
-        reasons.append("international transaction")
-    if is_weekend == 1 or hour < 7 or hour > 22:
-        reasons.append("unusual transaction time")
-    if txns_per_account < 10:
-        reasons.append("low account activity")
-
-    if is_fraud:
-        reason_text = (
-            "This transaction is flagged as FRAUD because of "
-            + ", ".join(reasons)
-            + "."
-            if reasons
-            else "This transaction pattern looks unusual compared to typical customer behaviour."
-        )
-    else:
-        safe_reasons = []
-        if amount <= max(balance * 0.6, 50000):
-            safe_reasons.append("amount is within a normal range")
-        if is_international_flag == 0:
-            safe_reasons.append("transaction is domestic")
-        if not (is_weekend == 1 or hour < 7 or hour > 22):
-            safe_reasons.append("time of transaction is within normal hours")
-        if txns_per_account >= 10:
-            safe_reasons.append("account has sufficient past activity")
-
-        reason_text = (
-            "This transaction is considered SAFE because "
-            + ", ".join(safe_reasons)
-            + "."
-            if safe_reasons
-            else "This transaction is consistent with typical customer behaviour."
-        )
-
-    # Save to MySQL
-    try:
-        log_prediction_to_db(
-            amount, balance, hour, day_of_week,
-            is_weekend, is_international_flag, age,
-            txns_per_account, avg_amount_account,
-            txn_type, channel, account_type, gender,
-            city, state,
-            fraud_prob, decision, reason_text
-        )
-    except Exception as e:
-        print("DB Logging Error:", e)
-
-    # ----------- HTML response START -----------
-    html = f"""
-    <html>
-    <head>
-        <title>Banking Fraud Detection Result</title>
-        <style>
-            body {{
-                margin: 0;
-                padding: 0;
-                font-family: system-ui, sans-serif;
-                background: radial-gradient(circle at top left, #0f172a, #020617);
-                color: #e5e7eb;
-            }}
-            .page {{
-                padding: 30px;
-                display: flex;
-                justify-content: center;
-            }}
-            .card {{
-                width: 720px;
-                background: #020617;
-                border-radius: 18px;
-                padding: 28px;
-                box-shadow: 0 20px 40px rgba(0,0,0,0.6);
-            }}
-            .bank {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            .logo {{
-                display: flex;
-                align-items: center;
-                gap: 12px;
-            }}
-            .circle {{
-                width: 38px;
-                height: 38px;
-                border-radius: 100px;
-                background: linear-gradient(135deg, #0ea5e9, #22c55e);
-                color: white;
-                font-weight: 700;
-                display: flex;
-                justify-content: center;
-                align-items: center;
-            }}
-            .badge {{
-                padding: 5px 12px;
-                border-radius: 12px;
-                border: 1px solid #4ade80;
-                background: #052e16;
-                color: #bbf7d0;
-                font-size: 12px;
-            }}
-            .title {{
-                font-size: 24px;
-                font-weight: 700;
-                margin-top: 20px;
-            }}
-            .result-box {{
-                margin-top: 20px;
-                border-radius: 12px;
-                padding: 18px;
-                background: {"#450a0a" if is_fraud else "#022c22"};
-                border: 1px solid {"#f87171" if is_fraud else "#34d399"};
-            }}
-            a {{
-                color: #38bdf8;
-                text-decoration: none;
-                font-size: 14px;
-            }}
-        </style>
-    </head>
-
-    <body>
-        <div class="page">
-            <div class="card">
-
-                <div class="bank">
-                    <div class="logo">
-                        <div class="circle">ST</div>
-                        <div>
-                            <b>SecureTrust Bank</b><br>
-                            <span style="font-size:11px;color:#9ca3af;">Transaction Fraud Engine</span>
-                        </div>
-                    </div>
-                    <div class="badge">{badge_text}</div>
-                </div>
-
-                <div class="title">Banking Fraud Detection Result</div>
-
-                <div class="result-box">
-                    <h3>PREDICTION: {label}</h3>
-                    <p><b>Fraud probability:</b> {fraud_prob:.4f}</p>
-                    <p><b>Reason:</b> {reason_text}</p>
-                </div>
-
-                <div style="margin-top:20px;">
-                    <a href="/ui">⟵ Test another transaction</a>
-                </div>
-
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    # ----------- HTML response END -----------
-
-    return html
+async def ui_predict(data: Annotated[Transaction, Form()]):
+    with single_admission:
+        result = await scorer.score_async(data, with_text=True)
+    is_fraud = (result["fraud_prediction"] == 1)
+    with METRICS.stage("render"):
+        html = render_result(is_fraud, result["fraud_probability"], result["reason"])
+    return HTMLResponse(html, headers={"Cache-Control": "no-store"})
@@ -0,0 +1,135 @@
+"""Micro-batching request coalescer that sits between the API handlers and the model.
+
+Concurrent single-transaction requests are collected for a short window
+(or until a batch is full) and scored with one vectorized predict_proba call.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+# batch-size histogram bucket upper bounds (last bucket is "+Inf")
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class MicroBatcher:
+    """Coalesce single-row predictions into vectorized batches on a worker thread."""
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, max_queue_size=10000):
+        # predict_fn takes a list of record dicts and returns one fraud probability per record
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self._stats = {
+            "batches": 0,
+            "records": 0,
+            "max_batch_size_seen": 0,
+            "errors": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+        }
+        self._size_buckets = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._start_worker()
+        # threads do not survive fork (gunicorn --preload): start a fresh one in the child
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    # ---------- public API ----------
+
+    def submit(self, row):
+        """Queue one record (dict of raw features); returns a Future with its probability."""
+        future = Future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise
+        return future
+
+    def predict(self, row, timeout=None):
+        """Blocking helper for sync callers."""
+        return self.submit(row).result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker after the queued requests are served."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        """Snapshot of queue depth and batch-size metrics."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            buckets = list(self._size_buckets)
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["mean_batch_size"] = (
+            snapshot["records"] / snapshot["batches"] if snapshot["batches"] else 0.0
+        )
+        snapshot["batch_size_histogram"] = {
+            **{f"le_{b}": n for b, n in zip(BATCH_SIZE_BUCKETS, buckets)},
+            "le_inf": buckets[-1],
+        }
+        snapshot["max_batch_size"] = self.max_batch_size
+        snapshot["max_wait_ms"] = self.max_wait * 1000.0
+        return snapshot
+
+    # ---------- worker ----------
+
+    def _start_worker(self):
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        rows = [row for row, _, _ in batch]
+        try:
+            probs = [float(p) for p in self.predict_fn(rows)]
+            for (_, future, _), prob in zip(batch, probs):
+                future.set_result(prob)
+        except Exception:
+            # one bad record must not fail its neighbours: retry one by one
+            for row, future, _ in batch:
+                try:
+                    future.set_result(float(self.predict_fn([row])[0]))
+                except Exception as e:
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    future.set_exception(e)
+
+        waits = [started - enqueued for _, _, enqueued in batch]
+        size = len(batch)
+        bucket = next((i for i, b in enumerate(BATCH_SIZE_BUCKETS) if size <= b), len(BATCH_SIZE_BUCKETS))
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["records"] += size
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], size)
+            self._stats["queue_wait_seconds_total"] += sum(waits)
+            self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], max(waits))
+            self._size_buckets[bucket] += 1
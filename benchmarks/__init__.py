@@ -0,0 +1,15 @@
+"""Reproducible benchmarks for the model and the API.
+
+    python -m benchmarks model                   # predict_proba, batch sizes 1..100k
+    python -m benchmarks api                     # /predict, /predict/batch, /ui/predict in-process
+    python -m benchmarks db --rows 1000000       # dashboard queries, original vs managed table
+    python -m benchmarks all --out run.json      # all three, saved as JSON
+    python -m benchmarks compare old.json new.json
+
+Inputs are synthetic transactions shaped like the tables in
+`Banking _Fraud Detection.sql` and turned into model features the way the
+notebook does (see synthetic.py), drawn from a fixed seed so runs are
+comparable.  Results carry enough metadata (git commit, model version,
+Python, CPU count) to tell two runs apart; `compare` flags throughput and
+latency changes beyond a tolerance.
+"""
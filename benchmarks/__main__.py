@@ -0,0 +1,98 @@
+"""Command line for the benchmark suite; see benchmarks/__init__.py."""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+
+def metadata(model_path):
+    from registry import bundle_version
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "model_version": bundle_version(model_path),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "env": {k: v for k, v in os.environ.items() if k.startswith("FRAUD_")},
+    }
+
+
+def compare(old, new, tolerance):
+    """Print entries whose throughput fell or p99 rose by more than `tolerance`; returns the count."""
+    regressions = 0
+    for section, key in (("model", ("path", "batch_size")), ("api", ("endpoint",))):
+        before = {tuple(e[k] for k in key): e for e in old.get(section, [])}
+        for entry in new.get(section, []):
+            ident = tuple(entry[k] for k in key)
+            if ident not in before:
+                continue
+            prev = before[ident]
+            rate = "rows_per_second" if section == "model" else "requests_per_second"
+            change = entry[rate] / prev[rate] - 1 if prev[rate] else 0.0
+            p99 = entry["p99_ms"] / prev["p99_ms"] - 1 if prev["p99_ms"] else 0.0
+            flag = change < -tolerance or p99 > tolerance
+            regressions += flag
+            print(f"{'REGRESSION' if flag else 'ok':<10} {section:<5} {'/'.join(map(str, ident)):<26} "
+                  f"{rate} {change:+.1%}  p99 {p99:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("suite", choices=["model", "api", "db", "all", "compare"])
+    parser.add_argument("files", nargs="*", help="compare: baseline.json candidate.json")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--model", default=os.getenv("FRAUD_MODEL_PATH", "fraud_rf_pipeline.joblib"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per single-record endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per /predict/batch request")
+    parser.add_argument("--batch-requests", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=1000000, help="db: fraud_predictions rows")
+    parser.add_argument("--dialect", choices=["sqlite", "mysql"], default="sqlite",
+                        help="db: SQLite temp file or the FRAUD_DB_* MySQL database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.10, help="compare: allowed relative change")
+    args = parser.parse_args()
+
+    if args.suite == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs two result files")
+        with open(args.files[0]) as f:
+            old = json.load(f)
+        with open(args.files[1]) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.tolerance) else 0)
+
+    results = {"meta": metadata(args.model)}
+    if args.suite in ("model", "all"):
+        from benchmarks import model_bench
+        kwargs = {"batch_sizes": args.batch_sizes} if args.batch_sizes else {}
+        results["model"] = model_bench.run(args.model, seed=args.seed, **kwargs)
+    if args.suite in ("api", "all"):
+        from benchmarks import api_bench
+        os.environ.setdefault("FRAUD_MODEL_PATH", args.model)
+        results["api"] = api_bench.run(n_requests=args.requests, concurrency=args.concurrency,
+                                       batch_size=args.batch_size, batch_requests=args.batch_requests,
+                                       seed=args.seed)
+    if args.suite in ("db", "all"):
+        from benchmarks import db_bench
+        results["db"] = db_bench.run(n_rows=args.rows, dialect=args.dialect, seed=args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print("results written to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""In-process load generator for /predict, /predict/batch and /ui/predict.
+
+The app is driven through httpx's ASGI transport -- no sockets, no server --
+with a fixed number of concurrent closed-loop clients.  Prediction logging
+goes to a throwaway SQLite file (the local stand-in for MySQL), so the whole
+request path including the log writer runs without a database server.
+Latencies therefore include the client's own overhead and are best compared
+between runs on the same machine.
+"""
+import asyncio
+import itertools
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import payloads
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def import_app(tmp_dir):
+    """Import api with logging pointed at SQLite in tmp_dir (env settings still win)."""
+    os.environ.setdefault("FRAUD_LOG_SINK", "sqlite")
+    os.environ.setdefault("FRAUD_LOG_SQLITE_PATH", os.path.join(tmp_dir, "fraud_predictions.db"))
+    os.environ.setdefault("FRAUD_LOG_SPILL_PATH", os.path.join(tmp_dir, "prediction_log_spill.ndjson"))
+    import api
+    return api
+
+
+async def drive(client, make_request, n_requests, concurrency, rows_per_request=1):
+    """Send n_requests from `concurrency` closed-loop clients; latency and status summary."""
+    counter = itertools.count()
+    latencies, statuses = [], {}
+
+    async def worker():
+        while next(counter) < n_requests:
+            start = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    ok = statuses.get(200, 0)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "rows_per_request": rows_per_request,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "rows_per_second": round(ok * rows_per_request / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "rss_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+async def _run(api, bodies, endpoints, n_requests, concurrency, batch_size, batch_requests, batch_concurrency):
+    import httpx
+
+    single = itertools.cycle(bodies)
+    form = itertools.cycle([{k: str(v) for k, v in body.items()} for body in bodies])
+    batches = itertools.cycle([bodies[i:i + batch_size] for i in range(0, len(bodies) - batch_size + 1, batch_size)])
+    scenarios = {
+        "predict": (lambda c: c.post("/predict", json=next(single)), n_requests, concurrency, 1),
+        "predict_batch": (lambda c: c.post("/predict/batch", json=next(batches)),
+                          batch_requests, batch_concurrency, batch_size),
+        "ui_predict": (lambda c: c.post("/ui/predict", data=next(form)), n_requests, concurrency, 1),
+    }
+    results = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in endpoints:
+            make_request, n, workers, rows = scenarios[name]
+            await drive(client, make_request, min(n, 20), min(workers, 4), rows)       # warm-up
+            entry = {"endpoint": name, **await drive(client, make_request, n, workers, rows)}
+            results.append(entry)
+            print(f"{name:<14} {entry['requests_per_second']:>9,.1f} req/s {entry['rows_per_second']:>11,.0f} rows/s  "
+                  f"p50 {entry['p50_ms']:>8.2f} ms  p95 {entry['p95_ms']:>8.2f} ms  p99 {entry['p99_ms']:>8.2f} ms  "
+                  f"statuses {entry['statuses']}  rss {entry['rss_mb']} MB")
+    return results
+
+
+def run(endpoints=("predict", "predict_batch", "ui_predict"), n_requests=2000, concurrency=32,
+        batch_size=1000, batch_requests=40, batch_concurrency=2, seed=0):
+    """List of per-endpoint {requests_per_second, p50_ms, p95_ms, p99_ms, rss_mb, ...} entries."""
+    bodies = payloads(max(5000, batch_size * 4), seed=seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        api = import_app(tmp_dir)
+        return asyncio.run(_run(api, bodies, endpoints, n_requests, concurrency,
+                                batch_size, batch_requests, batch_concurrency))
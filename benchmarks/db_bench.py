@@ -0,0 +1,176 @@
+"""Dashboard queries on the original fraud_predictions layout vs the managed schema.
+
+Both tables are filled with the same synthetic predictions spread over the
+last 90 days: the original one as api.init_db used to create it (row id
+only, no secondary index) and the managed one from prediction_store.  Each
+query in prediction_store.DASHBOARD_QUERIES is then timed on both, and the
+results are compared.  Bulk-insert rates are reported too, since the
+indexes are paid for on every write.  The last entry feeds the same rows
+through rollups.RollupAggregator and reads the per-channel fraud rate back
+from fraud_rollups.
+
+SQLite (a temporary file) is the default; with dialect="mysql" the tables
+are created in the FRAUD_DB_* database as fraud_predictions_bench_* and
+dropped afterwards.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import TXN_CHANNELS
+from prediction_store import (COLUMN_TYPES, DASHBOARD_QUERIES, INDEXES, PREDICTION_COLUMNS,
+                              dashboard_params, mysql_config, mysql_table_sql, sql, sqlite_index_sql,
+                              sqlite_table_sql)
+from rollups import RollupAggregator, RollupTable, sqlite_table
+
+
+LEGACY, MANAGED = "fraud_predictions_bench_legacy", "fraud_predictions_bench"
+
+
+def prediction_rows(n_rows, days=90, seed=0, now=None):
+    """Synthetic fraud_predictions rows (PREDICTION_COLUMNS order), in insert (time) order."""
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    offsets = np.sort(rng.integers(0, days * 86400 * 10**6, n_rows))[::-1]
+    txn_type = rng.choice(list(TXN_CHANNELS), n_rows, p=[0.3, 0.15, 0.25, 0.25, 0.05])
+    channel = [TXN_CHANNELS[t][i % len(TXN_CHANNELS[t])] for i, t in enumerate(txn_type)]
+    probability = rng.beta(0.5, 8, n_rows)
+    amount = np.round(rng.lognormal(7.5, 1.3, n_rows), 2)
+    for i in range(n_rows):
+        created = now - timedelta(microseconds=int(offsets[i]))
+        yield (created.isoformat(sep=" "), float(amount[i]), 25000.0, created.hour, created.weekday(),
+               int(created.weekday() >= 5), 0, 35, 12, 2500.0, str(txn_type[i]), channel[i],
+               "savings", "M", "Mumbai", "Maharashtra", float(probability[i]),
+               int(probability[i] >= 0.4), "bench")
+
+
+def legacy_table_sql(table, dialect):
+    if dialect == "sqlite":
+        return f"CREATE TABLE {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(PREDICTION_COLUMNS)})"
+    # the original api.init_db table: INT key, no other index
+    columns = ", ".join(f"{c} {t.replace(' NOT NULL', '')}" for c, t in COLUMN_TYPES.items())
+    return f"CREATE TABLE {table} (id INT AUTO_INCREMENT PRIMARY KEY, {columns})"
+
+
+def _connect(dialect, path):
+    if dialect == "sqlite":
+        import sqlite3
+        return sqlite3.connect(path)
+    import mysql.connector
+    return mysql.connector.connect(**mysql_config())
+
+
+def _fill(conn, dialect, table, n_rows, batch_size, seed, now):
+    insert = sql(f"INSERT INTO {table} ({', '.join(PREDICTION_COLUMNS)}) "
+                 f"VALUES ({', '.join(['%s'] * len(PREDICTION_COLUMNS))})", dialect)
+    cur = conn.cursor()
+    rows = prediction_rows(n_rows, seed=seed, now=now)
+    start = time.perf_counter()
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        cur.executemany(insert, batch)
+        conn.commit()
+    seconds = time.perf_counter() - start
+    cur.close()
+    return round(n_rows / seconds, 1)
+
+
+def _time_query(conn, dialect, query, params, repeats):
+    cur = conn.cursor()
+    samples, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cur.execute(sql(query, dialect), params)
+        result = cur.fetchall()
+        samples.append(time.perf_counter() - start)
+    cur.close()
+    return round(float(np.median(samples)) * 1000, 3), result
+
+
+def _rollup_entry(conn, dialect, path, n_rows, seed, now, repeats, batch_size):
+    """Per-channel fraud rate from fraud_rollups (fed with the same rows) vs GROUP BY on the original table."""
+    table = sqlite_table(path) if dialect == "sqlite" else RollupTable(lambda: _connect(dialect, path), dialect)
+    aggregator = RollupAggregator(table, flush_interval=3600)
+    rows = prediction_rows(n_rows, seed=seed, now=now)
+    start = time.perf_counter()
+    while True:
+        batch = pd.DataFrame([row for _, row in zip(range(batch_size * 20), rows)], columns=PREDICTION_COLUMNS)
+        if batch.empty:
+            break
+        aggregator.add_predictions(batch, batch["fraud_probability"], batch["fraud_prediction"],
+                                   at=pd.to_datetime(batch["created_at"], format="ISO8601"))
+        aggregator.flush()
+    aggregator.close()
+    ingest_rate = round(n_rows / (time.perf_counter() - start), 1)
+
+    query = DASHBOARD_QUERIES["fraud_rate_by_channel"].format(table=LEGACY)
+    before, old = _time_query(conn, dialect, query, (), repeats)
+    samples = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        new = table.rates("channel", "predictions", now - timedelta(days=91), now + timedelta(minutes=1))
+        samples.append(time.perf_counter() - t)
+    after = round(float(np.median(samples)) * 1000, 3)
+    entry = {"query": "fraud_rate_by_channel_rollup", "rows": n_rows, "dialect": dialect,
+             "original_ms": before, "managed_ms": after, "speedup": round(before / after, 1) if after else None,
+             "rollup_ingest_rows_per_second": ingest_rate,
+             "same_result": sorted((r[0], int(r[1]), int(r[2])) for r in old) ==
+                            sorted((r["value"], r["events"], r["flagged"]) for r in new)}
+    print(f"  {'fraud_rate_by_channel (rollup)':<30} {before:>10.2f} ms {after:>10.2f} ms  x{entry['speedup']}"
+          f"{'' if entry['same_result'] else '  (results differ)'}  ingest {ingest_rate:,.0f} rows/s")
+    return entry
+
+
+def run(n_rows=1000000, dialect="sqlite", repeats=5, batch_size=5000, seed=0):
+    """One entry per dashboard query: median ms on both layouts and the speedup."""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _connect(dialect, os.path.join(tmp, "bench.db"))
+        cur = conn.cursor()
+        try:
+            for table in (LEGACY, MANAGED):
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+            cur.execute(legacy_table_sql(LEGACY, dialect))
+            if dialect == "sqlite":
+                cur.execute(sqlite_table_sql(MANAGED))
+                for statement in sqlite_index_sql(MANAGED):
+                    cur.execute(statement)
+            else:
+                cur.execute(mysql_table_sql(MANAGED, start=(datetime.now() - timedelta(days=90)).date()))
+            conn.commit()
+
+            now = datetime.now()
+            insert_rates = {table: _fill(conn, dialect, table, n_rows, batch_size, seed, now)
+                            for table in (LEGACY, MANAGED)}
+            print(f"filled {n_rows:,} rows: {insert_rates[LEGACY]:,.0f} rows/s original, "
+                  f"{insert_rates[MANAGED]:,.0f} rows/s managed ({len(INDEXES)} indexes)")
+            if dialect == "sqlite":
+                cur.execute("ANALYZE")
+
+            results = []
+            for name, query in DASHBOARD_QUERIES.items():
+                params = dashboard_params(name)
+                before, old = _time_query(conn, dialect, query.format(table=LEGACY), params, repeats)
+                after, new = _time_query(conn, dialect, query.format(table=MANAGED), params, repeats)
+                entry = {"query": name, "rows": n_rows, "dialect": dialect, "original_ms": before,
+                         "managed_ms": after, "speedup": round(before / after, 1) if after else None,
+                         "original_insert_rows_per_second": insert_rates[LEGACY],
+                         "managed_insert_rows_per_second": insert_rates[MANAGED],
+                         "same_result": old == new}
+                results.append(entry)
+                print(f"  {name:<30} {before:>10.2f} ms {after:>10.2f} ms  x{entry['speedup']}"
+                      f"{'' if entry['same_result'] else '  (results differ)'}")
+            results.append(_rollup_entry(conn, dialect, os.path.join(tmp, "bench.db"), n_rows, seed, now,
+                                         repeats, batch_size))
+        finally:
+            if dialect != "sqlite":
+                for table in (LEGACY, MANAGED):
+                    cur.execute(f"DROP TABLE IF EXISTS {table}")
+            cur.close()
+            conn.close()
+    return results
@@ -0,0 +1,75 @@
+"""predict_proba microbenchmark over batch sizes.
+
+For each batch size the same synthetic rows are scored by
+
+* sklearn   -- bundle["model"].predict_proba on a DataFrame (the original path),
+* fast_path -- the registry's ModelVersion (compiled encoder + forest),
+
+and the per-call latency distribution and rows/s are recorded.  Both paths are
+checked to return the same probabilities.
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import transactions
+from registry import load_version
+from scoring import FEATURE_COLUMNS
+
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def _repeats(batch_size, budget_rows):
+    # enough calls for stable percentiles on small batches, a few on large ones
+    return int(min(max(budget_rows // batch_size, 3), 500))
+
+
+def time_calls(fn, repeats, warmup=2):
+    """Seconds per call for `repeats` calls of fn()."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return np.array(samples)
+
+
+def summarize(samples, rows_per_call):
+    ms = samples * 1000
+    return {
+        "calls": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "rows_per_second": round(rows_per_call / float(samples.mean()), 1),
+    }
+
+
+def run(model_path="fraud_rf_pipeline.joblib", batch_sizes=BATCH_SIZES, budget_rows=200000, seed=0):
+    """List of {path, batch_size, p50_ms, ..., rows_per_second} entries."""
+    version = load_version(model_path)
+    version.warm_up()
+    data = transactions(max(batch_sizes), seed=seed)[FEATURE_COLUMNS]
+    paths = {"sklearn": lambda X: version.model.predict_proba(X)[:, 1]}
+    if version.engine is not None:
+        paths["fast_path"] = version.predict_frame
+        paths["fast_path_records"] = lambda X: version.predict_records(X.to_dict("records"))
+
+    results = []
+    for batch_size in batch_sizes:
+        X = data.head(batch_size)
+        expected = paths["sklearn"](X)
+        for name, fn in paths.items():
+            if name == "fast_path_records" and batch_size > 1000:
+                continue        # the record path is only used for small API batches
+            assert np.array_equal(fn(X), expected), f"{name} differs from sklearn at {batch_size} rows"
+            samples = time_calls(lambda: fn(X), _repeats(batch_size, budget_rows))
+            entry = {"path": name, "batch_size": batch_size, **summarize(samples, batch_size)}
+            results.append(entry)
+            print(f"{name:<18} {batch_size:>7,} rows  p50 {entry['p50_ms']:>10.3f} ms  "
+                  f"p99 {entry['p99_ms']:>10.3f} ms  {entry['rows_per_second']:>12,.0f} rows/s")
+    return results
@@ -0,0 +1,103 @@
+"""Synthetic transactions shaped like the customers / accounts / transactions tables.
+
+raw_transactions() returns the columns of the notebook's SQL join;
+model_features() derives the 15 model inputs from them with features.py,
+exactly as score_file.py does for real exports.
+"""
+import numpy as np
+import pandas as pd
+
+from features import engineer_features
+from scoring import FEATURE_COLUMNS
+
+
+# (city, state) pairs as they appear in the customers table
+CITIES = [
+    ("Mumbai", "Maharashtra"), ("Delhi", "Delhi"), ("Bengaluru", "Karnataka"),
+    ("Hyderabad", "Telangana"), ("Ahmedabad", "Gujarat"), ("Pune", "Maharashtra"),
+    ("Kochi", "Kerala"), ("Kolkata", "West Bengal"), ("Jaipur", "Rajasthan"),
+    ("Chennai", "Tamil Nadu"),
+]
+ACCOUNT_TYPES = ["savings", "current", "salary", "credit_card", "loan"]
+# txn_type -> channels it is made through
+TXN_CHANNELS = {
+    "POS": ["card"],
+    "ATM": ["atm"],
+    "ONLINE": ["online", "mobile"],
+    "UPI": ["mobile"],
+    "NEFT": ["online", "mobile"],
+}
+
+
+def raw_transactions(n_rows, n_accounts=None, seed=0):
+    """Joined transaction rows: ids, txn_timestamp, amount, txn_type, channel, is_international,
+    label_fraud, account_type, balance, gender, city, state, dob."""
+    rng = np.random.default_rng(seed)
+    n_accounts = n_accounts or max(n_rows // 20, 1)
+
+    # one customer per account
+    city_idx = rng.integers(len(CITIES), size=n_accounts)
+    accounts = pd.DataFrame({
+        "account_id": np.arange(1, n_accounts + 1),
+        "account_type": rng.choice(ACCOUNT_TYPES, n_accounts, p=[0.5, 0.15, 0.2, 0.1, 0.05]),
+        "balance": np.round(rng.lognormal(10.5, 1.0, n_accounts), 2),
+        "gender": rng.choice(["M", "F"], n_accounts),
+        "city": [CITIES[i][0] for i in city_idx],
+        "state": [CITIES[i][1] for i in city_idx],
+        "dob": pd.to_datetime("1970-01-01") + pd.to_timedelta(rng.integers(0, 35 * 365, n_accounts), unit="D"),
+    })
+
+    # a few busy accounts, many quiet ones
+    account = np.minimum(rng.zipf(1.3, n_rows), n_accounts) - 1
+    account = (account + rng.integers(n_accounts, size=n_rows) * (rng.random(n_rows) < 0.7)) % n_accounts
+    txn_types = list(TXN_CHANNELS)
+    txn_type = rng.choice(txn_types, n_rows, p=[0.3, 0.15, 0.25, 0.25, 0.05])
+    channel = np.empty(n_rows, dtype=object)
+    for t, channels in TXN_CHANNELS.items():
+        mask = txn_type == t
+        channel[mask] = rng.choice(channels, int(mask.sum()))
+    seconds = rng.integers(0, 2 * 365 * 86400, n_rows)
+    timestamp = pd.to_datetime("2023-01-01") + pd.to_timedelta(seconds, unit="s")
+    amount = np.round(rng.lognormal(7.5, 1.3, n_rows), 2)
+    international = rng.random(n_rows) < 0.05
+
+    # fraud is more likely for large, night-time and international transactions
+    hour = timestamp.hour.to_numpy()
+    risk = (0.005 + 0.05 * (amount > 50000) + 0.03 * ((hour < 6) | (hour > 22)) + 0.04 * international)
+    label = (rng.random(n_rows) < risk).astype(int)
+
+    txns = pd.DataFrame({
+        "transaction_id": np.arange(1, n_rows + 1),
+        "account_id": account + 1,
+        "txn_timestamp": timestamp,
+        "amount": amount,
+        "txn_type": txn_type,
+        "channel": channel,
+        "is_international": np.where(international, "Y", "N"),
+        "label_fraud": label,
+    })
+    return txns.merge(accounts, on="account_id", how="left", sort=False)
+
+
+def model_features(raw):
+    """Model inputs (FEATURE_COLUMNS) plus account_id / label_fraud for raw joined rows."""
+    df = engineer_features(raw)
+    return df[["account_id", "label_fraud"] + FEATURE_COLUMNS].reset_index(drop=True)
+
+
+def transactions(n_rows, seed=0):
+    """n_rows synthetic transactions as model features."""
+    return model_features(raw_transactions(n_rows, seed=seed))
+
+
+def payloads(n_rows, seed=0):
+    """JSON-ready request bodies (dicts of the 15 model features)."""
+    X = transactions(n_rows, seed)[FEATURE_COLUMNS]
+    return X.astype({col: float for col in X.columns if X[col].dtype.kind in "iuf"}).to_dict("records")
+
+
+if __name__ == "__main__":
+    df = transactions(10000)
+    print(df.head())
+    print(df.describe(include="all").T[["count", "mean", "unique", "top"]])
+    print("fraud rate:", df["label_fraud"].mean())
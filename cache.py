@@ -0,0 +1,209 @@
+"""Prediction cache for repeated identical transactions.
+
+Gateway retries and duplicate submissions send the same 15 features again and
+again; the cache answers them without walking 300 trees.  Keys are a 16-byte
+BLAKE2b digest of the canonical feature values (numerics as float64,
+categoricals as UTF-8) together with the model version and threshold, so a
+new model or threshold can never be served a stale probability.  On top of
+that, PredictionCache.invalidate() drops everything when the registry swaps
+versions, returning the memory at once.
+
+Backends share a two-method interface, get_many(keys) and set_many(items):
+
+* LocalBackend  -- in-process LRU with TTL and an entry bound,
+* RedisBackend  -- shared across workers/hosts (optional `redis` package).
+
+A backend's `blocking` flag says whether it waits on the network; the async
+scoring path only calls blocking backends from its executor.
+
+LocalBackend doubles as the stand-in for a shared backend in development.
+"""
+import hashlib
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+
+# ---------- Keys ----------
+
+def _prefix(version, threshold):
+    return f"{version}|{threshold!r}|".encode()
+
+
+def record_key(record, version, threshold):
+    """Cache key of one validated record."""
+    h = hashlib.blake2b(_prefix(version, threshold), digest_size=16)
+    h.update(struct.pack(f"{len(NUMERIC_FEATURES)}d", *[record[c] for c in NUMERIC_FEATURES]))
+    h.update("\x1f".join(record[c] for c in CATEGORICAL_FEATURES).encode())
+    return h.digest()
+
+
+def frame_keys(X, version, threshold):
+    """Cache keys of every row of a validated DataFrame (same keys as record_key)."""
+    prefix = _prefix(version, threshold)
+    numeric = np.ascontiguousarray(X[NUMERIC_FEATURES].to_numpy(dtype=np.float64))
+    categorical = zip(*[X[c].tolist() for c in CATEGORICAL_FEATURES])
+    keys = []
+    for row, cats in zip(numeric, categorical):
+        h = hashlib.blake2b(prefix, digest_size=16)
+        h.update(row.tobytes())
+        h.update("\x1f".join(cats).encode())
+        keys.append(h.digest())
+    return keys
+
+
+# ---------- Backends ----------
+
+class LocalBackend:
+    """Bounded in-process LRU with a per-entry TTL."""
+
+    blocking = False
+
+    def __init__(self, max_entries=100000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()      # key -> (expires_at, probability)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    out.append(None)
+                elif entry[0] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    out.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    out.append(entry[1])
+        return out
+
+    def set_many(self, items):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "local", "size": len(self._data), "max_entries": self.max_entries,
+                    "ttl_seconds": self.ttl, "evictions": self.evictions, "expirations": self.expirations}
+
+
+class RedisBackend:
+    """Shared cache in Redis; entries expire by TTL, memory is bounded by Redis maxmemory."""
+
+    # every call is a network round trip
+    blocking = True
+
+    def __init__(self, url="redis://localhost:6379/0", ttl_seconds=300.0, prefix="fraud:prob:"):
+        import redis        # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl_seconds
+        self.prefix = prefix.encode()
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        values = self._client.mget([self.prefix + key for key in keys])
+        return [None if v is None else struct.unpack("d", v)[0] for v in values]
+
+    def set_many(self, items):
+        pipe = self._client.pipeline(transaction=False)
+        for key, value in items:
+            pipe.set(self.prefix + key, struct.pack("d", value), px=int(self.ttl * 1000))
+        pipe.execute()
+
+    def clear(self):
+        # keys carry the model version and threshold, so old entries are unreachable
+        # and simply expire; nothing to delete
+        pass
+
+    def stats(self):
+        return {"backend": "redis", "ttl_seconds": self.ttl}
+
+
+# ---------- Cache ----------
+
+class PredictionCache:
+    """Probability cache in front of the model, with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.blocking = backend.blocking
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    def lookup(self, record, model):
+        """(key, cached probability or None) for one validated record under `model`."""
+        key = record_key(record, model.version, model.threshold)
+        return key, self.get_many([key])[0]
+
+    def lookup_frame(self, X, model):
+        """(keys, cached probabilities or None) for every row of a validated DataFrame."""
+        keys = frame_keys(X, model.version, model.threshold)
+        return keys, self.get_many(keys)
+
+    def get_many(self, keys):
+        """Cached probabilities (None for misses); backend errors count as misses."""
+        try:
+            values = self.backend.get_many(keys)
+        except Exception as e:
+            print("Prediction cache read failed:", e)
+            values = [None] * len(keys)
+            with self._lock:
+                self.errors += 1
+        found = sum(v is not None for v in values)
+        with self._lock:
+            self.hits += found
+            self.misses += len(keys) - found
+        return values
+
+    def set_many(self, items):
+        try:
+            self.backend.set_many(items)
+        except Exception as e:
+            print("Prediction cache write failed:", e)
+            with self._lock:
+                self.errors += 1
+
+    def invalidate(self, *_):
+        """Drop every entry (registered as a model-swap listener)."""
+        self.backend.clear()
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            snapshot = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "errors": self.errors,
+                "invalidations": self.invalidations,
+            }
+        snapshot.update(self.backend.stats())
+        return snapshot
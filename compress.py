@@ -0,0 +1,263 @@
+"""Smaller, faster serving bundles from a trained forest, with accuracy guardrails.
+
+    python compress.py fraud_rf_pipeline.joblib fraud_rf_compact.joblib
+    python compress.py model.joblib compact.joblib --data holdout.csv --tolerance 0.01 --report report.json
+
+The notebook's forest (300 unbounded trees) is shrunk along four axes:
+
+* fewer trees        -- the first N estimators are kept (trees are i.i.d.),
+* depth cap          -- nodes below the cap are cut off; the node at the cap
+                        becomes a leaf with the class distribution it already
+                        stores, and unreachable nodes are dropped,
+* float32 thresholds -- rounded down to float32, which is exact for the
+                        float32 inputs the trees see (fast_forest.floor_float32),
+* leaf quantization  -- node probabilities rounded to 2**bits - 1 levels.
+
+Every (trees, depth) candidate is scored on a held-out set and accepted only
+if recall and precision at the bundle threshold stay within `tolerance`
+(absolute) of the original.  Of the accepted ones the cheapest to traverse
+(trees x depth, then total nodes) wins.  The result is written in the usual
+{"model", "threshold"} bundle format -- plus a "compression" entry
+describing it -- so api.py, score_file.py and the registry load it as is.
+
+The held-out set is either a --data file (CSV/NDJSON with raw or model
+feature columns and label_fraud) or, by default, the notebook's 30% test
+split of the bundled SQL dump.
+"""
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+from sklearn.metrics import precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import Tree
+
+from fast_forest import _split_pipeline, floor_float32
+from features import engineer_features
+from registry import load_version
+from scoring import FEATURE_COLUMNS
+from sql_snapshot import joined_transactions
+
+
+TREE_GRID = [300, 200, 150, 100, 75, 50, 25]
+DEPTH_GRID = [None, 20, 16, 12, 10, 8, 6]
+
+
+# ---------- Tree surgery ----------
+
+def compress_tree(tree, max_depth=None, leaf_bits=8, class_index=1):
+    """A new sklearn Tree: depth-capped, float32 thresholds, quantized node values."""
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    left, right = nodes["left_child"], nodes["right_child"]
+
+    # pre-order walk (sklearn's own node order) keeping nodes down to max_depth
+    order, depths, stack = [], [], [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        order.append(node)
+        depths.append(depth)
+        if left[node] != -1 and (max_depth is None or depth < max_depth):
+            stack.append((right[node], depth + 1))
+            stack.append((left[node], depth + 1))
+    order = np.array(order)
+    new_index = np.full(len(nodes) + 1, -1)     # index -1 (a leaf's child) maps to -1
+    new_index[order] = np.arange(len(order))
+
+    kept = nodes[order].copy()
+    kept["left_child"] = new_index[kept["left_child"]]
+    kept["right_child"] = new_index[kept["right_child"]]
+    cut = kept["left_child"] == -1
+    kept["right_child"][cut] = -1
+    kept["feature"][cut] = -2
+    kept["threshold"][cut] = -2.0
+    kept["missing_go_to_left"][cut] = 0
+    kept["threshold"][~cut] = floor_float32(kept["threshold"][~cut])
+
+    kept_values = values[order].copy()
+    if leaf_bits:
+        # probabilities of a binary node: quantize the positive class, the other is 1 - p
+        levels = 2 ** leaf_bits - 1
+        p = kept_values[:, 0, class_index] / kept_values[:, 0, :].sum(axis=1)
+        p = np.round(p * levels) / levels
+        kept_values[:, 0, class_index] = p
+        kept_values[:, 0, 1 - class_index] = 1.0 - p
+
+    new = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    new.__setstate__({"max_depth": int(max(depths)), "node_count": len(order),
+                      "nodes": kept, "values": kept_values})
+    return new
+
+
+def compress_pipeline(pipeline, n_trees=None, max_depth=None, leaf_bits=8):
+    """Copy of the pipeline whose forest is compressed; the preprocessing steps are shared."""
+    _, forest = _split_pipeline(pipeline)
+    if forest.n_classes_ != 2:
+        raise ValueError("leaf quantization assumes a binary classifier")
+    class_index = list(forest.classes_).index(1)
+    estimators = []
+    for estimator in forest.estimators_[:n_trees]:
+        estimator = copy.copy(estimator)
+        estimator.tree_ = compress_tree(estimator.tree_, max_depth, leaf_bits, class_index)
+        estimators.append(estimator)
+    forest = copy.copy(forest)
+    forest.estimators_ = estimators
+    forest.n_estimators = len(estimators)
+    model = copy.copy(pipeline)
+    model.steps = list(pipeline.steps[:-1]) + [(pipeline.steps[-1][0], forest)]
+    return model
+
+
+def forest_size(pipeline):
+    _, forest = _split_pipeline(pipeline)
+    trees = [e.tree_ for e in forest.estimators_]
+    return {
+        "trees": len(trees),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "nodes": int(sum(t.node_count for t in trees)),
+    }
+
+
+# ---------- Held-out data and metrics ----------
+
+def holdout_set(data_path=None, sql_dump="Banking _Fraud Detection.sql", test_size=0.3, seed=42):
+    """(X, y) to judge compression on: a labelled file, or the notebook's test split of the dump."""
+    if data_path:
+        if data_path.endswith((".ndjson", ".jsonl", ".json")):
+            raw = pd.read_json(data_path, lines=True, dtype=False)
+        else:
+            raw = pd.read_csv(data_path)
+        df = raw if set(FEATURE_COLUMNS) <= set(raw.columns) else engineer_features(raw)
+        return df[FEATURE_COLUMNS], df["label_fraud"].to_numpy()
+    df = engineer_features(joined_transactions(sql_dump))
+    _, X_test, _, y_test = train_test_split(
+        df[FEATURE_COLUMNS], df["label_fraud"], test_size=test_size, random_state=seed,
+        stratify=df["label_fraud"]
+    )
+    return X_test, y_test.to_numpy()
+
+
+def evaluate(probs, y, threshold):
+    predicted = (probs >= threshold).astype(int)
+    return {
+        "recall": float(recall_score(y, predicted, zero_division=0)),
+        "precision": float(precision_score(y, predicted, zero_division=0)),
+        "flagged": int(predicted.sum()),
+        "roc_auc": float(roc_auc_score(y, probs)) if len(set(y)) == 2 else None,
+    }
+
+
+# ---------- Search ----------
+
+def search(pipeline, threshold, X, y, tolerance=0.02, trees=TREE_GRID, depths=DEPTH_GRID, leaf_bits=8):
+    """(best pipeline, its summary, baseline metrics, all candidates) under the recall/precision guardrail."""
+    baseline = evaluate(pipeline.predict_proba(X)[:, 1], y, threshold)
+    full_trees = forest_size(pipeline)["trees"]
+    candidates, best, best_model = [], None, None
+    for depth in depths:
+        # compress every tree once per depth, then take prefixes for the tree counts
+        deep = compress_pipeline(pipeline, None, depth, leaf_bits)
+        _, forest = _split_pipeline(deep)
+        for n_trees in sorted({min(n, full_trees) for n in trees}, reverse=True):
+            model = copy.copy(deep)
+            small = copy.copy(forest)
+            small.estimators_ = forest.estimators_[:n_trees]
+            small.n_estimators = n_trees
+            model.steps = list(deep.steps[:-1]) + [(deep.steps[-1][0], small)]
+            metrics = evaluate(model.predict_proba(X)[:, 1], y, threshold)
+            size = forest_size(model)
+            accepted = (abs(metrics["recall"] - baseline["recall"]) <= tolerance
+                        and abs(metrics["precision"] - baseline["precision"]) <= tolerance)
+            entry = {"n_trees": n_trees, "depth_cap": depth, **size, **metrics, "accepted": accepted}
+            candidates.append(entry)
+            cost = (size["trees"] * size["max_depth"], size["nodes"])
+            if accepted and (best is None or cost < (best["trees"] * best["max_depth"], best["nodes"])):
+                best, best_model = entry, model
+    return best_model, best, baseline, candidates
+
+
+# ---------- Side-by-side report ----------
+
+def profile_bundle(path, X, repeats=200):
+    """Size on disk, load+compile time and single-row / 1000-row latency of a bundle."""
+    start = time.perf_counter()
+    version = load_version(path)
+    version.warm_up()
+    load_seconds = time.perf_counter() - start
+    records = X.head(1).to_dict("records")
+    rows = pd.concat([X] * (1000 // len(X) + 1), ignore_index=True).head(1000)
+
+    def p50(fn, n):
+        samples = []
+        for _ in range(n):
+            t = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t)
+        return round(float(np.median(samples)) * 1000, 4)
+
+    return {
+        "path": path,
+        "file_mb": round(os.path.getsize(path) / 2**20, 3),
+        "load_seconds": round(load_seconds, 4),
+        "fast_path": version.engine is not None,
+        "single_row_p50_ms": p50(lambda: version.predict_records(records), repeats),
+        "batch_1000_p50_ms": p50(lambda: version.predict_frame(rows), max(repeats // 20, 3)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress a fraud model bundle under accuracy guardrails.")
+    parser.add_argument("input", nargs="?", default="fraud_rf_pipeline.joblib")
+    parser.add_argument("output", nargs="?", default="fraud_rf_compact.joblib")
+    parser.add_argument("--data", help="labelled held-out CSV/NDJSON (default: test split of the SQL dump)")
+    parser.add_argument("--sql-dump", default="Banking _Fraud Detection.sql")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="allowed absolute change of recall and precision at the bundle threshold")
+    parser.add_argument("--trees", type=int, nargs="+", default=TREE_GRID)
+    parser.add_argument("--depths", type=int, nargs="+", default=None, help="depth caps (default: none..6)")
+    parser.add_argument("--leaf-bits", type=int, default=8, help="0 keeps full-precision node values")
+    parser.add_argument("--report", help="write the full report (all candidates) as JSON")
+    args = parser.parse_args()
+
+    bundle = load(args.input)
+    threshold = float(bundle["threshold"])
+    X, y = holdout_set(args.data, args.sql_dump)
+    print(f"held-out set: {len(y)} rows, {int(y.sum())} fraud; threshold {threshold}")
+
+    depths = DEPTH_GRID if args.depths is None else args.depths
+    model, best, baseline, candidates = search(
+        bundle["model"], threshold, X, y, args.tolerance, args.trees, depths, args.leaf_bits
+    )
+    for c in candidates:
+        print(f"  trees {c['n_trees']:>3}  depth cap {str(c['depth_cap']):>4}  nodes {c['nodes']:>7,}  "
+              f"recall {c['recall']:.4f}  precision {c['precision']:.4f}  {'ok' if c['accepted'] else '--'}")
+    if model is None:
+        print("No candidate stays within the tolerance; nothing written")
+        return
+
+    compression = {"n_trees": best["n_trees"], "depth_cap": best["depth_cap"], "leaf_bits": args.leaf_bits,
+                   "float32_thresholds": True, "tolerance": args.tolerance, "source": args.input}
+    dump({"model": model, "threshold": threshold, "compression": compression}, args.output)
+
+    original = {**forest_size(bundle["model"]), **baseline, **profile_bundle(args.input, X)}
+    compact = {**forest_size(model), **evaluate(model.predict_proba(X)[:, 1], y, threshold),
+               **profile_bundle(args.output, X)}
+    print(f"\n{'':<20}{'original':>14}{'compressed':>14}")
+    for key in ["trees", "max_depth", "nodes", "file_mb", "load_seconds", "single_row_p50_ms",
+                "batch_1000_p50_ms", "recall", "precision", "roc_auc"]:
+        before, after = (f"{v:.4f}" if isinstance(v, float) else str(v) for v in (original[key], compact[key]))
+        print(f"{key:<20}{before:>14}{after:>14}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"original": original, "compressed": compact, "compression": compression,
+                       "candidates": candidates}, f, indent=2)
+        print("report written to", args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Score and feature drift of live traffic against the bundle's baseline, kept incrementally.
+
+The notebook fixed FINAL_THRESHOLD = 0.40 from histograms of one static test
+split.  This module keeps the same kind of histograms for live traffic and
+compares them with that split:
+
+* baseline   `<bundle>.baseline.json` next to the bundle (train.py writes it;
+             `python drift.py baseline <bundle>` builds one for an existing
+             bundle from the notebook's 30% test split).  Numeric features and
+             the fraud probability get quantile bin edges (10 and 20 bins),
+             categoricals their 50 most frequent values plus "other".
+             Tied quantiles leave numeric bins empty; those are merged into
+             a neighbour so no baseline bin is empty.
+* live       DriftMonitor bins every scored row into those bins.  Counts sit
+             in a ring of time slices (default 24 x 1 h), so memory is fixed
+             and the report covers a sliding window.
+* report     PSI per feature and for the score, KS (largest CDF gap on the
+             bin grid) for numeric features and the score, the mean score
+             and the flag rate next to their baseline values.
+
+The scoring path only appends (record, probability, decision) to a list
+under a lock; a background thread bins the list once a second with NumPy.
+When the thread falls behind, rows beyond `max_pending` are skipped and
+counted rather than slowing requests down.
+
+PSI is computed with half a count added to every bin of both histograms, so
+an empty bin cannot blow it up.  PSI < 0.1 is reported as "stable", < 0.25 as
+"moderate", above as "drift".  A baseline of fewer than `min_baseline_rows`
+rows (the notebook's 168-row test split, say) is too noisy to compare with:
+the report then gives the mean score and flag rate only, no PSI / KS.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from scoring import CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES
+
+
+FEATURE_BINS = 10
+SCORE_BINS = 20
+TOP_VALUES = 50
+PSI_MODERATE, PSI_DRIFT = 0.1, 0.25
+# pseudo-count added to every bin of both histograms before PSI
+PSI_SMOOTHING = 0.5
+# smallest baseline PSI / KS are reported against
+MIN_BASELINE_ROWS = 1000
+
+
+# ---------- Baseline ----------
+
+def baseline_path(bundle_path):
+    return os.path.splitext(bundle_path)[0] + ".baseline.json"
+
+
+def _edges(values, bins):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return []
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])).tolist()
+
+
+def _numeric_counts(values, edges):
+    values = np.asarray(values, dtype=np.float64)
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def _merge_empty(edges, counts):
+    """Drop the edges of empty bins, folding each into its neighbour; returns (edges, counts)."""
+    edges, counts = list(edges), list(counts)
+    i = 0
+    while len(counts) > 1 and i < len(counts):
+        if counts[i]:
+            i += 1
+        elif i < len(edges):
+            # bin i ends at edges[i]: without it, bin i is part of bin i + 1
+            del edges[i], counts[i]
+        else:
+            del edges[i - 1], counts[i]
+    return edges, counts
+
+
+def _merge_numeric(baseline):
+    for spec in [baseline["score"], *baseline["numeric"].values()]:
+        spec["edges"], spec["counts"] = _merge_empty(spec["edges"], spec["counts"])
+    return baseline
+
+
+def _categorical_counts(values, categories):
+    codes = pd.Categorical(values, categories=categories).codes.astype(np.intp)
+    codes[codes < 0] = len(categories)      # unseen -> "other"
+    return np.bincount(codes, minlength=len(categories) + 1)
+
+
+def build_baseline(X, probabilities, threshold, model_version=None):
+    """Baseline histograms from a model-feature frame and its scores (the held-out split)."""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    baseline = {
+        "model_version": model_version,
+        "rows": len(X),
+        "threshold": float(threshold),
+        "mean_score": float(probabilities.mean()),
+        "flag_rate": float((probabilities >= threshold).mean()),
+        "score": {"edges": _edges(probabilities, SCORE_BINS)},
+        "numeric": {},
+        "categorical": {},
+    }
+    baseline["score"]["counts"] = _numeric_counts(probabilities, baseline["score"]["edges"]).tolist()
+    for col in NUMERIC_FEATURES:
+        edges = _edges(X[col], FEATURE_BINS)
+        baseline["numeric"][col] = {"edges": edges, "counts": _numeric_counts(X[col], edges).tolist()}
+    for col in CATEGORICAL_FEATURES:
+        values = X[col].astype(str).value_counts().index[:TOP_VALUES].tolist()
+        baseline["categorical"][col] = {
+            "values": values, "counts": _categorical_counts(X[col].astype(str), values).tolist()
+        }
+    return _merge_numeric(baseline)
+
+
+def save_baseline(baseline, bundle_path):
+    path = baseline_path(bundle_path)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=1)
+    return path
+
+
+def load_baseline(bundle_path):
+    """The baseline saved next to `bundle_path`, or None."""
+    path = baseline_path(bundle_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        # files written before empty bins were merged get the same treatment here
+        return _merge_numeric(json.load(f))
+
+
+# ---------- Comparison ----------
+
+def psi(expected, actual):
+    """Population stability index of two histograms over the same bins (additively smoothed)."""
+    e = np.asarray(expected, dtype=np.float64) + PSI_SMOOTHING
+    a = np.asarray(actual, dtype=np.float64) + PSI_SMOOTHING
+    e, a = e / e.sum(), a / a.sum()
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected, actual):
+    """Largest gap between the two cumulative distributions on the bin grid."""
+    e = np.cumsum(expected) / max(np.sum(expected), 1)
+    a = np.cumsum(actual) / max(np.sum(actual), 1)
+    return float(np.max(np.abs(a - e)))
+
+
+def status(value):
+    return "stable" if value < PSI_MODERATE else "moderate" if value < PSI_DRIFT else "drift"
+
+
+# ---------- Live monitor ----------
+
+class DriftMonitor:
+    """Sliding-window histograms of live scores and features, compared with a baseline."""
+
+    def __init__(self, baseline, model_version=None, slice_seconds=3600, slices=24,
+                 max_pending=100000, interval=1.0, min_baseline_rows=MIN_BASELINE_ROWS):
+        self.slice_seconds = slice_seconds
+        self.min_baseline_rows = min_baseline_rows
+        self.slices = slices
+        self.max_pending = max_pending
+        self.interval = interval
+        self._stats = {"observed": 0, "binned": 0, "skipped": 0, "resets": 0}
+        self._start_worker()
+        self.set_baseline(baseline, model_version)
+        # threads do not survive fork (gunicorn --preload): start a fresh one in the child
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    def set_baseline(self, baseline, model_version=None):
+        """Compare with a new baseline from now on (drops the live counts)."""
+        layout, width = [], 0
+        if baseline is not None:
+            parts = [("score", "score", baseline["score"]["edges"])]
+            parts += [("numeric", col, spec["edges"]) for col, spec in baseline["numeric"].items()]
+            parts += [("categorical", col, spec["values"]) for col, spec in baseline["categorical"].items()]
+            for kind, name, bins in parts:
+                layout.append((kind, name, bins, width))
+                width += len(bins) + 1
+        with self._lock:
+            self.baseline = baseline
+            self.model_version = model_version
+            self._layout = layout
+            # per slice: every histogram side by side, then rows, flagged and the score sum
+            self._counts = np.zeros((self.slices, width + 3), dtype=np.float64)
+            self._epoch = np.full(self.slices, -1, dtype=np.int64)
+            self._pending, self._pending_rows = [], 0
+            self._stats["resets"] += 1
+
+    def on_model_swap(self, version):
+        """Registry listener: a new bundle brings its own baseline; a threshold change keeps counts."""
+        if version.version != self.model_version:
+            self.set_baseline(load_baseline(version.path), version.version)
+
+    def observe(self, record, probability, decision):
+        """Hot path: queue one scored record for binning."""
+        with self._lock:
+            if self._pending_rows < self.max_pending:
+                self._pending.append((record, probability, decision))
+                self._pending_rows += 1
+            else:
+                self._stats["skipped"] += 1
+
+    def observe_frame(self, X, probabilities, decisions):
+        """Queue a scored batch (validated frame) for binning, up to max_pending rows in all."""
+        with self._lock:
+            room = max(self.max_pending - self._pending_rows, 0)
+            n = len(X)
+            if n > room:
+                self._stats["skipped"] += n - room
+                if not room:
+                    return
+                X, probabilities, decisions = X.iloc[:room], probabilities[:room], decisions[:room]
+            self._pending.append((X, np.asarray(probabilities), np.asarray(decisions)))
+            self._pending_rows += len(X)
+
+    def flush(self):
+        """Bin everything queued so far into the current slice."""
+        with self._lock:
+            pending, self._pending, self._pending_rows = self._pending, [], 0
+            layout = self._layout
+        if not pending or not layout:
+            return 0
+        records = [p for p in pending if isinstance(p[0], dict)]
+        frames = [p for p in pending if not isinstance(p[0], dict)]
+        if records:
+            frames.append((pd.DataFrame([r for r, _, _ in records]),
+                           np.array([p for _, p, _ in records], dtype=np.float64),
+                           np.array([d for _, _, d in records])))
+        row = np.zeros(self._counts.shape[1])
+        rows = 0
+        for X, probs, decisions in frames:
+            for kind, name, bins, first in layout:
+                if kind == "categorical":
+                    counts = _categorical_counts(X[name].astype(str), bins)
+                else:
+                    counts = _numeric_counts(probs if kind == "score" else X[name], bins)
+                row[first:first + len(bins) + 1] += counts
+            row[-3] += len(probs)
+            row[-2] += int(np.sum(decisions))
+            row[-1] += float(np.sum(probs))
+            rows += len(probs)
+        epoch = int(time.time() // self.slice_seconds)
+        with self._lock:
+            if layout is not self._layout:
+                return 0        # baseline swapped while binning
+            slot = epoch % self.slices
+            if self._epoch[slot] != epoch:
+                self._counts[slot] = 0
+                self._epoch[slot] = epoch
+            self._counts[slot] += row
+            self._stats["observed"] += rows
+            self._stats["binned"] += 1
+        return rows
+
+    def report(self):
+        """PSI / KS per feature and for the score over the window, with the baseline's values."""
+        epoch = int(time.time() // self.slice_seconds)
+        with self._lock:
+            baseline, layout = self.baseline, self._layout
+            live = self._counts[self._epoch > epoch - self.slices].sum(axis=0)
+        result = {
+            "model_version": self.model_version,
+            "window_hours": round(self.slices * self.slice_seconds / 3600, 2),
+            "rows": int(live[-3]) if len(live) else 0,
+        }
+        if baseline is None:
+            return dict(result, baseline=None)
+        rows = result["rows"]
+        result.update({
+            "baseline_rows": baseline["rows"],
+            "baseline_matches_model": baseline.get("model_version") in (None, self.model_version),
+            "mean_score": round(live[-1] / rows, 4) if rows else None,
+            "baseline_mean_score": round(baseline["mean_score"], 4),
+            "flag_rate": round(live[-2] / rows, 4) if rows else None,
+            "baseline_flag_rate": round(baseline["flag_rate"], 4),
+        })
+        if baseline["rows"] < self.min_baseline_rows:
+            result["insufficient_baseline"] = True
+            return result
+        features, drifted = {}, []
+        for kind, name, bins, first in layout:
+            actual = live[first:first + len(bins) + 1]
+            expected = (baseline["score"] if kind == "score" else baseline[kind][name])["counts"]
+            entry = {"psi": round(psi(expected, actual), 4) if rows else None}
+            if kind != "categorical":
+                entry["ks"] = round(ks(expected, actual), 4) if rows else None
+            entry["status"] = status(entry["psi"]) if rows else None
+            if entry["status"] == "drift":
+                drifted.append(name)
+            if kind == "score":
+                result["score"] = entry
+            else:
+                features[name] = entry
+        result["features"] = features
+        result["drifted"] = drifted
+        return result
+
+    def close(self):
+        self._stop.set()
+        self._worker.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = self._pending_rows
+        return snapshot
+
+    # ---------- worker ----------
+
+    def _start_worker(self):
+        self._lock = threading.Lock()
+        self._pending, self._pending_rows = [], 0
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print("Drift binning failed:", e)
+
+
+def main():
+    from joblib import load
+    from sklearn.model_selection import train_test_split
+
+    from registry import bundle_version
+    from train import StageReport, load_training_frame, source_chunks
+
+    parser = argparse.ArgumentParser(description="Build the drift baseline saved next to a model bundle.")
+    parser.add_argument("command", choices=["baseline"])
+    parser.add_argument("bundle", nargs="?", default="fraud_rf_pipeline.joblib")
+    parser.add_argument("--source", default="Banking _Fraud Detection.sql",
+                        help="labelled data the bundle was trained on (a .sql dump, .parquet or CSV/NDJSON)")
+    parser.add_argument("--test-size", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bundle = load(args.bundle)
+    df, _ = load_training_frame(source_chunks(args.source, 100000, None), StageReport())
+    y = df.pop("label_fraud")
+    # the same held-out split train.py evaluates on
+    _, X_test = train_test_split(df[FEATURE_COLUMNS], test_size=args.test_size, random_state=args.seed, stratify=y)
+    probabilities = bundle["model"].predict_proba(X_test)[:, 1]
+    baseline = build_baseline(X_test, probabilities, bundle["threshold"], bundle_version(args.bundle))
+    print(f"baseline of {len(X_test):,} rows, mean score {baseline['mean_score']:.4f}, "
+          f"flag rate {baseline['flag_rate']:.4f}, written to {save_baseline(baseline, args.bundle)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Compiled fast-path inference for the fraud pipeline.
+
+At startup the sklearn pipeline from fraud_rf_pipeline.joblib is flattened into
+plain NumPy arrays:
+
+* a category -> column index for every one-hot encoded input, plus the
+  positions of the passthrough numeric columns, and
+* every tree of the forest concatenated into one set of node arrays
+  (feature, threshold, left, right, leaf probability).
+
+Scoring then needs no pandas and no ColumnTransformer.  Small batches (the
+single-transaction API traffic) walk all trees at once in NumPy; the arithmetic
+mirrors sklearn exactly (inputs cast to float32, `x <= threshold` splits --
+thresholds are rounded down to float32, which decides every float32 input the
+same way -- per-tree normalised leaf probabilities summed in tree order, then
+divided by the number of trees), so results are bit-for-bit equal to
+`bundle["model"].predict_proba`.  Large batches hand the pre-encoded matrix to
+the forest's own C traversal, which wins once its fixed per-call cost is
+amortised.
+
+Run `python fast_forest.py` to check parity and speed against sklearn.
+"""
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+
+# rows scored per NumPy traversal block; bounds the (rows x trees) working arrays
+BLOCK_SIZE = 256
+
+# above this many rows the forest's own C traversal is faster than NumPy
+FOREST_CROSSOVER_ROWS = 128
+
+
+class CompiledPipeline:
+    """Flattened preprocessor + forest that reproduces predict_proba[:, 1]."""
+
+    def __init__(self, pipeline, positive_class=1):
+        preprocess, forest = _split_pipeline(pipeline)
+        self._compile_preprocessor(preprocess)
+        self._compile_forest(forest, positive_class)
+
+    # ---------- compilation ----------
+
+    def _compile_preprocessor(self, preprocess):
+        self.categorical = []    # (column, {category: output column index}, categories, output columns)
+        self.numeric = []        # (column, output column index)
+        for name, transformer, columns in preprocess.transformers_:
+            if name == "remainder" and transformer == "drop":
+                continue
+            block = preprocess.output_indices_[name]
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop is not None or getattr(transformer, "_infrequent_enabled", False):
+                    raise ValueError("OneHotEncoder with drop/infrequent categories is not supported")
+                offset = block.start
+                for column, categories in zip(columns, transformer.categories_):
+                    index = {cat: offset + i for i, cat in enumerate(categories.tolist())}
+                    outputs = np.arange(offset, offset + len(categories), dtype=np.intp)
+                    self.categorical.append((column, index, pd.Index(categories), outputs))
+                    offset += len(categories)
+            elif transformer == "passthrough" or _is_identity(transformer):
+                for i, column in enumerate(columns):
+                    self.numeric.append((column, block.start + i))
+            else:
+                raise ValueError(f"Unsupported transformer {name!r}: {transformer!r}")
+        self.n_features = max(s.stop for s in preprocess.output_indices_.values())
+        self.input_columns = [c for c, _ in self.numeric] + [c for c, *_ in self.categorical]
+        self._numeric_cols = np.array([i for _, i in self.numeric], dtype=np.intp)
+
+    def _compile_forest(self, forest, positive_class):
+        class_index = list(forest.classes_).index(positive_class)
+        self._forest = forest
+        self._class_index = class_index
+        features, thresholds, lefts, rights, leaf_values, missing_left = [], [], [], [], [], []
+        roots, offset, max_depth = [], 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+
+            # leaves point to themselves so a fixed number of steps lands every row on a leaf
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            missing_left.append(tree.missing_go_to_left.astype(bool))
+
+            # same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            leaf_values.append(value[:, class_index] / normalizer)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = floor_float32(np.concatenate(thresholds))
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.missing_go_to_left = np.concatenate(missing_left)
+        self.leaf_value = np.concatenate(leaf_values).astype(np.float64)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.is_split = self.left != np.arange(offset)
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+
+    # ---------- encoding ----------
+
+    def encode_records(self, records):
+        """Encode a list of raw-feature dicts into the model's float32 matrix."""
+        X = np.zeros((len(records), self.n_features), dtype=np.float32)
+        for r, record in enumerate(records):
+            row = X[r]
+            for column, i in self.numeric:
+                row[i] = float(record[column])
+            for column, index, _, _ in self.categorical:
+                i = index.get(record[column])
+                if i is not None:        # handle_unknown="ignore" -> all zeros
+                    row[i] = 1.0
+        return X
+
+    def encode_frame(self, df):
+        """Encode a DataFrame of raw features into the model's float32 matrix."""
+        n = len(df)
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+        if self.numeric:
+            X[:, self._numeric_cols] = df[[c for c, _ in self.numeric]].to_numpy(dtype=np.float64)
+        rows = np.arange(n)
+        for column, _, categories, outputs in self.categorical:
+            codes = categories.get_indexer(df[column].to_numpy(dtype=object))
+            known = codes >= 0
+            X[rows[known], outputs[codes[known]]] = 1.0
+        return X
+
+    # ---------- scoring ----------
+
+    def predict_encoded(self, X):
+        """Positive-class probability for an already encoded float32 matrix."""
+        if len(X) > FOREST_CROSSOVER_ROWS:
+            return self._forest.predict_proba(X)[:, self._class_index]
+        return self.traverse(X)
+
+    def traverse(self, X):
+        """Walk the flattened trees in NumPy (used for small batches)."""
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            out[start:start + BLOCK_SIZE] = self._predict_block(block)
+        return out
+
+    def predict_records(self, records):
+        return self.predict_encoded(self.encode_records(records))
+
+    def predict_frame(self, df):
+        return self.predict_encoded(self.encode_frame(df))
+
+    def _predict_block(self, X):
+        n = len(X)
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        has_nan = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_go_to_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        # cumsum adds trees strictly left to right, like sklearn's accumulation
+        total = np.cumsum(self.leaf_value[node], axis=1)[:, -1]
+        return total / self.n_trees
+
+
+# ---------- helpers ----------
+
+def floor_float32(values):
+    """Largest float32 <= each value.
+
+    Inputs reach the trees as float32, and for a float32 x, `x <= t` holds
+    exactly when `x <= floor_float32(t)`, so float64 split thresholds can be
+    stored (and compared) as float32 without changing a single decision.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    over = rounded.astype(np.float64) > values
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
+
+def _is_identity(transformer):
+    return isinstance(transformer, FunctionTransformer) and transformer.func is None
+
+
+def _split_pipeline(pipeline):
+    """Return (ColumnTransformer, forest) from a preprocess [+ samplers] + forest pipeline."""
+    steps = [step for _, step in pipeline.steps]
+    preprocess, forest = steps[0], steps[-1]
+    if not isinstance(preprocess, ColumnTransformer):
+        raise ValueError("first pipeline step must be a ColumnTransformer")
+    if not isinstance(forest, RandomForestClassifier) or forest.n_outputs_ != 1:
+        raise ValueError("last pipeline step must be a single-output RandomForestClassifier")
+    for step in steps[1:-1]:
+        # resamplers such as SMOTE only act during fit
+        if not hasattr(step, "fit_resample"):
+            raise ValueError(f"Unsupported intermediate step: {step!r}")
+    return preprocess, forest
+
+
+def parity_sample(compiled, n_rows=2000, seed=0):
+    """Raw-feature rows that exercise every category and split thresholds exactly."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column, index, _, _ in compiled.categorical:
+        values = list(index) + ["__unknown__"]
+        data[column] = [values[i % len(values)] for i in rng.permutation(n_rows)]
+    for column, i in compiled.numeric:
+        split_values = compiled.threshold[(compiled.feature == i) & compiled.is_split]
+        if len(split_values):
+            picks = rng.choice(split_values, n_rows).astype(np.float32)
+            # values exactly on a threshold and one float32 step either side
+            picks = np.nextafter(picks, rng.choice([-np.inf, np.inf], n_rows).astype(np.float32))
+            picks[::3] = rng.choice(split_values, len(picks[::3])).astype(np.float32)
+            data[column] = picks.astype(np.float64)
+        else:
+            data[column] = rng.normal(size=n_rows)
+    return pd.DataFrame(data)[compiled.input_columns]
+
+
+def check_parity(pipeline, compiled, X):
+    """True when the compiled engine matches sklearn bit for bit on X."""
+    preprocess, forest = _split_pipeline(pipeline)
+
+    # encoding: identical to the ColumnTransformer output as the forest sees it (float32)
+    expected_X = np.asarray(preprocess.transform(X), dtype=np.float32)
+    if not (np.array_equal(expected_X, compiled.encode_frame(X))
+            and np.array_equal(expected_X, compiled.encode_records(X.to_dict("records")))):
+        return False
+
+    # traversal: n_jobs=1 keeps sklearn's tree accumulation order deterministic
+    reference = copy.copy(forest)
+    reference.n_jobs = 1
+    expected = reference.predict_proba(expected_X)[:, compiled._class_index]
+    return np.array_equal(expected, compiled.traverse(expected_X))
+
+
+def load_fast_path(pipeline, verify=True):
+    """Compile the pipeline, verify parity on a generated sample; None means use sklearn."""
+    try:
+        compiled = CompiledPipeline(pipeline)
+    except ValueError as e:
+        print("Fast path unavailable, using sklearn:", e)
+        return None
+    if verify and not check_parity(pipeline, compiled, parity_sample(compiled, n_rows=500)):
+        print("Fast path does not match sklearn output, using sklearn")
+        return None
+    return compiled
+
+
+if __name__ == "__main__":
+    from joblib import load
+
+    pipeline = load("fraud_rf_pipeline.joblib")["model"]
+    compiled = CompiledPipeline(pipeline)
+    X = parity_sample(compiled, n_rows=20000)
+    print("bit-for-bit parity on", len(X), "rows:", check_parity(pipeline, compiled, X))
+
+    for n_rows, repeat in [(1, 50), (32, 20), (20000, 3)]:
+        records = X.head(n_rows).to_dict("records")
+        frame = X.head(n_rows)
+        for label, fn in [
+            ("sklearn ", lambda: pipeline.predict_proba(pd.DataFrame(records))),
+            ("compiled", lambda: compiled.predict_records(records)),
+        ]:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            print(f"{label} {n_rows:>6} rows: {(time.perf_counter() - start) / repeat * 1000:.3f} ms")
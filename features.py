@@ -0,0 +1,126 @@
+"""Feature engineering from raw transaction columns, as done in the notebook.
+
+Raw columns (the notebook's SQL join): txn_timestamp, amount, txn_type, channel,
+is_international ("Y"/"N"), account_id, account_type, balance, gender, city,
+state, dob.  Model features derived from them:
+
+* hour, day_of_week, is_weekend    from txn_timestamp
+* age                              txn year - birth year, clipped to [18, 90]
+* is_international_flag            Y -> 1, N -> 0
+* txns_per_account, avg_amount_account
+                                   count / mean over *all* of the account's
+                                   transactions (AccountTotals)
+* balance                          NaN filled with the median over transactions
+
+add_velocity_features adds the sliding-window columns live scoring returns
+(txn_count_5m ... seconds_since_last_txn, see velocity.py); they are not
+model inputs yet.
+
+Row-local features only need one chunk at a time; the per-account ones need
+a pass over the whole table first, which AccountTotals does in O(accounts)
+memory.
+"""
+import numpy as np
+import pandas as pd
+
+from velocity import velocity_features
+
+
+def add_row_features(df):
+    """Add hour/day_of_week/is_weekend/age/is_international_flag where they are missing."""
+    if "txn_timestamp" in df.columns:
+        ts = pd.to_datetime(df["txn_timestamp"])
+        if "hour" not in df.columns:
+            df["hour"] = ts.dt.hour
+        if "day_of_week" not in df.columns:
+            df["day_of_week"] = ts.dt.weekday
+        if "age" not in df.columns and "dob" in df.columns:
+            df["age"] = (ts.dt.year - pd.to_datetime(df["dob"]).dt.year).clip(lower=18, upper=90)
+    if "is_weekend" not in df.columns and "day_of_week" in df.columns:
+        df["is_weekend"] = df["day_of_week"].isin([5, 6]).astype(int)
+    if "is_international_flag" not in df.columns and "is_international" in df.columns:
+        df["is_international_flag"] = df["is_international"].map({"Y": 1, "N": 0})
+    return df
+
+
+def engineer_features(raw):
+    """All model features for a whole in-memory table of raw joined rows (the notebook's cells)."""
+    df = add_row_features(raw.copy())
+    totals = AccountTotals()
+    totals.update(df)
+    return totals.finish().add_account_features(df)
+
+
+def add_velocity_features(df, engine=None):
+    """Add the velocity columns to raw rows (account_id, txn_timestamp, amount).
+
+    Pass one velocity.VelocityEngine for all chunks of a time-ordered table.
+    """
+    for column, values in velocity_features(df, engine).items():
+        df[column] = values
+    return df
+
+
+class AccountTotals:
+    """Per-account transaction count, amount sum and balance, accumulated chunk by chunk."""
+
+    def __init__(self):
+        self._parts = []
+        self.count = None
+        self.total = None
+        self.median_balance = float("nan")
+
+    def update(self, df):
+        grouped = df.groupby("account_id", sort=False)
+        part = pd.DataFrame({"count": grouped.size(), "total": grouped["amount"].sum()})
+        if "balance" in df.columns:
+            part["balance"] = grouped["balance"].first()
+        self._parts.append(part)
+        if len(self._parts) >= 64:
+            self._combine()
+
+    def finish(self):
+        """Fold the partial aggregates; call once after the last update()."""
+        self._combine()
+        totals = self._parts[0] if self._parts else pd.DataFrame(columns=["count", "total"])
+        self.count = totals["count"]
+        self.total = totals["total"]
+        if "balance" in totals.columns:
+            # the notebook's median runs over transaction rows, i.e. balances weighted by count
+            self.median_balance = _weighted_median(totals["balance"], totals["count"])
+        return self
+
+    def add_account_features(self, df):
+        """Add txns_per_account / avg_amount_account / filled balance to a chunk."""
+        if "txns_per_account" not in df.columns:
+            df["txns_per_account"] = df["account_id"].map(self.count)
+        if "avg_amount_account" not in df.columns:
+            df["avg_amount_account"] = df["account_id"].map(self.total) / df["txns_per_account"]
+        if "balance" in df.columns:
+            df["balance"] = df["balance"].fillna(self.median_balance)
+        return df
+
+    def _combine(self):
+        if len(self._parts) > 1:
+            parts = pd.concat(self._parts)
+            grouped = parts.groupby(level=0, sort=False)
+            combined = grouped[["count", "total"]].sum()
+            if "balance" in parts.columns:
+                combined["balance"] = grouped["balance"].first()
+            self._parts = [combined]
+
+
+def _weighted_median(values, weights):
+    """pandas-style median of `values` repeated `weights` times (NaNs ignored)."""
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.int64)
+    keep = ~np.isnan(values)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return float("nan")
+    order = np.argsort(values, kind="stable")
+    values, cumulative = values[order], np.cumsum(weights[order])
+    n = cumulative[-1]
+    lower = values[np.searchsorted(cumulative, (n - 1) // 2, side="right")]
+    upper = values[np.searchsorted(cumulative, n // 2, side="right")]
+    return float((lower + upper) / 2)
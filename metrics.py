@@ -0,0 +1,280 @@
+"""Prometheus text-format metrics, per-stage latency histograms and a slow-request sampler.
+
+Instrumented code times a stage with
+
+    with METRICS.stage("inference"):
+        ...
+
+and bumps counters with METRICS.count(...).  Both check one attribute and
+return at once while metrics are disabled (the default), so leaving the
+instrumentation in the scoring path costs well under a microsecond.
+
+Stages on the scoring path:
+
+    parse       request body -> Transaction objects
+    validation  completeness / type checks (validate_record, validate_frame)
+    frame       DataFrame construction (batch bodies, sklearn path)
+    encode      preprocessing (compiled encoder or the ColumnTransformer)
+    inference   forest traversal
+    reason      reason codes and text
+    log         handing the prediction row to the log writer
+    velocity    sliding-window account features (velocity.py)
+    db_write    one batched insert by the log writer thread
+    render      HTML result page
+
+Stats that other components already keep (batcher, log writer, cache,
+admission) are exported through collectors evaluated at scrape time.
+
+SlowRequestSampler is an opt-in sampling profiler: a sampled fraction of
+requests is traced by a background thread that snapshots every thread's
+stack every few milliseconds while the request runs.  Requests slower than
+a threshold keep their collapsed stacks (flame-graph format) for
+GET /metrics/slow; faster ones are discarded.
+"""
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+
+
+# latency histogram bucket upper bounds in seconds (last bucket is "+Inf")
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = list(buckets)
+        self._series = {}       # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        names = self.labelnames + ("le",)
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + [float("inf")], values):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CounterMetric:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), n=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Metrics:
+    """Stage histograms, counters and scrape-time collectors; inert until enabled."""
+
+    def __init__(self, namespace="fraud"):
+        self.enabled = False
+        self.namespace = namespace
+        self.stages = Histogram(f"{namespace}_stage_seconds", "Time spent per scoring stage", ("stage",))
+        self.requests = Histogram(f"{namespace}_request_seconds", "Request latency by route and status",
+                                  ("route", "status"))
+        self.counters = {
+            "decisions": CounterMetric(f"{namespace}_decisions_total", "Scored transactions by decision",
+                                       ("decision",)),
+            "log_errors": CounterMetric(f"{namespace}_log_errors_total",
+                                        "Predictions that could not be handed to the log writer"),
+        }
+        self._collectors = []
+
+    def stage(self, name):
+        """Context manager timing one stage (a shared no-op while disabled)."""
+        if not self.enabled:
+            return _NO_TIMER
+        return _StageTimer(self.stages, (name,))
+
+    def observe_request(self, route, status, seconds):
+        if self.enabled:
+            self.requests.observe(seconds, (route, str(status)))
+
+    def count(self, name, labels=(), n=1):
+        """Increment one of self.counters (nothing while disabled)."""
+        if self.enabled:
+            self.counters[name].inc(labels, n)
+
+    def add_collector(self, fn):
+        """fn() -> iterable of (name, type, help, [(labels dict, value), ...]), called per scrape."""
+        self._collectors.append(fn)
+
+    def render(self):
+        """Everything in Prometheus text exposition format 0.0.4."""
+        lines = self.stages.render() + self.requests.render()
+        for counter in self.counters.values():
+            lines += counter.render()
+        for fn in self._collectors:
+            try:
+                families = list(fn())
+            except Exception as e:
+                print("Metrics collector failed:", e)
+                continue
+            for name, kind, help_text, samples in families:
+                name = f"{self.namespace}_{name}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    labels = labels or {}
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# the process-wide instance the scoring path reports to
+METRICS = Metrics()
+
+
+# ---------- Slow-request sampler ----------
+
+class SlowRequestSampler:
+    """Sample stacks of all threads during a fraction of requests; keep the slow ones."""
+
+    def __init__(self, sample_rate=0.01, slow_ms=250.0, interval_ms=5.0, keep=20, max_depth=30):
+        self.sample_rate = sample_rate
+        self.slow = slow_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.max_depth = max_depth
+        self.traces = deque(maxlen=keep)
+        self._active = {}       # trace id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._next_id = 0
+
+    def start(self):
+        """Begin tracing this request if it is sampled; returns a trace id or None."""
+        if random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            self._next_id += 1
+            trace_id = self._next_id
+            self._active[trace_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slow-request-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return trace_id
+
+    def finish(self, trace_id, route, seconds):
+        with self._lock:
+            stacks = self._active.pop(trace_id, None)
+        if stacks is None or seconds < self.slow:
+            return
+        trace = {
+            "route": route,
+            "seconds": round(seconds, 4),
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "samples": sum(stacks.values()),
+            "stacks": [{"stack": stack, "samples": n} for stack, n in stacks.most_common(25)],
+        }
+        self.traces.append(trace)
+        print(f"Slow request {route} took {seconds * 1000:.0f} ms ({trace['samples']} stack samples)")
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            collapsed = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                calls = []
+                while frame is not None and len(calls) < self.max_depth:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # root first, as flame-graph tools expect
+                collapsed.append(";".join([str(names.get(ident, ident))] + calls[::-1]))
+            with self._lock:
+                for stacks in self._active.values():
+                    stacks.update(collapsed)
+            time.sleep(self.interval)
@@ -0,0 +1,179 @@
+"""Multi-process scoring for large batches and offline jobs.
+
+The parent encodes the batch once with the CompiledPipeline (a vectorised
+lookup, cheap next to 300 trees) into a shared-memory float32 matrix.  Pool
+workers each load the forest once from the bundle file (read from the OS
+file cache rather than pickled through the pool), then score contiguous row
+ranges of the shared matrix and write probabilities into a shared output
+array, so results come back in input order with nothing but (start, stop)
+sent over the pipes.  Only the batch is shared: sklearn builds its own tree
+node arrays on unpickle, so every worker holds a private copy of the forest
+(about 1.7 MB for the shipped 300 trees).
+
+Workers key the loaded forest on (path, version) and reload when a batch
+names another one, so one pool serves whichever model version is active.
+The version is the bundle's content hash: a worker checks the file against
+it around the load and raises BundleChanged when the file was overwritten
+since the registry loaded it, and the caller scores in-process instead.
+They run the forest with n_jobs=1; the pool is the parallelism.
+
+Run `python parallel.py` for a scaling benchmark over process counts and
+batch sizes.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+from joblib import load
+
+from fast_forest import _split_pipeline
+
+
+# below this many rows a batch is scored in-process
+PARALLEL_MIN_ROWS = 10000
+
+# shards per worker; >1 evens out stragglers
+SHARDS_PER_PROCESS = 2
+
+_worker = {}
+
+
+class BundleChanged(RuntimeError):
+    """The bundle file no longer has the content hash the batch was scored for."""
+
+
+def _forest_for(model_path, version):
+    if _worker.get("key") != (model_path, version):
+        from registry import bundle_version
+
+        before = bundle_version(model_path) if version is not None else None
+        model = load(model_path)["model"]
+        # hashed on both sides of the load, so a replace in between is caught too
+        if version is not None and not before == version == bundle_version(model_path):
+            raise BundleChanged(f"{model_path} is no longer version {version}")
+        _, forest = _split_pipeline(model)
+        forest.n_jobs = 1
+        _worker.update(key=(model_path, version), forest=forest, class_index=list(forest.classes_).index(1))
+    return _worker["forest"], _worker["class_index"]
+
+
+def _score_shard(model_path, version, x_name, out_name, shape, start, stop):
+    forest, class_index = _forest_for(model_path, version)
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        X = np.ndarray(shape, dtype=np.float32, buffer=x_shm.buf)
+        out = np.ndarray(shape[0], dtype=np.float64, buffer=out_shm.buf)
+        out[start:stop] = forest.predict_proba(X[start:stop])[:, class_index]
+        del X, out
+    finally:
+        x_shm.close()
+        out_shm.close()
+    return stop - start
+
+
+def _preload(model_path, version):
+    _forest_for(model_path, version)
+    return os.getpid()
+
+
+class ParallelScorer:
+    """Process pool that scores encoded batches from shared memory, in order."""
+
+    def __init__(self, processes=None, min_rows=PARALLEL_MIN_ROWS, start_method="spawn"):
+        self.processes = processes or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.start_method = start_method
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        # a lock held by another thread at fork time would stay held in the child
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def warm_up(self, model_path, version=None):
+        """Start the workers and load the model now rather than on the first batch."""
+        pool = self._get_pool()
+        list(pool.map(_preload, [model_path] * self.processes, [version] * self.processes))
+
+    def predict_encoded(self, X, model_path, version=None):
+        """Positive-class probability for an encoded float32 matrix, in row order."""
+        n = len(X)
+        x_shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        out_shm = shared_memory.SharedMemory(create=True, size=max(n * 8, 1))
+        try:
+            shared_X = np.ndarray(X.shape, dtype=np.float32, buffer=x_shm.buf)
+            shared_X[:] = X
+            shard = max(math.ceil(n / (self.processes * SHARDS_PER_PROCESS)), 1)
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_score_shard, model_path, version, x_shm.name, out_shm.name,
+                            X.shape, start, min(start + shard, n))
+                for start in range(0, n, shard)
+            ]
+            for future in futures:
+                future.result()
+            result = np.ndarray(n, dtype=np.float64, buffer=out_shm.buf).copy()
+            del shared_X
+        finally:
+            x_shm.close()
+            x_shm.unlink()
+            out_shm.close()
+            out_shm.unlink()
+        return result
+
+    def close(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=True)
+        self._pool = None
+
+    def _get_pool(self):
+        # created on first use, and again in a forked child (a pool cannot cross fork)
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.processes, mp_context=get_context(self.start_method))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset_lock(self):
+        self._pool_lock = threading.Lock()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from fast_forest import CompiledPipeline, parity_sample
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark for ParallelScorer.")
+    parser.add_argument("--model", default="fraud_rf_pipeline.joblib")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count())
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    pipeline = load(args.model)["model"]
+    engine = CompiledPipeline(pipeline)
+    X = engine.encode_frame(parity_sample(engine, n_rows=max(args.rows)))
+    print(f"{os.cpu_count()} CPUs")
+
+    counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i < args.max_processes], args.max_processes})
+    baseline = {}
+    for processes in counts:
+        scorer = ParallelScorer(processes=processes, min_rows=0)
+        scorer.warm_up(args.model)
+        for n_rows in args.rows:
+            block = X[:n_rows]
+            expected = baseline.get(n_rows)
+            start = time.perf_counter()
+            probs = scorer.predict_encoded(block, args.model)
+            elapsed = time.perf_counter() - start
+            if expected is None:
+                baseline[n_rows] = (probs, elapsed)
+            else:
+                assert np.array_equal(probs, expected[0]), "parallel result differs"
+            speedup = baseline[n_rows][1] / elapsed
+            print(f"{processes:>3} procs {n_rows:>9,} rows: {elapsed * 1000:>9.1f} ms  "
+                  f"{n_rows / elapsed:>11,.0f} rows/s  x{speedup:.2f}")
+        scorer.close()
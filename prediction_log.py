@@ -0,0 +1,346 @@
+"""Background, batched logging of predictions to the fraud_predictions table.
+
+Request handlers only append a row to a bounded in-memory queue.  A writer
+thread drains it and inserts rows with one multi-row `executemany` per batch,
+flushing when `batch_size` rows are waiting or `flush_interval` seconds have
+passed.  When the queue is full (database slow) or an insert fails (database
+down) rows are appended to a local NDJSON spill file, which is replayed once
+the database accepts writes again.  Forked workers share the spill file:
+appends and the hand-over to replay take a file lock, and only one process
+replays at a time.  Lines that do not decode (a crash mid-append) are
+skipped and counted.  The spill file stops growing at `max_spill_bytes`:
+rows past it are dropped and counted (`spill_dropped`), so a database that
+never comes back cannot fill the disk.
+
+Sinks are pluggable: MySQLSink uses a connection pool, SQLiteSink is a local
+stand-in for development and benchmarks.
+
+Run `python prediction_log.py` to compare per-request latency of synchronous
+inserts against the background writer on SQLite.
+"""
+import fcntl
+import itertools
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import METRICS
+from prediction_store import PREDICTION_COLUMNS, ensure_schema
+
+
+# ---------- Sinks ----------
+
+class MySQLSink:
+    """Insert batches into MySQL through a small connection pool."""
+
+    def __init__(self, pool_size=4, **connect_kwargs):
+        self.pool_size = pool_size
+        self.connect_kwargs = connect_kwargs
+        self._pool = None
+        placeholders = ", ".join(["%s"] * len(PREDICTION_COLUMNS))
+        self.insert_sql = (
+            f"INSERT INTO fraud_predictions ({', '.join(PREDICTION_COLUMNS)}) "
+            f"VALUES ({placeholders})"
+        )
+
+    def _connection(self):
+        # pool is created on first use so a down database does not block startup
+        if self._pool is None:
+            from mysql.connector import pooling
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name="fraud_prediction_log",
+                pool_size=self.pool_size,
+                **self.connect_kwargs
+            )
+        return self._pool.get_connection()
+
+    def write(self, rows):
+        conn = self._connection()
+        try:
+            cur = conn.cursor()
+            # mysql.connector rewrites this into a single multi-row INSERT
+            cur.executemany(self.insert_sql, rows)
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()    # returns the connection to the pool
+
+
+class SQLiteSink:
+    """Local stand-in for MySQL with the same fraud_predictions columns."""
+
+    def __init__(self, path="fraud_predictions.db"):
+        self.path = path
+        placeholders = ", ".join(["?"] * len(PREDICTION_COLUMNS))
+        self.insert_sql = (
+            f"INSERT INTO fraud_predictions ({', '.join(PREDICTION_COLUMNS)}) "
+            f"VALUES ({placeholders})"
+        )
+        conn = sqlite3.connect(self.path)
+        ensure_schema(conn, "sqlite")
+        conn.close()
+        self._conn = None
+
+    def write(self, rows):
+        # only the writer thread touches this connection
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executemany(self.insert_sql, rows)
+        self._conn.commit()
+
+
+# ---------- Background writer ----------
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """flock on `path`; yields False instead of waiting when `blocking` is off and it is taken."""
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PredictionLogWriter:
+    """Bounded queue + writer thread that flushes predictions in batches."""
+
+    def __init__(self, sink, max_queue_size=10000, batch_size=500, flush_interval=1.0,
+                 enqueue_timeout=0.0, spill_path="prediction_log_spill.ndjson", retry_interval=5.0,
+                 max_spill_bytes=512 * 1024 * 1024):
+        # max_spill_bytes: 0 lets the spill file grow without a bound
+        self.sink = sink
+        self.max_spill_bytes = max_spill_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+        self.max_queue_size = max_queue_size
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "spilled": 0,
+                       "replayed": 0, "spill_corrupt": 0, "spill_dropped": 0, "write_errors": 0}
+        self._last_failure = float("-inf")
+        self._start_worker()
+        # threads do not survive fork (gunicorn --preload): start a fresh one in the child
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    def log(self, row):
+        """Queue one row (values in PREDICTION_COLUMNS order); never waits on the database."""
+        try:
+            if self.enqueue_timeout > 0:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(row)
+            self._count("queued")
+        except queue.Full:
+            # backpressure: keep the request fast and park the row on disk
+            self._spill([row])
+
+    def close(self):
+        """Flush everything still queued and stop the writer thread."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["spill_pending"] = os.path.exists(self.spill_path)
+        # bytes waiting on disk, including a replay in progress
+        snapshot["spill_bytes"] = sum(
+            os.path.getsize(path) for path in (self.spill_path, self.spill_path + ".replay")
+            if os.path.exists(path)
+        )
+        return snapshot
+
+    # ---------- worker ----------
+
+    def _start_worker(self):
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            try:
+                if batch:
+                    self._write(batch)
+                if not stop and self._should_replay():
+                    self._replay_spill()
+            except Exception as e:
+                # keep the thread alive: the next loop retries
+                print("Prediction log writer failed:", e)
+                self._last_failure = time.monotonic()
+                self._count("write_errors")
+            if stop:
+                return
+
+    def _collect(self):
+        """Wait for up to batch_size rows or flush_interval seconds."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is None:
+                # drain what is left so close() loses nothing
+                while True:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        return batch, True
+                    if row is not None:
+                        batch.append(row)
+            batch.append(row)
+        return batch, False
+
+    def _write(self, rows):
+        if time.monotonic() - self._last_failure < self.retry_interval:
+            # database failed recently: don't stall the queue on timeouts
+            self._spill(rows)
+            return False
+        try:
+            with METRICS.stage("db_write"):
+                self.sink.write(rows)
+        except Exception as e:
+            print("Prediction log write failed, spilling to disk:", e)
+            self._last_failure = time.monotonic()
+            self._count("write_errors")
+            self._spill(rows)
+            return False
+        self._count("written", len(rows))
+        self._count("batches")
+        return True
+
+    def _should_replay(self):
+        pending = os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replay")
+        return pending and time.monotonic() - self._last_failure >= self.retry_interval
+
+    def _replay_spill(self):
+        replay_path = self.spill_path + ".replay"
+        with _file_lock(replay_path + ".lock", blocking=False) as claimed:
+            if not claimed:
+                return      # another worker is replaying
+            with _file_lock(self.spill_path + ".lock"):
+                # a leftover .replay file (crash mid-replay) is finished first
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, replay_path)
+            with open(replay_path, encoding="utf-8") as f:
+                while True:
+                    rows = self._decode(itertools.islice(f, self.batch_size))
+                    if rows is None:
+                        break
+                    if rows and not self._write_replayed(rows):
+                        # keep the rows that were not written for the next attempt
+                        with _file_lock(self.spill_path + ".lock"), \
+                                open(self.spill_path, "a", encoding="utf-8") as out:
+                            shutil.copyfileobj(f, out)
+                        break
+            os.remove(replay_path)
+
+    def _decode(self, lines):
+        """Rows of a batch of spill lines, or None at the end of the file."""
+        rows, seen = [], False
+        for line in lines:
+            seen = True
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                self._count("spill_corrupt")
+        return rows if seen else None
+
+    def _write_replayed(self, rows):
+        try:
+            self.sink.write(rows)
+        except Exception as e:
+            print("Prediction log replay failed:", e)
+            self._last_failure = time.monotonic()
+            self._count("write_errors")
+            self._spill(rows)
+            return False
+        self._count("replayed", len(rows))
+        return True
+
+    def _spill(self, rows):
+        # ASCII JSON, so len() is the size on disk
+        lines = [json.dumps(row, default=str) + "\n" for row in rows]
+        with _file_lock(self.spill_path + ".lock"), open(self.spill_path, "a", encoding="utf-8") as f:
+            kept = len(lines)
+            if self.max_spill_bytes:
+                room = self.max_spill_bytes - os.fstat(f.fileno()).st_size
+                for i, line in enumerate(lines):
+                    room -= len(line)
+                    if room < 0:
+                        kept = i
+                        break
+            f.write("".join(lines[:kept]))
+        self._count("spilled", kept)
+        if kept < len(lines):
+            self._count("spill_dropped", len(lines) - kept)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+
+def prediction_row(record, fraud_probability, fraud_prediction, reason_text, created_at=None):
+    """Build one fraud_predictions row (PREDICTION_COLUMNS order) from a raw-feature dict."""
+    created_at = created_at or datetime.now()
+    return [created_at.isoformat(sep=" ")] + [record[col] for col in PREDICTION_COLUMNS[1:16]] + [
+        float(fraud_probability), int(fraud_prediction), (reason_text or "")[:250]
+    ]
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    record = {
+        "amount": 95000.0, "balance": 12000.0, "hour": 2, "day_of_week": 6,
+        "is_weekend": 1, "is_international_flag": 1, "age": 22,
+        "txns_per_account": 8, "avg_amount_account": 1500.0,
+        "txn_type": "ONLINE", "channel": "mobile", "account_type": "savings",
+        "gender": "M", "city": "Mumbai", "state": "Maharashtra",
+    }
+    n = 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        sink = SQLiteSink(path)
+
+        start = time.perf_counter()
+        for _ in range(n):
+            # old behaviour: connect, insert, commit, close on every request
+            conn = sqlite3.connect(path)
+            conn.execute(sink.insert_sql, prediction_row(record, 0.59, 1, "bench"))
+            conn.commit()
+            conn.close()
+        sync_ms = (time.perf_counter() - start) / n * 1000
+
+        writer = PredictionLogWriter(sink, spill_path=os.path.join(tmp, "spill.ndjson"))
+        start = time.perf_counter()
+        for _ in range(n):
+            writer.log(prediction_row(record, 0.59, 1, "bench"))
+        async_ms = (time.perf_counter() - start) / n * 1000
+        writer.close()
+
+        print(f"synchronous insert per request: {sync_ms:.4f} ms")
+        print(f"background writer per request:  {async_ms:.4f} ms")
+        print("writer stats:", writer.stats())
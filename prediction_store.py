@@ -0,0 +1,371 @@
+"""Managed fraud_predictions schema: BIGINT key, dashboard indexes, monthly partitions.
+
+The first version of the table (created by api.init_db) had an INT
+AUTO_INCREMENT key, which runs out at about 2.1 billion rows, and no other
+index, so every dashboard query below read the whole table.  The managed
+schema has
+
+* id BIGINT UNSIGNED, with created_at in the primary key (MySQL wants the
+  partitioning column in every unique key),
+* an index on created_at and on (fraud_prediction, created_at) for the
+  "latest" views, and on (channel | txn_type, fraud_prediction, created_at),
+  which cover the fraud-rate rollups so they never read table rows; with
+  only a handful of channels the planner can also skip-scan them for
+  "flagged per channel since ..." queries,
+* RANGE COLUMNS(created_at) partitions, one per month, plus a catch-all
+  `pmax`.  ensure_partitions() keeps a few months ahead of the clock and
+  drop_partitions_before() removes old months without a DELETE.  Both hold
+  the MySQL named lock `<table>_partitions` (GET_LOCK) while they read the
+  partition list and alter it, so API workers starting together run the
+  REORGANIZE one after the other, and the later ones find nothing to add.
+
+SQLite (the local stand-in) gets the same columns and indexes, no partitions;
+its INTEGER PRIMARY KEY is already 64-bit, so ensure_schema() upgrades an
+existing SQLite table in place.
+
+    python prediction_store.py status
+    python prediction_store.py migrate --batch-size 50000
+    python prediction_store.py partitions --months-ahead 3 --drop-before 2024-01-01
+
+The MySQL connection comes from FRAUD_DB_HOST / _PORT / _USER / _NAME /
+_PASSWORD.  `python -m benchmarks db` times the dashboard queries against the
+old and the managed table.
+"""
+import argparse
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+
+TABLE = "fraud_predictions"
+
+# seconds to wait for another session's partition maintenance to finish
+PARTITION_LOCK_TIMEOUT = 60
+
+# column -> MySQL type; the order is the insert order of prediction_log
+COLUMN_TYPES = {
+    "created_at": "DATETIME NOT NULL",
+    "amount": "DOUBLE",
+    "balance": "DOUBLE",
+    "hour": "INT",
+    "day_of_week": "INT",
+    "is_weekend": "TINYINT",
+    "is_international_flag": "TINYINT",
+    "age": "INT",
+    "txns_per_account": "INT",
+    "avg_amount_account": "DOUBLE",
+    "txn_type": "VARCHAR(20)",
+    "channel": "VARCHAR(20)",
+    "account_type": "VARCHAR(20)",
+    "gender": "VARCHAR(5)",
+    "city": "VARCHAR(50)",
+    "state": "VARCHAR(50)",
+    "fraud_probability": "DOUBLE",
+    "fraud_prediction": "TINYINT",
+    "reason_text": "VARCHAR(255)",
+}
+PREDICTION_COLUMNS = list(COLUMN_TYPES)
+
+# name -> indexed columns
+INDEXES = {
+    "idx_created_at": ["created_at"],
+    "idx_prediction_created": ["fraud_prediction", "created_at"],
+    "idx_channel_prediction": ["channel", "fraud_prediction", "created_at"],
+    "idx_txn_type_prediction": ["txn_type", "fraud_prediction", "created_at"],
+}
+
+# the standard dashboard queries ({table} is filled in, %s are parameters)
+DASHBOARD_QUERIES = {
+    "latest": """
+        SELECT * FROM {table} ORDER BY created_at DESC LIMIT 5
+    """,
+    "latest_flagged": """
+        SELECT * FROM {table} WHERE fraud_prediction = 1 ORDER BY created_at DESC LIMIT 50
+    """,
+    "fraud_rate_by_channel": """
+        SELECT channel, COUNT(*) AS total, SUM(fraud_prediction) AS flagged,
+               ROUND(100.0 * SUM(fraud_prediction) / COUNT(*), 2) AS fraud_rate_pct
+        FROM {table} GROUP BY channel ORDER BY fraud_rate_pct DESC, channel
+    """,
+    "fraud_rate_by_txn_type": """
+        SELECT txn_type, COUNT(*) AS total, SUM(fraud_prediction) AS flagged,
+               ROUND(100.0 * SUM(fraud_prediction) / COUNT(*), 2) AS fraud_rate_pct
+        FROM {table} GROUP BY txn_type ORDER BY fraud_rate_pct DESC, txn_type
+    """,
+    "flagged_last_day_by_channel": """
+        SELECT channel, COUNT(*) AS flagged FROM {table}
+        WHERE fraud_prediction = 1 AND created_at >= %s
+        GROUP BY channel ORDER BY channel
+    """,
+}
+
+
+def dashboard_params(name, now=None):
+    """Parameters of one DASHBOARD_QUERIES entry."""
+    if name == "flagged_last_day_by_channel":
+        since = (now or datetime.now()).replace(microsecond=0) - timedelta(days=1)
+        return (since.isoformat(sep=" "),)
+    return ()
+
+
+def sql(query, dialect):
+    """MySQL-style %s placeholders -> the dialect's."""
+    return query.replace("%s", "?") if dialect == "sqlite" else query
+
+
+# ---------- DDL ----------
+
+def _month(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _partition(month):
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{_next_month(month):%Y-%m-%d}')"
+
+
+def mysql_table_sql(table=TABLE, start=None, months_ahead=3, partitioned=True):
+    """CREATE TABLE for MySQL; monthly partitions from `start`'s month to months_ahead past today."""
+    columns = ",\n    ".join(f"{c} {t}" for c, t in COLUMN_TYPES.items())
+    indexes = ",\n    ".join(f"KEY {name} ({', '.join(cols)})" for name, cols in INDEXES.items())
+    ddl = (f"CREATE TABLE IF NOT EXISTS {table} (\n"
+           f"    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,\n"
+           f"    {columns},\n"
+           f"    PRIMARY KEY (id, created_at),\n"
+           f"    {indexes}\n"
+           f") ENGINE=InnoDB")
+    if not partitioned:
+        return ddl
+    month = _month(start or date.today())
+    last = _month(date.today())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    parts = []
+    while month <= last:
+        parts.append(_partition(month))
+        month = _next_month(month)
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ddl + "\nPARTITION BY RANGE COLUMNS (created_at) (\n    " + ",\n    ".join(parts) + "\n)"
+
+
+def sqlite_table_sql(table=TABLE):
+    return (f"CREATE TABLE IF NOT EXISTS {table} (\n"
+            f"    id INTEGER PRIMARY KEY AUTOINCREMENT,\n"
+            f"    {', '.join(PREDICTION_COLUMNS)}\n"
+            f")")
+
+
+def sqlite_index_sql(table=TABLE):
+    return [f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({', '.join(cols)})"
+            for name, cols in INDEXES.items()]
+
+
+def ensure_schema(conn, dialect="mysql", table=TABLE, months_ahead=3):
+    """Create the managed table if missing (and, for SQLite, add the indexes to an old one).
+
+    A MySQL table in the old INT-key layout is left alone with a warning; see migrate().
+    """
+    cur = conn.cursor()
+    if dialect == "sqlite":
+        cur.execute(sqlite_table_sql(table))
+        for statement in sqlite_index_sql(table):
+            cur.execute(statement)
+    else:
+        cur.execute(mysql_table_sql(table, months_ahead=months_ahead))
+        if is_legacy(cur, table):
+            print(f"{table} still has the INT key and no indexes; run `python prediction_store.py migrate`")
+        else:
+            ensure_partitions(cur, table, months_ahead)
+    conn.commit()
+    cur.close()
+
+
+# ---------- MySQL partitions ----------
+
+def is_legacy(cur, table=TABLE):
+    """True when the MySQL table's id column is a plain INT (the first schema)."""
+    cur.execute("SELECT DATA_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'id'", (table,))
+    row = cur.fetchone()
+    return row is not None and row[0].lower() != "bigint"
+
+
+def partitions(cur, table=TABLE):
+    """Partition names of a MySQL table in order (empty when it is not partitioned)."""
+    cur.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION", (table,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _partition_month(name):
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+@contextmanager
+def partition_lock(cur, table=TABLE, timeout=PARTITION_LOCK_TIMEOUT):
+    """Hold the MySQL named lock for `table`'s partition maintenance (one session at a time)."""
+    name = f"{table}_partitions"
+    cur.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+    if cur.fetchone()[0] != 1:
+        raise TimeoutError(f"{name} is still locked by another session after {timeout} s")
+    try:
+        yield
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+        cur.fetchone()
+
+
+def ensure_partitions(cur, table=TABLE, months_ahead=3, today=None):
+    """Split `pmax` so monthly partitions exist months_ahead past today; returns the added names."""
+    with partition_lock(cur, table):
+        return _ensure_partitions(cur, table, months_ahead, today)
+
+
+def _ensure_partitions(cur, table, months_ahead, today):
+    # read under the lock: a worker that waited sees the partitions the first one added
+    names = [n for n in partitions(cur, table) if n != "pmax"]
+    if not names:
+        return []
+    target = _month(today or date.today())
+    for _ in range(months_ahead):
+        target = _next_month(target)
+    month, added = _next_month(_partition_month(names[-1])), []
+    while month <= target:
+        added.append(month)
+        month = _next_month(month)
+    if added:
+        # pmax is empty while we stay ahead of the clock, so this moves no rows
+        new = ", ".join([_partition(m) for m in added] + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+        cur.execute(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({new})")
+    return [f"p{m:%Y%m}" for m in added]
+
+
+def drop_partitions_before(cur, cutoff, table=TABLE):
+    """Drop the monthly partitions that end on or before `cutoff` (a date); returns their names."""
+    with partition_lock(cur, table):
+        old = [n for n in partitions(cur, table) if n != "pmax" and _next_month(_partition_month(n)) <= cutoff]
+        if old:
+            cur.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(old)}")
+    return old
+
+
+# ---------- Migration ----------
+
+def _copy_batches(cur, conn, source, target, after_id, batch_size):
+    """Copy rows with id > after_id in id order; returns the last id copied."""
+    columns = ", ".join(PREDICTION_COLUMNS)
+    select = ", ".join("COALESCE(created_at, '1970-01-01')" if c == "created_at" else c
+                       for c in PREDICTION_COLUMNS)
+    while True:
+        cur.execute(f"SELECT MAX(id) FROM (SELECT id FROM {source} WHERE id > %s "
+                    f"ORDER BY id LIMIT %s) batch", (after_id, batch_size))
+        upper = cur.fetchone()[0]
+        if upper is None:
+            return after_id
+        cur.execute(f"INSERT INTO {target} (id, {columns}) SELECT id, {select} FROM {source} "
+                    f"WHERE id > %s AND id <= %s", (after_id, upper))
+        conn.commit()
+        print(f"  copied ids {after_id + 1:,}..{upper:,}")
+        after_id = upper
+
+
+def migrate(conn, table=TABLE, batch_size=50000, months_ahead=3, id_headroom=1000000):
+    """Move a legacy MySQL table to the managed schema while the API keeps writing.
+
+    Rows are copied in keyset batches into `<table>_new`, whose AUTO_INCREMENT
+    then starts id_headroom past the old maximum.  One RENAME TABLE swaps the
+    two atomically; rows written to the old table during the last batch are
+    copied afterwards.  The old table is kept as `<table>_legacy`.
+    """
+    cur = conn.cursor()
+    if not is_legacy(cur, table):
+        print(f"{table} already uses the managed schema")
+        cur.close()
+        return False
+    new, legacy = f"{table}_new", f"{table}_legacy"
+    cur.execute(f"SELECT MIN(created_at), MAX(id) FROM {table}")
+    first, max_id = cur.fetchone()
+    cur.execute(mysql_table_sql(new, start=first.date() if first else None, months_ahead=months_ahead))
+    last_id = _copy_batches(cur, conn, table, new, 0, batch_size)
+
+    cur.execute(f"SELECT MAX(id) FROM {table}")
+    max_id = max(cur.fetchone()[0] or 0, last_id)
+    cur.execute(f"ALTER TABLE {new} AUTO_INCREMENT = {max_id + id_headroom}")
+    cur.execute(f"RENAME TABLE {table} TO {legacy}, {new} TO {table}")
+    _copy_batches(cur, conn, legacy, table, last_id, batch_size)
+    conn.commit()
+    cur.close()
+    print(f"{table} migrated; the old table is kept as {legacy}")
+    return True
+
+
+def status(conn, table=TABLE):
+    """Key type, partitions, indexes and approximate row count of a MySQL table."""
+    cur = conn.cursor()
+    cur.execute("SELECT DATA_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'id'", (table,))
+    key = cur.fetchone()
+    cur.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+    indexes = sorted(row[0] for row in cur.fetchall())
+    cur.execute("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+    rows = cur.fetchone()
+    result = {"table": table, "exists": key is not None, "id_type": key[0] if key else None,
+              "indexes": indexes, "partitions": partitions(cur, table), "approx_rows": rows[0] if rows else None}
+    cur.close()
+    return result
+
+
+def mysql_config():
+    return dict(host=os.getenv("FRAUD_DB_HOST", "localhost"), port=int(os.getenv("FRAUD_DB_PORT", "3306")),
+                user=os.getenv("FRAUD_DB_USER", "root"), password=os.getenv("FRAUD_DB_PASSWORD", ""),
+                database=os.getenv("FRAUD_DB_NAME", "banking_fraud_detection"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the fraud_predictions table.")
+    parser.add_argument("command", choices=["status", "create", "migrate", "partitions"])
+    parser.add_argument("--sqlite", help="work on this SQLite file instead of MySQL")
+    parser.add_argument("--table", default=TABLE)
+    parser.add_argument("--batch-size", type=int, default=50000, help="migrate: rows per copy batch")
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--drop-before", help="partitions: drop months ending on or before YYYY-MM-DD")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        import sqlite3
+        conn = sqlite3.connect(args.sqlite)
+        if args.command in ("create", "migrate"):
+            ensure_schema(conn, "sqlite", args.table)
+            print(f"{args.table} in {args.sqlite} has the managed indexes")
+        else:
+            print(conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = ?", (args.table,)).fetchall())
+        conn.close()
+        return
+
+    import mysql.connector
+    conn = mysql.connector.connect(**mysql_config())
+    try:
+        if args.command == "status":
+            print(status(conn, args.table))
+        elif args.command == "create":
+            ensure_schema(conn, "mysql", args.table, args.months_ahead)
+        elif args.command == "migrate":
+            migrate(conn, args.table, args.batch_size, args.months_ahead)
+        else:
+            cur = conn.cursor()
+            print("added:", ensure_partitions(cur, args.table, args.months_ahead))
+            if args.drop_before:
+                print("dropped:", drop_partitions_before(cur, date.fromisoformat(args.drop_before), args.table))
+            cur.close()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Rule-table reason codes, evaluated with NumPy over whole batches.
+
+Every rule has a risk predicate (shown when a transaction is flagged) and a
+"safe" predicate (shown when it is cleared).  Evaluating the table over a batch
+yields one compact uint16 code per row: risk bits in the low byte, safe bits in
+the high byte.  Text is only rendered on demand, and since there are only a
+few hundred possible codes the rendering is cached.
+
+Predicates only use operators that work on both NumPy arrays and scalars, so
+the same table serves single requests and batches.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+SAFE_SHIFT = 8
+
+
+def _high_amount(f):
+    return f["amount"] > np.maximum(f["balance"] * 0.6, 50000)
+
+
+def _odd_time(f):
+    return (f["is_weekend"] == 1) | (f["hour"] < 7) | (f["hour"] > 22)
+
+
+# (code name, risk predicate, risk text, safe predicate, safe text), bit = position
+REASON_RULES = [
+    (
+        "HIGH_AMOUNT",
+        _high_amount, "high transaction amount compared to balance",
+        lambda f: ~_high_amount(f), "amount is within a normal range",
+    ),
+    (
+        "INTERNATIONAL",
+        lambda f: f["is_international_flag"] == 1, "international transaction",
+        lambda f: f["is_international_flag"] == 0, "transaction is domestic",
+    ),
+    (
+        "UNUSUAL_TIME",
+        _odd_time, "unusual transaction time",
+        lambda f: ~_odd_time(f), "time of transaction is within normal hours",
+    ),
+    (
+        "LOW_ACTIVITY",
+        lambda f: f["txns_per_account"] < 10, "low account activity",
+        lambda f: f["txns_per_account"] >= 10, "account has sufficient past activity",
+    ),
+]
+
+
+def reason_codes(features):
+    """uint16 reason code per row; `features` maps column name -> array (a DataFrame works)."""
+    columns = {
+        col: np.asarray(features[col], dtype=np.float64)
+        for col in ("amount", "balance", "hour", "is_weekend",
+                    "is_international_flag", "txns_per_account")
+    }
+    codes = np.zeros(np.shape(columns["amount"]), dtype=np.uint16)
+    for bit, (_, risk, _, safe, _) in enumerate(REASON_RULES):
+        codes |= risk(columns).astype(np.uint16) << bit
+        codes |= safe(columns).astype(np.uint16) << (bit + SAFE_SHIFT)
+    return codes
+
+
+def reason_code(record):
+    """Reason code for a single raw-feature dict."""
+    return int(reason_codes(record))
+
+
+@lru_cache(maxsize=1024)
+def render_reason(code, is_fraud):
+    """Human-readable explanation for a reason code and decision."""
+    if is_fraud:
+        reasons = [rule[2] for bit, rule in enumerate(REASON_RULES) if code >> bit & 1]
+        if reasons:
+            return "This transaction is flagged as FRAUD because of " + ", ".join(reasons) + "."
+        return "This transaction pattern looks unusual compared to typical customer behaviour."
+
+    safe_reasons = [rule[4] for bit, rule in enumerate(REASON_RULES) if code >> (bit + SAFE_SHIFT) & 1]
+    if safe_reasons:
+        return "This transaction is considered SAFE because " + ", ".join(safe_reasons) + "."
+    return "This transaction is consistent with typical customer behaviour."
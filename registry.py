@@ -0,0 +1,377 @@
+"""Versioned model bundles with hot reload and shadow scoring.
+
+A ModelVersion is everything scoring needs from one bundle -- the pipeline,
+its threshold, the compiled fast path and the explainer -- and is never
+mutated.  The registry holds the active version in a single attribute; a
+request reads it once and uses that object to the end, so swapping in a new
+version (one reference assignment) lets in-flight requests finish on the old
+one while new requests pick up the new one.
+
+Reloads run on a background thread: load, compile, verify, warm up, then
+swap.  A failed load leaves the active version untouched.
+
+A shadow (candidate) version can score a sampled fraction of live traffic.
+Sampled records go onto a bounded queue served by one background thread, so
+the request path pays only for sampling and an enqueue; when the queue is
+full records are dropped and counted rather than slowing requests down.
+"""
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from explain import ForestExplainer
+from fast_forest import CompiledPipeline, _split_pipeline, load_fast_path
+from metrics import METRICS
+from parallel import BundleChanged
+from scoring import CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES
+
+
+class ModelVersion:
+    """One loaded bundle and everything compiled from it."""
+
+    def __init__(self, model, threshold, path, version, engine=None, explainer=None, parallel=None):
+        # engine: fast_forest.CompiledPipeline or None for plain sklearn
+        # explainer: explain.ForestExplainer or None when attributions are unavailable
+        # parallel: parallel.ParallelScorer shared by all versions, or None
+        self.model = model
+        self.threshold = threshold
+        self.path = path
+        self.version = version
+        self.engine = engine
+        self.explainer = explainer
+        self.parallel = parallel
+        try:
+            # (ColumnTransformer, forest) so the sklearn path can time the two apart
+            self._steps = _split_pipeline(model)
+        except (AttributeError, ValueError):
+            self._steps = None
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+    def predict_records(self, records):
+        """Fraud probability (class 1) for a list of validated records."""
+        if self.engine is not None:
+            with METRICS.stage("encode"):
+                X = self.engine.encode_records(records)
+            with METRICS.stage("inference"):
+                return self.engine.predict_encoded(X)
+        with METRICS.stage("frame"):
+            X = pd.DataFrame(records, columns=FEATURE_COLUMNS)
+        return self._predict_sklearn(X)
+
+    def predict_frame(self, X):
+        """Fraud probability (class 1) for every row of a validated DataFrame."""
+        if self.engine is None:
+            return self._predict_sklearn(X)
+        with METRICS.stage("encode"):
+            encoded = self.engine.encode_frame(X)
+        with METRICS.stage("inference"):
+            if self.parallel is not None and len(X) >= self.parallel.min_rows:
+                try:
+                    return self.parallel.predict_encoded(encoded, self.path, self.version)
+                except BundleChanged as e:
+                    # the file was replaced before a reload: this version is only in memory now
+                    print("Parallel scoring skipped:", e)
+            return self.engine.predict_encoded(encoded)
+
+    def _predict_sklearn(self, X):
+        if self._steps is None:
+            with METRICS.stage("inference"):
+                return self.model.predict_proba(X)[:, 1]
+        preprocess, forest = self._steps
+        with METRICS.stage("encode"):
+            encoded = preprocess.transform(X)
+        with METRICS.stage("inference"):
+            return forest.predict_proba(encoded)[:, 1]
+
+    def warm_up(self):
+        """One throwaway prediction per path so the first request pays no first-call costs."""
+        record = {col: 0.0 for col in NUMERIC_FEATURES}
+        record.update({col: "" for col in CATEGORICAL_FEATURES})     # unknown -> all-zero one-hot
+        self.predict_records([record])
+        self.predict_frame(pd.DataFrame([record], columns=FEATURE_COLUMNS))
+
+    def with_threshold(self, threshold):
+        """Same model under a different decision threshold (shares all compiled state)."""
+        return ModelVersion(self.model, float(threshold), self.path, self.version,
+                            self.engine, self.explainer, self.parallel)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "threshold": self.threshold,
+            "loaded_at": self.loaded_at,
+            "fast_path": self.engine is not None,
+            "explain": self.explainer is not None,
+        }
+
+
+def bundle_version(path):
+    """Short content hash of a bundle file, stable across workers and restarts."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_version(path, threshold=None, mmap=True, fast_path=True, explain_cache_size=10000,
+                 parallel=None, timings=None):
+    """Load, compile and verify a bundle into a ModelVersion (not yet warmed up).
+
+    `timings`, if given, receives seconds for model_load / fast_path / explainer.
+    """
+    clock = time.perf_counter()
+
+    def mark(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        if timings is not None:
+            timings[stage] = round(now - clock, 4)
+        clock = now
+
+    version = bundle_version(path)
+    bundle = load(path, mmap_mode="r" if mmap else None)
+    model = bundle["model"]
+    mark("model_load")
+    # flattened encoder + forest, verified against sklearn (None -> sklearn path)
+    engine = load_fast_path(model) if fast_path else None
+    mark("fast_path")
+    try:
+        # path attributions need the flattened forest even when scoring uses sklearn
+        explainer = ForestExplainer(engine or CompiledPipeline(model), cache_size=explain_cache_size)
+    except ValueError as e:
+        print("Feature attributions unavailable:", e)
+        explainer = None
+    mark("explainer")
+    return ModelVersion(
+        model, float(bundle["threshold"] if threshold is None else threshold), path, version,
+        engine=engine, explainer=explainer, parallel=parallel
+    )
+
+
+# ---------- Shadow scoring ----------
+
+class ShadowScorer:
+    """Score a sample of live traffic with a candidate version off the request path."""
+
+    def __init__(self, candidate, sample_rate=0.05, max_queue_size=1000):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.max_queue_size = max_queue_size
+        self._closed = False
+        self._stats = {
+            "sampled": 0, "scored": 0, "dropped": 0, "errors": 0,
+            "agree": 0, "flips_to_fraud": 0, "flips_to_safe": 0,
+            "abs_diff_total": 0.0, "abs_diff_max": 0.0,
+            "shadow_seconds_total": 0.0, "request_path_seconds_total": 0.0,
+        }
+        self._start_worker()
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    def offer(self, records, probs, threshold):
+        """Called after primary scoring; samples and enqueues without blocking."""
+        start = time.perf_counter()
+        if len(records) == 1:
+            picked = [0] if random.random() < self.sample_rate else []
+        else:
+            picked = np.flatnonzero(np.random.random(len(records)) < self.sample_rate).tolist()
+        if picked:
+            item = ([records[i] for i in picked], [float(probs[i]) for i in picked], threshold)
+            try:
+                self._queue.put_nowait(item)
+                dropped = 0
+            except queue.Full:
+                dropped = len(picked)
+        with self._lock:
+            if picked:
+                self._stats["sampled"] += len(picked)
+                self._stats["dropped"] += dropped
+            self._stats["request_path_seconds_total"] += time.perf_counter() - start
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        scored = snapshot["scored"]
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["sample_rate"] = self.sample_rate
+        snapshot["candidate"] = self.candidate.info()
+        snapshot["agreement"] = snapshot["agree"] / scored if scored else None
+        snapshot["abs_diff_mean"] = snapshot["abs_diff_total"] / scored if scored else None
+        snapshot["shadow_ms_per_record"] = (
+            snapshot["shadow_seconds_total"] / scored * 1000 if scored else None
+        )
+        return snapshot
+
+    def _start_worker(self):
+        if self._closed:
+            return
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            records, primary, threshold = item
+            start = time.perf_counter()
+            try:
+                shadow = self.candidate.predict_records(records)
+            except Exception as e:
+                print("Shadow scoring failed:", e)
+                with self._lock:
+                    self._stats["errors"] += len(records)
+                continue
+            elapsed = time.perf_counter() - start
+            primary = np.asarray(primary)
+            diff = np.abs(shadow - primary)
+            old = primary >= threshold
+            new = shadow >= self.candidate.threshold
+            with self._lock:
+                self._stats["scored"] += len(records)
+                self._stats["agree"] += int((old == new).sum())
+                self._stats["flips_to_fraud"] += int((~old & new).sum())
+                self._stats["flips_to_safe"] += int((old & ~new).sum())
+                self._stats["abs_diff_total"] += float(diff.sum())
+                self._stats["abs_diff_max"] = max(self._stats["abs_diff_max"], float(diff.max()))
+                self._stats["shadow_seconds_total"] += elapsed
+
+
+# ---------- Registry ----------
+
+class ModelRegistry:
+    """Active model version with background reloads, threshold changes and a shadow."""
+
+    def __init__(self, active, loader=load_version, history_size=20):
+        # loader(path, threshold) -> ModelVersion; defaults to load_version
+        self.active = active
+        self.shadow = None
+        self.loader = loader
+        self.history_size = history_size
+        self.history = [active.info()]
+        self.last_error = None
+        # threshold set through set_threshold / reload(threshold=...); file-watch reloads keep it
+        self.threshold_override = None
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._watch_stop = None
+
+    def reload(self, path=None, threshold=None, wait=False):
+        """Load `path` (default: the active path) in the background and swap it in."""
+        path = path or self.active.path
+        thread = threading.Thread(target=self._reload, args=(path, threshold), name="model-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def set_threshold(self, threshold):
+        """Swap in the active model under a new threshold; no reload needed."""
+        with self._reload_lock:
+            self._activate(self.active.with_threshold(threshold))
+            self.threshold_override = self.active.threshold
+        return self.active
+
+    def start_shadow(self, path, sample_rate, threshold=None):
+        """Load a candidate and start shadow scoring it (blocking; call off the event loop)."""
+        candidate = self.loader(path, threshold)
+        candidate.warm_up()
+        previous, self.shadow = self.shadow, ShadowScorer(candidate, sample_rate)
+        if previous is not None:
+            previous.close()
+        return self.shadow
+
+    def stop_shadow(self):
+        shadow, self.shadow = self.shadow, None
+        if shadow is not None:
+            shadow.close()
+        return shadow
+
+    def add_listener(self, fn):
+        """fn(new_version) is called after every swap (e.g. to drop cached predictions)."""
+        self._listeners.append(fn)
+
+    def offer_shadow(self, records, probs, threshold):
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.offer(records, probs, threshold)
+
+    def watch(self, interval):
+        """Reload whenever the active bundle file changes (every worker polls on its own)."""
+        self._watch_stop = threading.Event()
+        threading.Thread(target=self._watch, args=(interval, self._watch_stop),
+                         name="model-watch", daemon=True).start()
+
+    def close(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+        self.stop_shadow()
+
+    def info(self):
+        return {
+            "active": self.active.info(),
+            "history": list(self.history),
+            "last_error": self.last_error,
+            "threshold_override": self.threshold_override,
+            "shadow": self.shadow.stats() if self.shadow is not None else None,
+        }
+
+    # ---------- internals ----------
+
+    def _reload(self, path, threshold, keep_threshold=False):
+        with self._reload_lock:
+            if keep_threshold:
+                threshold = self.threshold_override
+            try:
+                candidate = self.loader(path, threshold)
+                candidate.warm_up()
+            except Exception as e:
+                self.last_error = f"{path}: {e}"
+                print("Model reload failed, keeping version", self.active.version, "-", e)
+                return
+            self._activate(candidate)
+            self.threshold_override = threshold
+            print(f"Model version {candidate.version} (threshold {candidate.threshold}) is now active")
+
+    def _activate(self, version):
+        self.active = version        # one reference swap; in-flight requests keep their own
+        self.last_error = None
+        self.history.append(version.info())
+        del self.history[:-self.history_size]
+        for fn in self._listeners:
+            try:
+                fn(version)
+            except Exception as e:
+                print("Model swap listener failed:", e)
+
+    def _watch(self, interval, stop):
+        def signature():
+            try:
+                st = os.stat(self.active.path)
+                return st.st_mtime_ns, st.st_size, st.st_ino
+            except OSError:
+                return None
+
+        seen = signature()
+        while not stop.wait(interval):
+            current = signature()
+            if current is not None and current != seen:
+                seen = current
+                if bundle_version(self.active.path) != self.active.version:
+                    self._reload(self.active.path, None, keep_threshold=True)
@@ -0,0 +1,477 @@
+"""Fraud-rate rollups per minute / hour / day, maintained incrementally.
+
+The analytical queries in `Banking _Fraud Detection.sql` recompute fraud
+counts with a GROUP BY over the whole table on every run.  Here every event
+is counted once, when it happens, into the fraud_rollups table:
+
+    (source, granularity, bucket_start, dimension, value)
+        -> events, flagged, amount_sum, flagged_amount_sum, probability_sum
+
+* source       "predictions" (the scoring path; flagged = fraud_prediction)
+               or "transactions" (new `transactions` rows; flagged = label_fraud)
+* granularity  minute, hour, day
+* dimension    all, channel, txn_type, city, state, is_international (Y/N)
+
+RollupAggregator adds events into an in-memory dict of deltas -- one bincount
+per dimension for a batch -- and a flusher thread upserts the deltas every
+few seconds (`events = events + new events`), so several API workers can add
+into the same rows.  Minute rows are pruned after `minute_retention_hours`.
+
+RollupTable answers the dashboard questions from those rows.  rates() tiles
+[start, end) with the coarsest buckets that fit (minutes up to the first
+whole hour, hours up to the first whole day, days, then back down), so a
+90-day report reads about 90 + 2 * (23 + 59) rows per value whatever the
+traffic.  Ranges older than the minute retention should start and end on
+whole hours.
+
+    python rollups.py ingest --source mysql --follow        # new transactions, by transaction_id
+    python rollups.py ingest --source "Banking _Fraud Detection.sql" --sqlite rollups.db
+    python rollups.py rates --dimension channel --source transactions --sqlite rollups.db
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+DIMENSIONS = ["all", "channel", "txn_type", "city", "state", "is_international"]
+# granularity -> numpy datetime64 unit of its buckets
+GRANULARITIES = {"minute": "m", "hour": "h", "day": "D"}
+SOURCES = ["predictions", "transactions"]
+METRIC_COLUMNS = ["events", "flagged", "amount_sum", "flagged_amount_sum", "probability_sum"]
+KEY_COLUMNS = ["source", "granularity", "bucket_start", "dimension", "value"]
+
+MYSQL_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS fraud_rollups (
+        source VARCHAR(16) NOT NULL,
+        granularity VARCHAR(8) NOT NULL,
+        bucket_start DATETIME NOT NULL,
+        dimension VARCHAR(20) NOT NULL,
+        value VARCHAR(64) NOT NULL,
+        events BIGINT NOT NULL,
+        flagged BIGINT NOT NULL,
+        amount_sum DOUBLE NOT NULL,
+        flagged_amount_sum DOUBLE NOT NULL,
+        probability_sum DOUBLE NOT NULL,
+        PRIMARY KEY (source, granularity, dimension, bucket_start, value)
+    ) ENGINE=InnoDB
+"""
+SQLITE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS fraud_rollups (
+        source TEXT NOT NULL,
+        granularity TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        events INTEGER NOT NULL,
+        flagged INTEGER NOT NULL,
+        amount_sum REAL NOT NULL,
+        flagged_amount_sum REAL NOT NULL,
+        probability_sum REAL NOT NULL,
+        PRIMARY KEY (source, granularity, dimension, bucket_start, value)
+    )
+"""
+
+
+def _floor(ts, granularity):
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(ts, granularity):
+    floor = _floor(ts, granularity)
+    if floor == ts:
+        return ts
+    step = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+    return floor + step[granularity]
+
+
+def cover(start, end):
+    """[(granularity, lo, hi)] tiling the minute-aligned range [start, end) with the fewest buckets."""
+    lo, hi = _floor(start, "minute"), _floor(end, "minute")
+    spans = []
+    levels = list(GRANULARITIES)
+    for fine, coarse in zip(levels, levels[1:]):
+        head_end = min(_ceil(lo, coarse), hi)
+        tail_start = max(_floor(hi, coarse), head_end)
+        if head_end > lo:
+            spans.append((fine, lo, head_end))
+        if hi > tail_start:
+            spans.append((fine, tail_start, hi))
+        lo, hi = head_end, tail_start
+        if lo >= hi:
+            break
+    else:
+        spans.append((levels[-1], lo, hi))
+    return spans
+
+
+def _bucket(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------- Aggregation ----------
+
+class RollupAggregator:
+    """In-memory rollup deltas, flushed to a RollupTable by a background thread."""
+
+    def __init__(self, table, flush_interval=5.0, minute_retention_hours=48.0):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.minute_retention = timedelta(hours=minute_retention_hours)
+        self._stats = {"events": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0}
+        self._last_prune = 0.0
+        self._bucket_cache = (None, [])
+        self._start_worker()
+        # threads do not survive fork (gunicorn --preload): start a fresh one in the child
+        os.register_at_fork(after_in_child=self._start_worker)
+
+    def add_prediction(self, record, probability, decision, at=None):
+        """Count one scored record (a validated feature dict)."""
+        at = at or datetime.now()
+        flagged = int(decision)
+        amount = float(record["amount"])
+        delta = (1, flagged, amount, amount * flagged, float(probability))
+        values = self._record_values(record)
+        buckets = self._buckets(at)
+        with self._lock:
+            for granularity, bucket in buckets:
+                for dimension, value in values:
+                    self._bump(("predictions", granularity, bucket, dimension, value), delta)
+            self._stats["events"] += 1
+
+    def add_predictions(self, X, probabilities, decisions, at=None):
+        """Count a scored batch (validated DataFrame with the model features).
+
+        `at` is one time for the whole batch (default now) or one per row.
+        """
+        n = len(X)
+        if not n:
+            return
+        if at is None or isinstance(at, datetime):
+            at = np.full(n, np.datetime64(at or datetime.now(), "us"))
+        else:
+            at = pd.to_datetime(at).to_numpy(dtype="datetime64[us]")
+        self._add("predictions", at, self._frame_values(X), np.asarray(decisions),
+                  X["amount"].to_numpy(dtype=np.float64), np.asarray(probabilities, dtype=np.float64))
+
+    def add_transactions(self, df):
+        """Count labelled transactions (raw joined rows: txn_timestamp, amount, label_fraud, ...)."""
+        if not len(df):
+            return
+        at = pd.to_datetime(df["txn_timestamp"]).to_numpy(dtype="datetime64[us]")
+        values = self._frame_values(df)
+        self._add("transactions", at, values, df["label_fraud"].to_numpy(),
+                  pd.to_numeric(df["amount"]).to_numpy(dtype=np.float64), None)
+
+    def flush(self):
+        """Write the pending deltas now; on failure they are kept for the next attempt."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [key + tuple(delta) for key, delta in pending.items()]
+        try:
+            self.table.apply(rows)
+        except Exception as e:
+            print("Rollup flush failed, keeping deltas for the next attempt:", e)
+            with self._lock:
+                for key, delta in pending.items():
+                    self._bump(key, delta)
+                self._stats["flush_errors"] += 1
+            return 0
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["rows_written"] += len(rows)
+        return len(rows)
+
+    def close(self):
+        """Stop the flusher and write what is still pending."""
+        self._stop.set()
+        self._worker.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["pending_rows"] = len(self._pending)
+        return snapshot
+
+    # ---------- internals ----------
+
+    def _buckets(self, at):
+        # bucket labels change once a minute; format them once
+        minute = at.replace(second=0, microsecond=0)
+        cached = self._bucket_cache
+        if cached[0] != minute:
+            cached = self._bucket_cache = (minute, [(g, _floor(at, g).isoformat(sep=" ")) for g in GRANULARITIES])
+        return cached[1]
+
+    @staticmethod
+    def _record_values(record):
+        return [("all", "all"), ("channel", record["channel"]), ("txn_type", record["txn_type"]),
+                ("city", record["city"]), ("state", record["state"]),
+                ("is_international", "Y" if record["is_international_flag"] else "N")]
+
+    @staticmethod
+    def _frame_values(df):
+        values = {"all": np.zeros(len(df), dtype=np.int8)}
+        for dimension in ("channel", "txn_type", "city", "state"):
+            values[dimension] = df[dimension].astype(str).to_numpy()
+        if "is_international_flag" in df.columns:
+            values["is_international"] = np.where(df["is_international_flag"].to_numpy() != 0, "Y", "N")
+        else:
+            values["is_international"] = df["is_international"].astype(str).to_numpy()
+        return values
+
+    def _add(self, source, at, values, flagged, amount, probability):
+        flagged = flagged.astype(np.float64)
+        metrics = np.column_stack([
+            np.ones(len(at)), flagged, amount, amount * flagged,
+            np.zeros(len(at)) if probability is None else probability,
+        ])
+        deltas = []
+        factorized = {dimension: pd.factorize(v) for dimension, v in values.items()}
+        # minute rows older than the retention would only be pruned again (backfills)
+        recent = at >= np.datetime64(datetime.now() - self.minute_retention, "us")
+        for granularity, unit in GRANULARITIES.items():
+            keep = recent if granularity == "minute" and not recent.all() else slice(None)
+            bucket_codes, buckets = pd.factorize(at[keep].astype(f"datetime64[{unit}]"))
+            labels = [_bucket(b) for b in buckets]
+            for dimension, (value_codes, uniques) in factorized.items():
+                key_codes, keys = pd.factorize(bucket_codes * len(uniques) + value_codes[keep])
+                sums = np.column_stack([np.bincount(key_codes, weights=metrics[keep, j], minlength=len(keys))
+                                        for j in range(metrics.shape[1])])
+                for key, delta in zip(keys.tolist(), sums.tolist()):
+                    value = "all" if dimension == "all" else str(uniques[key % len(uniques)])
+                    deltas.append(((source, granularity, labels[key // len(uniques)], dimension, value), delta))
+        with self._lock:
+            for key, delta in deltas:
+                self._bump(key, delta)
+            self._stats["events"] += len(at)
+
+    def _bump(self, key, delta):
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = list(delta)
+        else:
+            for i, d in enumerate(delta):
+                current[i] += d
+
+    def _start_worker(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="rollup-flusher", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_prune >= 3600:
+                try:
+                    self.table.prune("minute", datetime.now() - self.minute_retention)
+                    self._last_prune = time.monotonic()
+                except Exception as e:
+                    print("Rollup prune failed:", e)
+
+
+# ---------- Storage and queries ----------
+
+class RollupTable:
+    """The fraud_rollups table in MySQL or SQLite: upserts and the dashboard queries."""
+
+    def __init__(self, connect, dialect="mysql"):
+        # connect: callable returning a new DB-API connection
+        self.connect = connect
+        self.dialect = dialect
+        self._ready = False
+        columns = KEY_COLUMNS + METRIC_COLUMNS
+        placeholders = ", ".join([self._p] * len(columns))
+        if dialect == "sqlite":
+            updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in METRIC_COLUMNS)
+            conflict = f"ON CONFLICT (source, granularity, dimension, bucket_start, value) DO UPDATE SET {updates}"
+        else:
+            updates = ", ".join(f"{c} = {c} + VALUES({c})" for c in METRIC_COLUMNS)
+            conflict = f"ON DUPLICATE KEY UPDATE {updates}"
+        self.upsert_sql = f"INSERT INTO fraud_rollups ({', '.join(columns)}) VALUES ({placeholders}) {conflict}"
+
+    @property
+    def _p(self):
+        return "?" if self.dialect == "sqlite" else "%s"
+
+    def _run(self, fn):
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            if not self._ready:
+                # created on first use so a database that is down at boot does not block startup
+                cur.execute(SQLITE_TABLE_SQL if self.dialect == "sqlite" else MYSQL_TABLE_SQL)
+                self._ready = True
+            result = fn(cur)
+            conn.commit()
+            cur.close()
+            return result
+        finally:
+            conn.close()
+
+    def apply(self, rows):
+        """Add (key columns..., metric deltas...) rows onto the stored counters."""
+        self._run(lambda cur: cur.executemany(self.upsert_sql, rows))
+
+    def prune(self, granularity, before):
+        self._run(lambda cur: cur.execute(
+            f"DELETE FROM fraud_rollups WHERE granularity = {self._p} AND bucket_start < {self._p}",
+            (granularity, before.isoformat(sep=" "))
+        ))
+
+    def rates(self, dimension="channel", source="predictions", start=None, end=None):
+        """Events, flagged count, fraud_rate_pct, amounts and mean probability per value over [start, end).
+
+        Defaults to the last 24 hours up to the end of the current minute.
+        """
+        end = end or _floor(datetime.now(), "minute") + timedelta(minutes=1)
+        start = start or end - timedelta(days=1)
+        spans = cover(start, end)
+        if not spans:
+            return []
+        p = self._p
+        where = " OR ".join(f"(granularity = {p} AND bucket_start >= {p} AND bucket_start < {p})" for _ in spans)
+        params = [source, dimension]
+        for granularity, lo, hi in spans:
+            params += [granularity, lo.isoformat(sep=" "), hi.isoformat(sep=" ")]
+        query = (f"SELECT value, SUM(events), SUM(flagged), SUM(amount_sum), SUM(flagged_amount_sum), "
+                 f"SUM(probability_sum) FROM fraud_rollups WHERE source = {p} AND dimension = {p} "
+                 f"AND ({where}) GROUP BY value")
+
+        def fetch(cur):
+            cur.execute(query, params)
+            return cur.fetchall()
+
+        results = []
+        for value, events, flagged, amount, flagged_amount, probability in self._run(fetch):
+            events, flagged = int(events), int(flagged)
+            results.append({
+                "value": value,
+                "events": events,
+                "flagged": flagged,
+                "fraud_rate_pct": round(100.0 * flagged / events, 2) if events else None,
+                "amount_sum": round(float(amount), 2),
+                "flagged_amount_sum": round(float(flagged_amount), 2),
+                "mean_probability": round(float(probability) / events, 4) if source == "predictions" else None,
+            })
+        results.sort(key=lambda r: (-(r["fraud_rate_pct"] or 0), r["value"]))
+        return results
+
+    def series(self, dimension="all", granularity="hour", source="predictions", start=None, end=None,
+               value=None):
+        """Per-bucket events / flagged / fraud_rate_pct in [start, end), oldest first."""
+        end = end or datetime.now()
+        start = start or end - timedelta(days=1)
+        p = self._p
+        query = (f"SELECT bucket_start, value, events, flagged FROM fraud_rollups "
+                 f"WHERE source = {p} AND granularity = {p} AND dimension = {p} "
+                 f"AND bucket_start >= {p} AND bucket_start < {p}")
+        params = [source, granularity, dimension, _floor(start, granularity).isoformat(sep=" "),
+                  end.isoformat(sep=" ")]
+        if value is not None:
+            query += f" AND value = {p}"
+            params.append(value)
+        query += " ORDER BY bucket_start, value"
+
+        def fetch(cur):
+            cur.execute(query, params)
+            return cur.fetchall()
+
+        return [
+            {"bucket_start": str(bucket), "value": v, "events": int(events), "flagged": int(flagged),
+             "fraud_rate_pct": round(100.0 * int(flagged) / int(events), 2) if events else None}
+            for bucket, v, events, flagged in self._run(fetch)
+        ]
+
+
+def sqlite_table(path):
+    import sqlite3
+    return RollupTable(lambda: sqlite3.connect(path), "sqlite")
+
+
+def mysql_table(**connect_kwargs):
+    import mysql.connector
+    return RollupTable(lambda: mysql.connector.connect(**connect_kwargs), "mysql")
+
+
+# ---------- Transactions feed ----------
+
+def ingest(aggregator, chunks):
+    """Count every chunk of raw joined transaction rows; returns (rows, last transaction_id)."""
+    rows, last_id = 0, None
+    for chunk in chunks:
+        aggregator.add_transactions(chunk)
+        aggregator.flush()
+        rows += len(chunk)
+        if "transaction_id" in chunk.columns:
+            last_id = int(chunk["transaction_id"].max())
+        print(f"  {rows:>12,} transactions  last id {last_id}")
+    return rows, last_id
+
+
+def main():
+    from prediction_store import mysql_config
+    from train import mysql_chunks, source_chunks
+
+    parser = argparse.ArgumentParser(description="Feed and query the fraud_rollups table.")
+    parser.add_argument("command", choices=["ingest", "rates", "series"])
+    parser.add_argument("--source", default="mysql",
+                        help="ingest: 'mysql', a .sql dump, .parquet or CSV/NDJSON of joined transactions; "
+                             "rates/series: 'predictions' or 'transactions'")
+    parser.add_argument("--sqlite", help="use this SQLite file instead of the FRAUD_DB_* MySQL database")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--after-id", type=int, default=-1, help="ingest: first transaction_id is after this")
+    parser.add_argument("--follow", action="store_true", help="ingest: keep polling MySQL for new rows")
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    parser.add_argument("--dimension", default="channel", choices=DIMENSIONS)
+    parser.add_argument("--granularity", default="hour", choices=list(GRANULARITIES))
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    table = sqlite_table(args.sqlite) if args.sqlite else mysql_table(**mysql_config())
+    if args.command != "ingest":
+        source = args.source if args.source in SOURCES else "predictions"
+        if args.command == "rates":
+            rows = table.rates(args.dimension, source, args.start, args.end)
+        else:
+            rows = table.series(args.dimension, args.granularity, source, args.start, args.end)
+        print(pd.DataFrame(rows).to_string(index=False) if rows else "no rows")
+        return
+
+    aggregator = RollupAggregator(table, flush_interval=3600)
+    try:
+        if args.source != "mysql":
+            print(ingest(aggregator, source_chunks(args.source, args.chunk_size)))
+            return
+        import mysql.connector
+        conn = mysql.connector.connect(**mysql_config())
+        last_id = args.after_id
+        try:
+            while True:
+                _, last = ingest(aggregator, mysql_chunks(conn, args.chunk_size, after_id=last_id))
+                last_id = last if last is not None else last_id
+                if not args.follow:
+                    break
+                time.sleep(args.poll_seconds)
+        finally:
+            conn.close()
+    finally:
+        aggregator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Typed transaction schema shared by the JSON, batch and form endpoints.
+
+One Pydantic v2 model; pydantic-core validates request bytes straight into it
+(no intermediate dict from json.loads) and drops unknown fields while parsing.
+The transaction's own fields are required.  The account-derived ones
+(balance, age, account aggregates, customer profile) may be left out when an
+`account_id` is sent and the feature store is on; scoring.validate_record
+reports any that are still missing.  Integer fields (hour, day of week, the
+0/1 flags, age, counts) are ints within their ranges; "3" and 3.0 are
+accepted as 3, while 3.5 or an out-of-range value is an invalid field.
+
+Encoding stays a separate step: the validated record is also the cache key,
+the log row and the reason-code input, and CompiledPipeline.encode_records
+writes it into its preallocated float32 matrix in feature order.
+
+Schema errors are turned into the same `missing_fields` / `invalid_fields`
+(or, for batches, `invalid_rows`) details the API already returns.
+
+Run `python schema.py` for a per-request validation + encoding microbenchmark.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from pydantic import ValidationError as SchemaError
+
+
+class Transaction(BaseModel):
+    """One transaction to score (the 15 model inputs, optionally an account_id / transaction_id)."""
+
+    model_config = ConfigDict(extra="ignore", allow_inf_nan=False, coerce_numbers_to_str=True)
+
+    # accounts.account_id; "123" is accepted and stored as 123, like the store's keys
+    account_id: Optional[int] = None
+    # transactions.transaction_id, recorded on the fraud alert when the score is flagged
+    transaction_id: Optional[int] = None
+
+    # the transaction itself; the calendar fields and flags are INT columns of
+    # fraud_predictions, so 3.5 or 9 is rejected here rather than scored
+    amount: float
+    hour: int = Field(ge=0, le=23)
+    day_of_week: int = Field(ge=0, le=6)
+    is_weekend: int = Field(ge=0, le=1)
+    is_international_flag: int = Field(ge=0, le=1)
+    txn_type: str
+    channel: str
+
+    # account / customer fields (can come from the feature store)
+    balance: Optional[float] = None
+    age: Optional[int] = Field(default=None, ge=0)
+    txns_per_account: Optional[int] = Field(default=None, ge=0)
+    avg_amount_account: Optional[float] = None
+    account_type: Optional[str] = None
+    gender: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+
+    def as_dict(self):
+        """Fields that were provided, as a plain dict (for the feature store)."""
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+
+class TransactionBatch(BaseModel):
+    """{"transactions": [...]} form of a batch request."""
+
+    transactions: List[Transaction]
+
+
+TRANSACTION_LIST = TypeAdapter(List[Transaction])
+
+
+def parse_transaction(body):
+    """Validate one JSON object (bytes/str) into a Transaction; raises SchemaError."""
+    return Transaction.model_validate_json(body)
+
+
+def parse_transaction_batch(body):
+    """Validate a JSON array or {"transactions": [...]} body into a list of Transactions."""
+    if body.lstrip()[:1] in (b"{", "{"):
+        return TransactionBatch.model_validate_json(body).transactions
+    return TRANSACTION_LIST.validate_json(body)
+
+
+def error_detail(error, batch=False):
+    """SchemaError -> the API's {"missing_fields"/"invalid_fields"} or {"invalid_rows"} detail."""
+    missing, invalid, rows = [], [], {}
+    for e in error.errors():
+        loc = [part for part in e["loc"] if part != "transactions"]
+        if batch and len(loc) >= 2 and isinstance(loc[0], int):
+            rows.setdefault(str(loc[1]), []).append(loc[0])
+        elif not loc:
+            invalid.append("body")
+        elif e["type"] == "missing":
+            missing.append(str(loc[-1]))
+        else:
+            invalid.append(str(loc[-1]))
+    if batch and rows:
+        # row indices (first 20 per field) that failed validation, like validate_frame
+        return {"invalid_rows": {field: idx[:20] for field, idx in rows.items()}}
+    detail = {}
+    if missing:
+        detail["missing_fields"] = missing
+    if invalid:
+        detail["invalid_fields"] = invalid
+    return detail
+
+
+if __name__ == "__main__":
+    import json
+    import time
+
+    import pandas as pd
+    from joblib import load
+
+    import schema     # the module scoring imports, not this __main__ copy
+    from fast_forest import CompiledPipeline
+    from scoring import validate_record
+
+    pipeline = load("fraud_rf_pipeline.joblib")["model"]
+    preprocess = pipeline.steps[0][1]
+    compiled = CompiledPipeline(pipeline)
+    body = json.dumps({
+        "amount": 95000, "balance": 12000, "hour": 2, "day_of_week": 6, "is_weekend": 1,
+        "is_international_flag": 1, "age": 22, "txns_per_account": 8, "avg_amount_account": 1500,
+        "txn_type": "ONLINE", "channel": "mobile", "account_type": "savings", "gender": "M",
+        "city": "Mumbai", "state": "Maharashtra",
+        "request_id": "a1b2c3", "client_ip": "10.0.0.1", "note": "extra fields are ignored",
+    }).encode()
+
+    def original():
+        # what /predict did originally: dict -> one-row DataFrame -> ColumnTransformer
+        data = json.loads(body)
+        return preprocess.transform(pd.DataFrame([data]))
+
+    def dict_path():
+        # json.loads -> hand-written validate_record -> compiled encoder
+        return compiled.encode_records([validate_record(json.loads(body))])
+
+    def schema_path():
+        # bytes -> Transaction (pydantic-core) -> record -> compiled encoder
+        return compiled.encode_records([validate_record(schema.parse_transaction(body))])
+
+    assert (dict_path() == schema_path()).all()
+    assert (original().astype("float32") == schema_path()).all()
+    for label, fn, repeat in [("original (DataFrame + ColumnTransformer)", original, 300),
+                              ("dict + validate_record + encode", dict_path, 20000),
+                              ("Transaction schema + encode", schema_path, 20000)]:
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        print(f"{label:<42} {(time.perf_counter() - start) / repeat * 1e6:9.1f} us/request")
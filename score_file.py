@@ -0,0 +1,160 @@
+"""Rescore a transaction file in chunks with bounded memory.
+
+    python score_file.py transactions.csv scored.csv
+    python score_file.py transactions.ndjson.gz scored.ndjson --chunk-size 200000
+
+Input is CSV or NDJSON (optionally compressed) with either the model features
+or the raw columns from the notebook's SQL join (see features.py).  When
+txns_per_account / avg_amount_account are absent, a first pass over the file
+collects per-account totals (O(accounts) memory); the scoring pass then
+engineers features, scores and writes one chunk at a time.
+
+Output has the id columns found in the input (transaction_id, account_id,
+label_fraud) plus fraud_probability, fraud_prediction and reason_code.  Rows
+missing a model feature are skipped and counted.
+"""
+import argparse
+import os
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from fast_forest import load_fast_path
+from features import AccountTotals, add_row_features
+from parallel import ParallelScorer
+from reasons import reason_codes
+from scoring import FEATURE_COLUMNS, NUMERIC_FEATURES, CATEGORICAL_FEATURES
+
+
+ID_COLUMNS = ["transaction_id", "account_id", "label_fraud"]
+TOTALS_COLUMNS = ["account_id", "amount", "balance"]
+
+
+def _is_ndjson(path):
+    name = path[:-len(os.path.splitext(path)[1])] if path.endswith((".gz", ".bz2", ".xz", ".zst")) else path
+    return name.endswith((".ndjson", ".jsonl", ".json"))
+
+
+def read_chunks(path, chunk_size, columns=None):
+    """DataFrames of at most chunk_size rows from a CSV or NDJSON file."""
+    if _is_ndjson(path):
+        with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            for chunk in reader:
+                yield chunk if columns is None else chunk[[c for c in columns if c in chunk.columns]]
+    else:
+        usecols = None if columns is None else (lambda c: c in columns)
+        with pd.read_csv(path, chunksize=chunk_size, usecols=usecols) as reader:
+            yield from reader
+
+
+def _header(path):
+    return next(read_chunks(path, 1)).columns
+
+
+def account_totals(path, chunk_size):
+    """First pass: per-account totals for the whole-table features."""
+    totals = AccountTotals()
+    for chunk in read_chunks(path, chunk_size, TOTALS_COLUMNS):
+        totals.update(chunk)
+    return totals.finish()
+
+
+def score_chunk(chunk, predict, threshold, totals=None):
+    """Engineer features and score one chunk; returns the output frame and skipped count."""
+    chunk = add_row_features(chunk)
+    if totals is not None:
+        chunk = totals.add_account_features(chunk)
+    missing = [c for c in FEATURE_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"cannot derive model features {missing} from the input columns")
+
+    X = chunk[FEATURE_COLUMNS].copy()
+    for col in NUMERIC_FEATURES:
+        X[col] = pd.to_numeric(X[col], errors="coerce").astype(float)
+    valid = X.notna().all(axis=1).to_numpy()
+    X = X[valid]
+    for col in CATEGORICAL_FEATURES:
+        X[col] = X[col].astype(str)
+
+    out = chunk.loc[valid, [c for c in ID_COLUMNS if c in chunk.columns]].copy()
+    probs = predict(X) if len(X) else np.empty(0)
+    out["fraud_probability"] = probs
+    out["fraud_prediction"] = (probs >= threshold).astype(int)
+    out["reason_code"] = reason_codes(X)
+    return out, int((~valid).sum())
+
+
+def write_chunk(out, path, first):
+    if _is_ndjson(path):
+        out.to_json(path, orient="records", lines=True, mode="w" if first else "a")
+    else:
+        out.to_csv(path, index=False, mode="w" if first else "a", header=first)
+
+
+def score_file(input_path, output_path, model_path="fraud_rf_pipeline.joblib",
+               chunk_size=100000, threshold=None, fast_path=True, processes=1):
+    """Stream input_path through the model into output_path; returns run stats."""
+    bundle = load(model_path)
+    model = bundle["model"]
+    threshold = bundle["threshold"] if threshold is None else threshold
+    engine = load_fast_path(model) if fast_path else None
+    predict = engine.predict_frame if engine is not None else (lambda X: model.predict_proba(X)[:, 1])
+    parallel = None
+    if processes > 1 and engine is not None:
+        parallel = ParallelScorer(processes=processes, min_rows=0)
+        predict = lambda X: parallel.predict_encoded(engine.encode_frame(X), model_path)
+
+    start = time.perf_counter()
+    totals = None
+    if not {"txns_per_account", "avg_amount_account"} <= set(_header(input_path)):
+        totals = account_totals(input_path, chunk_size)
+        print(f"account totals: {len(totals.count)} accounts in {time.perf_counter() - start:.1f}s")
+
+    rows = skipped = flagged = 0
+    scoring_start = time.perf_counter()
+    try:
+        for i, chunk in enumerate(read_chunks(input_path, chunk_size)):
+            out, bad = score_chunk(chunk, predict, threshold, totals)
+            write_chunk(out, output_path, first=(i == 0))
+            rows += len(out)
+            skipped += bad
+            flagged += int(out["fraud_prediction"].sum())
+            elapsed = time.perf_counter() - scoring_start
+            print(f"  {rows + skipped:>12,} rows  {(rows + skipped) / elapsed:>10,.0f} rows/s  "
+                  f"peak RSS {_peak_rss_mb():.0f} MB")
+    finally:
+        if parallel is not None:
+            parallel.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "skipped": skipped,
+        "flagged": flagged,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((rows + skipped) / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/NDJSON transaction file in chunks.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--model", default="fraud_rf_pipeline.joblib")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--threshold", type=float, default=None, help="override the bundle threshold")
+    parser.add_argument("--no-fast-path", action="store_true", help="score with plain sklearn")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for scoring")
+    args = parser.parse_args()
+
+    stats = score_file(args.input, args.output, args.model, args.chunk_size,
+                       args.threshold, fast_path=not args.no_fast_path, processes=args.processes)
+    print(stats)
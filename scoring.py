@@ -0,0 +1,490 @@
+"""Scoring service shared by every prediction endpoint.
+
+validate -> score -> reason code -> log, once per transaction, in one place.
+The JSON, batch and HTML endpoints in api.py are thin wrappers around it.
+Every request reads the registry's active model version once and uses it to
+the end, so a hot reload never mixes two models within one request.
+Reason text is only rendered when a caller asks for it (and for the log row).
+
+Concurrency: the async entry points keep the event loop for parsing,
+validation and in-process cache lookups.  Model work goes to the
+micro-batcher thread (single records) or to the service's inference
+executor (batches, attributions), as do reads of a network cache (Redis),
+whose writes are not waited for.  Prediction logging goes through the log
+writer's queue, rollup counts into an in-memory aggregator, flagged
+decisions into the alert queue's buffer and scored rows into the drift
+monitor's list, so a slow database never holds up scoring.  AdmissionLimit
+turns requests away up front when too many are already in flight.
+"""
+import asyncio
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from batcher import MicroBatcher
+from metrics import METRICS
+from prediction_log import prediction_row
+from reasons import reason_code, reason_codes, render_reason
+from schema import Transaction
+
+
+# Raw input columns expected by the pipeline (same lists as the notebook)
+NUMERIC_FEATURES = [
+    "amount",
+    "balance",
+    "hour",
+    "day_of_week",
+    "is_weekend",
+    "is_international_flag",
+    "age",
+    "txns_per_account",
+    "avg_amount_account"
+]
+CATEGORICAL_FEATURES = [
+    "txn_type",
+    "channel",
+    "account_type",
+    "gender",
+    "city",
+    "state"
+]
+FEATURE_COLUMNS = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+
+class ValidationError(ValueError):
+    """Request data cannot be scored; `detail` is returned to the client."""
+
+    def __init__(self, detail):
+        super().__init__(str(detail))
+        self.detail = detail
+
+
+class ScoringOverloaded(RuntimeError):
+    """The micro-batch queue is full."""
+
+
+class TooManyRequests(ScoringOverloaded):
+    """An AdmissionLimit is at capacity; the client should back off and retry."""
+
+
+# ---------- Admission control ----------
+
+class AdmissionLimit:
+    """Cap on requests in flight; over the cap a request is rejected at once."""
+
+    def __init__(self, max_inflight, name="requests"):
+        # max_inflight: 0 disables the limit
+        self.max_inflight = max_inflight
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {"inflight": 0, "peak_inflight": 0, "admitted": 0, "rejected": 0}
+
+    def __enter__(self):
+        with self._lock:
+            stats = self._stats
+            if self.max_inflight and stats["inflight"] >= self.max_inflight:
+                stats["rejected"] += 1
+                raise TooManyRequests(f"Too many {self.name} in flight, retry later")
+            stats["inflight"] += 1
+            stats["admitted"] += 1
+            stats["peak_inflight"] = max(stats["peak_inflight"], stats["inflight"])
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._stats["inflight"] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"max_inflight": self.max_inflight, **self._stats}
+
+
+# ---------- Validation ----------
+
+def validate_record(data):
+    """Return a clean record with exactly the model features, or raise ValidationError."""
+    if isinstance(data, Transaction):
+        # already typed by the schema; only completeness is left to check
+        record = {col: getattr(data, col) for col in FEATURE_COLUMNS}
+        missing = [col for col, value in record.items() if value is None]
+        if missing:
+            raise ValidationError({"missing_fields": missing})
+        return record
+    missing = [col for col in FEATURE_COLUMNS if data.get(col) is None]
+    if missing:
+        raise ValidationError({"missing_fields": missing})
+    record, invalid = {}, []
+    for col in NUMERIC_FEATURES:
+        value = data[col]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                invalid.append(col)
+                continue
+        if value != value:      # NaN
+            invalid.append(col)
+            continue
+        record[col] = value
+    for col in CATEGORICAL_FEATURES:
+        record[col] = str(data[col])
+    if invalid:
+        raise ValidationError({"invalid_fields": invalid})
+    return record
+
+
+def validate_account_id(value):
+    """account_id as an int, the type of accounts.account_id, or raise ValidationError."""
+    if value is None or type(value) is int:
+        return value
+    try:
+        account_id = int(value)
+        if isinstance(value, bool) or account_id != float(value):
+            raise ValueError(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValidationError({"invalid_fields": ["account_id"]})
+    return account_id
+
+
+def validate_account_ids(df):
+    """Copy of df whose account_id column is nullable Int64, or raise ValidationError."""
+    if "account_id" not in df.columns or df["account_id"].dtype == "Int64":
+        return df
+    ids = df["account_id"]
+    numbers = pd.to_numeric(ids, errors="coerce")
+    bad = (ids.notna() & (numbers.isna() | (numbers != numbers.round()))).to_numpy().nonzero()[0]
+    if len(bad):
+        raise ValidationError({"invalid_rows": {"account_id": bad[:20].tolist()}})
+    df = df.copy()
+    df["account_id"] = numbers.astype("Int64")
+    return df
+
+
+def validate_frame(df):
+    """Check all records at once and return the model input frame in feature order."""
+    missing = [col for col in FEATURE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValidationError({"missing_fields": missing})
+
+    X = df[FEATURE_COLUMNS].copy()
+    errors = {}
+    for col in NUMERIC_FEATURES:
+        values = pd.to_numeric(X[col], errors="coerce")
+        bad = values.isna().to_numpy().nonzero()[0]
+        if len(bad):
+            errors[col] = bad[:20].tolist()
+        X[col] = values.astype(float)
+    for col in CATEGORICAL_FEATURES:
+        bad = X[col].isna().to_numpy().nonzero()[0]
+        if len(bad):
+            errors[col] = bad[:20].tolist()
+        X[col] = X[col].astype(str)
+
+    if errors:
+        # row indices (first 20 per field) that failed validation
+        raise ValidationError({"invalid_rows": errors})
+    return X.reset_index(drop=True)
+
+
+# ---------- Service ----------
+
+class ScoringService:
+    """Validate, score, explain and log transactions against the registry's active model."""
+
+    def __init__(self, registry, logger=None, microbatch=None, feature_store=None, cache=None,
+                 executor=None, rollups=None, alerts=None, velocity=None, drift=None):
+        # registry: registry.ModelRegistry; each request pins registry.active once
+        # logger: prediction_log.PredictionLogWriter or None to skip logging
+        # microbatch: MicroBatcher kwargs, or None to score each request on its own
+        # feature_store: feature_store.AccountFeatureStore filling fields from account_id
+        # cache: cache.PredictionCache answering repeated identical transactions, or None
+        # executor: concurrent.futures executor for inference off the event loop
+        #   (None = the event loop's default executor)
+        # rollups: rollups.RollupAggregator counting every decision, or None
+        # alerts: alerts.AlertQueue receiving every flagged decision, or None
+        # velocity: velocity.VelocityEngine adding per-account window features
+        #   to results of requests with an account_id, or None
+        # drift: drift.DriftMonitor histogramming every scored row, or None
+        self.registry = registry
+        self.executor = executor
+        self.logger = logger
+        self.feature_store = feature_store
+        self.cache = cache
+        self.rollups = rollups
+        self.alerts = alerts
+        self.velocity = velocity
+        self.drift = drift
+        if cache is not None:
+            registry.add_listener(cache.invalidate)
+        self.batcher = MicroBatcher(self._predict_queued, **microbatch) if microbatch else None
+
+    def warm_up(self):
+        """Warm the active model and the batcher so the first request pays no first-call costs."""
+        model = self.registry.active
+        model.warm_up()
+        if self.batcher is not None:
+            record = {col: 0.0 for col in NUMERIC_FEATURES}
+            record.update({col: "" for col in CATEGORICAL_FEATURES})
+            self.batcher.predict((model, record))
+
+    def _predict_queued(self, items):
+        """Batcher callback: (ModelVersion, record) pairs, each scored by its own version."""
+        groups = {}
+        for i, (model, record) in enumerate(items):
+            groups.setdefault(model, []).append(i)
+        probs = [None] * len(items)
+        for model, rows in groups.items():
+            for i, prob in zip(rows, model.predict_records([items[i][1] for i in rows]).tolist()):
+                probs[i] = prob
+        return probs
+
+    # ---------- single transaction ----------
+
+    def score(self, data, with_text=True, explain=False):
+        """Blocking scoring of one transaction (HTML form, scripts)."""
+        model = self.registry.active
+        record, account_id, transaction_id = self._prepare(model, data, explain)
+        key, prob = self.cache.lookup(record, model) if self.cache is not None else (None, None)
+        cached = prob is not None
+        if prob is None:
+            if self.batcher is not None:
+                try:
+                    prob = self.batcher.predict((model, record))
+                except queue.Full:
+                    raise ScoringOverloaded("Scoring queue is full, retry later")
+            else:
+                prob = float(model.predict_records([record])[0])
+            if key is not None:
+                self.cache.set_many([(key, prob)])
+        return self._finish(model, record, prob, with_text, explain, account_id, transaction_id, cached)
+
+    async def score_async(self, data, with_text=False, explain=False):
+        """Scoring of one transaction that waits on the batcher without holding a thread."""
+        model = self.registry.active
+        record, account_id, transaction_id = self._prepare(model, data, explain)
+        key, prob = await self._lookup_async(record, model)
+        cached = prob is not None
+        if prob is None:
+            if self.batcher is not None:
+                try:
+                    future = self.batcher.submit((model, record))
+                except queue.Full:
+                    raise ScoringOverloaded("Scoring queue is full, retry later")
+                prob = await asyncio.wrap_future(future)
+            else:
+                loop = asyncio.get_running_loop()
+                prob = float((await loop.run_in_executor(self.executor, model.predict_records, [record]))[0])
+            if key is not None:
+                self._store_async(key, prob)
+        result = self._finish(model, record, prob, with_text, False, account_id, transaction_id, cached)
+        if explain:
+            loop = asyncio.get_running_loop()
+            result.update(await loop.run_in_executor(self.executor, self._explanations, model, [record]))
+        return result
+
+    async def _lookup_async(self, record, model):
+        """Cache lookup that never waits on the network from the event loop."""
+        if self.cache is None:
+            return None, None
+        if not self.cache.blocking:
+            return self.cache.lookup(record, model)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.cache.lookup, record, model)
+
+    def _store_async(self, key, prob):
+        if not self.cache.blocking:
+            self.cache.set_many([(key, prob)])
+            return
+        # fire and forget: the response does not wait for the write (errors are counted by the cache)
+        asyncio.get_running_loop().run_in_executor(self.executor, self.cache.set_many, [(key, prob)])
+
+    def _prepare(self, model, data, explain):
+        """Fill account features from the store, then validate."""
+        self._check_explain(model, explain)
+        if isinstance(data, Transaction):
+            account_id, transaction_id = data.account_id, data.transaction_id
+        else:
+            account_id = validate_account_id(data.get("account_id"))
+            transaction_id = data.get("transaction_id")
+            if account_id is not None:
+                data = {**data, "account_id": account_id}
+        if self.feature_store is not None and account_id is not None:
+            data = self.feature_store.enrich(data.as_dict() if isinstance(data, Transaction) else data)
+        with METRICS.stage("validation"):
+            return validate_record(data), account_id, transaction_id
+
+    def _finish(self, model, record, prob, with_text, explain, account_id=None, transaction_id=None,
+                cached=False):
+        decision = int(prob >= model.threshold)
+        METRICS.count("decisions", ("fraud" if decision else "safe",))
+        with METRICS.stage("reason"):
+            code = reason_code(record)
+        with METRICS.stage("log"):
+            self._log(record, prob, decision, code)
+            if self.rollups is not None:
+                self.rollups.add_prediction(record, prob, decision)
+            if self.alerts is not None and decision:
+                self._alert([transaction_id], [prob], [code])
+            if self.drift is not None:
+                self.drift.observe(record, prob, decision)
+        if self.feature_store is not None and account_id is not None and not cached:
+            # a cached score is a resubmission, already counted when it was first scored
+            self.feature_store.record_transaction(account_id, record["amount"], transaction_id)
+        self.registry.offer_shadow([record], [prob], model.threshold)
+        with METRICS.stage("reason"):
+            result = self._result(prob, decision, code, with_text)
+        if self.velocity is not None and account_id is not None:
+            with METRICS.stage("velocity"):
+                result["velocity"] = self.velocity.observe(account_id, record["amount"])
+        if explain:
+            result.update(self._explanations(model, [record]))
+        return result
+
+    # ---------- attributions ----------
+
+    @staticmethod
+    def _check_explain(model, explain):
+        if explain and model.explainer is None:
+            raise ValidationError("explanations are not available for this model")
+
+    @staticmethod
+    def _explanations(model, records):
+        """Per-feature contributions for a single record."""
+        contributions = model.explainer.explain_records(records)
+        return {
+            "base_value": model.explainer.base_value,
+            "contributions": model.explainer.as_dicts(contributions)[0],
+        }
+
+    @staticmethod
+    def _result(prob, decision, code, with_text):
+        result = {"fraud_probability": prob, "fraud_prediction": decision, "reason_code": code}
+        if with_text:
+            result["reason"] = render_reason(code, decision == 1)
+        return result
+
+    # ---------- batches ----------
+
+    async def score_batch_async(self, df, with_text=False, explain=False):
+        """score_batch on the inference executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.score_batch, df, with_text, explain)
+
+    def score_batch(self, df, with_text=False, explain=False):
+        """Validate and score a DataFrame in one model call; results with the model version and threshold."""
+        model = self.registry.active
+        self._check_explain(model, explain)
+        df = validate_account_ids(df)
+        if self.feature_store is not None:
+            df = self.feature_store.enrich_frame(df)
+        with METRICS.stage("validation"):
+            X = validate_frame(df)
+        probs, cached = self._predict_frame(model, X)
+        decisions = (probs >= model.threshold).astype(int).tolist()
+        if METRICS.enabled:
+            flagged = sum(decisions)
+            METRICS.count("decisions", ("fraud",), flagged)
+            METRICS.count("decisions", ("safe",), len(decisions) - flagged)
+        with METRICS.stage("reason"):
+            codes = reason_codes(X).tolist()
+        records = X.to_dict("records") if self.logger is not None or self.registry.shadow is not None else None
+        if self.logger is not None:
+            with METRICS.stage("log"):
+                for record, prob, decision, code in zip(records, probs.tolist(), decisions, codes):
+                    self._log(record, prob, decision, code)
+        if self.rollups is not None:
+            with METRICS.stage("log"):
+                self.rollups.add_predictions(X, probs, decisions)
+        if self.drift is not None:
+            self.drift.observe_frame(X, probs, decisions)
+        ids = None
+        if "transaction_id" in df.columns and (self.alerts is not None or self.feature_store is not None):
+            ids = [None if pd.isna(t) else t for t in df["transaction_id"].tolist()]
+        if self.alerts is not None:
+            flagged = [i for i, decision in enumerate(decisions) if decision]
+            if flagged:
+                with METRICS.stage("log"):
+                    self._alert([None if ids is None else ids[i] for i in flagged],
+                                probs[flagged].tolist(), [codes[i] for i in flagged])
+        with METRICS.stage("reason"):
+            results = [
+                self._result(prob, decision, code, with_text)
+                for prob, decision, code in zip(probs.tolist(), decisions, codes)
+            ]
+        if self.velocity is not None and "account_id" in df.columns:
+            with METRICS.stage("velocity"):
+                self._add_velocity(results, df["account_id"], X["amount"])
+        if self.feature_store is not None and "account_id" in df.columns:
+            # rows answered by the cache were counted when they were first scored
+            known = (df["account_id"].notna().to_numpy() & ~cached).nonzero()[0]
+            self.feature_store.record_transactions(
+                df["account_id"].to_numpy()[known].tolist(), X["amount"].to_numpy()[known],
+                None if ids is None else [ids[i] for i in known]
+            )
+        if records is not None:
+            self.registry.offer_shadow(records, probs, model.threshold)
+        if explain:
+            contributions = model.explainer.as_dicts(model.explainer.explain_frame(X))
+            for result, row in zip(results, contributions):
+                result["base_value"] = model.explainer.base_value
+                result["contributions"] = row
+        return {
+            "count": len(results),
+            "threshold": model.threshold,
+            "model_version": model.version,
+            "results": results,
+        }
+
+    def _add_velocity(self, results, account_ids, amounts):
+        known = account_ids.notna().to_numpy().nonzero()[0]
+        if not len(known):
+            return
+        values = self.velocity.observe_many(account_ids.to_numpy()[known].tolist(), amounts.to_numpy()[known])
+        names = self.velocity.names
+        integer = [not name.startswith("amount_sum") for name in names]
+        for i, row in zip(known.tolist(), values.tolist()):
+            # same types as VelocityEngine.observe: int counts/seconds, None for a first transaction
+            results[i]["velocity"] = {
+                name: None if value != value else int(value) if whole else value
+                for name, value, whole in zip(names, row, integer)
+            }
+
+    def _predict_frame(self, model, X):
+        """Model probabilities for X, scoring only the rows the cache cannot answer.
+
+        Returns (probabilities, boolean mask of the rows answered by the cache).
+        """
+        if self.cache is None:
+            return model.predict_frame(X), np.zeros(len(X), dtype=bool)
+        keys, cached = self.cache.lookup_frame(X, model)
+        misses = [i for i, value in enumerate(cached) if value is None]
+        probs = np.array([np.nan if value is None else value for value in cached])
+        if misses:
+            scored = model.predict_frame(X.iloc[misses] if len(misses) < len(X) else X)
+            probs[misses] = scored
+            self.cache.set_many(zip([keys[i] for i in misses], scored.tolist()))
+        hits = np.ones(len(X), dtype=bool)
+        hits[misses] = False
+        return probs, hits
+
+    # ---------- logging ----------
+
+    def _alert(self, transaction_ids, probs, codes):
+        try:
+            self.alerts.add_many(transaction_ids, probs, [render_reason(code, True) for code in codes])
+        except Exception as e:
+            # like logging, alerting must never fail a prediction
+            print("Error queueing fraud alert:", e)
+
+    def _log(self, record, prob, decision, code):
+        if self.logger is None:
+            return
+        try:
+            reason = render_reason(code, decision == 1)
+            self.logger.log(prediction_row(record, prob, decision, reason))
+        except Exception as e:
+            # logging must never fail a prediction
+            print("Error logging prediction:", e)
+            METRICS.count("log_errors")
@@ -0,0 +1,55 @@
+"""Read table rows straight out of a MySQL dump such as `Banking _Fraud Detection.sql`.
+
+Lets the feature store, training and benchmarks run against the bundled
+sample data without a MySQL server.  Only the `INSERT INTO t (cols) VALUES
+(...), (...);` form used by the dump is understood.
+"""
+import re
+
+import pandas as pd
+
+
+_INSERT = re.compile(r"INSERT\s+INTO\s+`?(\w+)`?\s*\(([^)]*)\)\s*VALUES\s*", re.IGNORECASE)
+_TUPLE = re.compile(r"\(((?:'(?:[^'\\]|\\.|'')*'|[^'()])*)\)")
+_FIELD = re.compile(r"\s*('(?:[^'\\]|\\.|'')*'|[^,]+?)\s*(?:,|$)")
+_SKIP = re.compile(r"(?:\s+|,|--[^\n]*\n?)*")
+
+
+def _value(token):
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'").replace("\\'", "'")
+    if token.upper() == "NULL":
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def iter_rows(path, table):
+    """Yield one dict per row inserted into `table`, in file order."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    for insert in _INSERT.finditer(text):
+        if insert.group(1).lower() != table.lower():
+            continue
+        columns = [c.strip(" `\n\t") for c in insert.group(2).split(",")]
+        pos = insert.end()
+        while True:
+            pos = _SKIP.match(text, pos).end()
+            match = _TUPLE.match(text, pos)
+            if match is None:
+                break       # ';' or the next statement
+            values = [_value(v) for v in _FIELD.findall(match.group(1))]
+            yield dict(zip(columns, values))
+            pos = match.end()
+
+
+def joined_transactions(path):
+    """The notebook's transactions / accounts / customers JOIN over a dump, by transaction_id."""
+    txns = pd.DataFrame(list(iter_rows(path, "transactions")))
+    accounts = pd.DataFrame(list(iter_rows(path, "accounts")))
+    customers = pd.DataFrame(list(iter_rows(path, "customers")))
+    df = (txns.merge(accounts[["account_id", "customer_id", "account_type", "balance"]], on="account_id")
+              .merge(customers[["customer_id", "gender", "city", "state", "dob"]], on="customer_id"))
+    return df.sort_values("transaction_id", ignore_index=True)
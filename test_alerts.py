@@ -0,0 +1,92 @@
+"""Triage queue claims against a SQLite fraud_alerts table: every alert goes to exactly one caller.
+
+Run with `python -m pytest -q`.
+"""
+import threading
+
+import pytest
+
+from alerts import AlertQueue, sqlite_table
+
+N_ALERTS = 300
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    writer = AlertQueue(sqlite_table(path), flush_interval=3600, resync_interval=3600)
+    writer.add_many(list(range(1, N_ALERTS + 1)), [0.4 + (i % 60) / 100 for i in range(N_ALERTS)],
+                    ["High amount at late hour"] * N_ALERTS)
+    assert writer.flush() == N_ALERTS
+    writer.close()
+    return path
+
+
+def open_queue(path):
+    queue = AlertQueue(sqlite_table(path), flush_interval=3600, resync_interval=3600)
+    queue.sync(full=True)
+    return queue
+
+
+def claim_all(queues, n_threads=2, limit=7):
+    """Threads claiming from their queue until it is empty; returns each thread's alert ids."""
+    barrier = threading.Barrier(n_threads)
+    claimed = [[] for _ in range(n_threads)]
+    errors = []
+
+    def worker(i):
+        try:
+            barrier.wait()
+            while True:
+                batch = queues[i % len(queues)].claim(limit)
+                if not batch:
+                    return
+                claimed[i].extend(alert["alert_id"] for alert in batch)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    return claimed
+
+
+def assert_claimed_once(claimed):
+    everything = [alert_id for ids in claimed for alert_id in ids]
+    assert len(everything) == len(set(everything)) == N_ALERTS
+
+
+def test_two_workers_never_claim_the_same_alert(path):
+    # two queues over one table, like two API workers: both heaps hold every alert in the
+    # same order, so the two threads go after the same ids at the same time
+    queues = [open_queue(path), open_queue(path)]
+    claimed = claim_all(queues)
+    assert_claimed_once(claimed)
+    stats = [queue.stats() for queue in queues]
+    assert sum(s["claimed"] for s in stats) == N_ALERTS
+    # each alert one worker lost to the other was counted and dropped, not handed out
+    assert sum(s["lost_claims"] for s in stats) == N_ALERTS
+    for queue in queues:
+        queue.close()
+
+
+def test_threads_sharing_one_queue(path):
+    queue = open_queue(path)
+    claimed = claim_all([queue])
+    assert_claimed_once(claimed)
+    assert queue.stats()["lost_claims"] == 0
+    queue.close()
+
+
+def test_claims_are_highest_score_first_and_leave_nothing_open(path):
+    queue = open_queue(path)
+    first = queue.claim(10)
+    assert [a["model_score"] for a in first] == sorted((a["model_score"] for a in first), reverse=True)
+    assert first[0]["model_score"] == 0.99
+    claim_all([queue])
+    queue.sync(full=True)
+    assert queue.peek(5) == []
+    queue.close()
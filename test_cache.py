@@ -0,0 +1,129 @@
+"""Prediction cache: LRU/TTL bounds, invalidation on model swaps, counters, one model call per repeat.
+
+Run with `python -m pytest -q`.
+"""
+import pandas as pd
+import pytest
+
+import cache
+from cache import LocalBackend, PredictionCache
+from registry import ModelRegistry, ModelVersion, load_version
+from scoring import ScoringService
+
+RECORD = {
+    "amount": 95000.0, "balance": 12000.0, "hour": 2, "day_of_week": 6,
+    "is_weekend": 1, "is_international_flag": 1, "age": 22,
+    "txns_per_account": 8, "avg_amount_account": 1500.0,
+    "txn_type": "ONLINE", "channel": "mobile", "account_type": "savings",
+    "gender": "M", "city": "Mumbai", "state": "Maharashtra",
+}
+
+
+class Clock:
+    """Stand-in for the time module with a hand-moved monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def bundle_version():
+    return load_version("fraud_rf_pipeline.joblib")
+
+
+@pytest.fixture
+def calls(bundle_version, monkeypatch):
+    """Rows the forest is asked to score, per call (every version shares the compiled engine)."""
+    seen = []
+    engine = bundle_version.engine
+    predict_encoded = engine.predict_encoded
+
+    def count(X):
+        seen.append(len(X))
+        return predict_encoded(X)
+
+    monkeypatch.setattr(engine, "predict_encoded", count)
+    return seen
+
+
+@pytest.fixture
+def service(bundle_version):
+    # the loader hands back the same pipeline as a new version, so a reload is instant
+    registry = ModelRegistry(bundle_version, loader=lambda path, threshold: ModelVersion(
+        bundle_version.model, threshold or bundle_version.threshold, path, "reloaded", bundle_version.engine))
+    return ScoringService(registry, cache=PredictionCache(LocalBackend()))
+
+
+def test_lru_evicts_least_recently_used():
+    backend = LocalBackend(max_entries=3)
+    backend.set_many([(b"a", 0.1), (b"b", 0.2), (b"c", 0.3)])
+    assert backend.get_many([b"a"]) == [0.1]        # a is now the most recent
+    backend.set_many([(b"d", 0.4)])
+    assert backend.get_many([b"a", b"b", b"c", b"d"]) == [0.1, None, 0.3, 0.4]
+    assert backend.stats()["evictions"] == 1 and backend.stats()["size"] == 3
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    backend = LocalBackend(ttl_seconds=60)
+    backend.set_many([(b"a", 0.1)])
+    clock.now += 59
+    assert backend.get_many([b"a"]) == [0.1]
+    clock.now += 2
+    assert backend.get_many([b"a"]) == [None]
+    assert backend.stats()["expirations"] == 1 and backend.stats()["size"] == 0
+
+
+def test_repeat_is_answered_without_a_model_call(service, calls):
+    first = service.score(dict(RECORD))
+    second = service.score(dict(RECORD))
+    assert calls == [1]
+    assert second == first
+    stats = service.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_batch_scores_only_rows_the_cache_misses(service, calls):
+    df = pd.DataFrame([RECORD, dict(RECORD, amount=120.0)])
+    first = service.score_batch(df)
+    again = service.score_batch(pd.concat([df, pd.DataFrame([dict(RECORD, amount=7.5)])], ignore_index=True))
+    assert calls == [2, 1]
+    assert again["results"][:2] == first["results"]
+    assert (service.cache.stats()["hits"], service.cache.stats()["misses"]) == (2, 3)
+
+
+def test_set_threshold_invalidates(service, calls):
+    service.score(dict(RECORD))
+    service.registry.set_threshold(0.3)
+    stats = service.cache.stats()
+    assert stats["invalidations"] == 1 and stats["size"] == 0
+    service.score(dict(RECORD))
+    assert calls == [1, 1]
+
+
+def test_reload_invalidates(service, calls):
+    service.score(dict(RECORD))
+    service.registry.reload(wait=True)
+    assert service.registry.active.version == "reloaded"
+    stats = service.cache.stats()
+    assert stats["invalidations"] == 1 and stats["size"] == 0
+    del calls[1:]       # the new version's warm-up
+    service.score(dict(RECORD))
+    assert calls == [1, 1]
+
+
+def test_backend_errors_count_as_misses(service, calls, monkeypatch):
+    def down(*args):
+        raise ConnectionError("cache is down")
+
+    monkeypatch.setattr(service.cache.backend, "get_many", down)
+    monkeypatch.setattr(service.cache.backend, "set_many", down)
+    service.score(dict(RECORD))
+    service.score(dict(RECORD))
+    stats = service.cache.stats()
+    assert calls == [1, 1]
+    assert (stats["errors"], stats["misses"], stats["hits"]) == (4, 2, 0)
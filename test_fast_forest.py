@@ -0,0 +1,142 @@
+"""Parity of the compiled fast path with sklearn's predict_proba, bit for bit.
+
+Run with `python -m pytest -q`.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import load
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+import fast_forest
+from compress import compress_pipeline
+from fast_forest import FOREST_CROSSOVER_ROWS, CompiledPipeline, floor_float32, load_fast_path, parity_sample
+from registry import load_version
+from scoring import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+BUNDLE = "fraud_rf_pipeline.joblib"
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    model = load(BUNDLE)["model"]
+    # one thread keeps sklearn's tree accumulation order, and so its last bits, fixed
+    model.steps[-1][1].n_jobs = 1
+    return model
+
+
+@pytest.fixture(scope="module")
+def compiled(pipeline):
+    return CompiledPipeline(pipeline)
+
+
+@pytest.fixture(scope="module")
+def sample(compiled):
+    return parity_sample(compiled, n_rows=600, seed=1)
+
+
+def expected(pipeline, X):
+    return pipeline.predict_proba(X)[:, 1]
+
+
+def assert_parity(pipeline, compiled, X):
+    want = expected(pipeline, X)
+    assert np.array_equal(compiled.predict_frame(X), want)
+    assert np.array_equal(compiled.predict_records(X.to_dict("records")), want)
+
+
+def test_single_rows(pipeline, compiled, sample):
+    for i in range(50):
+        assert_parity(pipeline, compiled, sample.iloc[[i]])
+
+
+@pytest.mark.parametrize("n_rows", [2, 64, FOREST_CROSSOVER_ROWS, FOREST_CROSSOVER_ROWS + 1, 300, 600])
+def test_batches_around_sklearn_handoff(pipeline, compiled, sample, n_rows):
+    assert_parity(pipeline, compiled, sample.head(n_rows))
+
+
+def test_numpy_traversal_matches_forest_on_large_batch(pipeline, compiled, sample):
+    # the NumPy walk itself, not just the handoff, on more rows than the crossover
+    X = compiled.encode_frame(sample)
+    assert np.array_equal(compiled.traverse(X), expected(pipeline, sample))
+
+
+@pytest.mark.parametrize("n_rows", [1, 20, FOREST_CROSSOVER_ROWS + 50])
+def test_nan_inputs(pipeline, compiled, sample, n_rows):
+    X = sample.head(n_rows).copy()
+    X.loc[X.index[::2], "amount"] = np.nan
+    X.loc[X.index[::3], "avg_amount_account"] = np.nan
+    assert_parity(pipeline, compiled, X)
+
+
+def test_unknown_categories(pipeline, compiled, sample):
+    X = sample.head(40).copy()
+    for col in CATEGORICAL_FEATURES:
+        X[col] = "__never_seen__"
+    encoded = compiled.encode_frame(X)
+    # handle_unknown="ignore": every one-hot column is zero
+    assert not encoded[:, [i for _, _, _, outputs in compiled.categorical for i in outputs]].any()
+    assert_parity(pipeline, compiled, X)
+
+
+def test_floor_float32():
+    values = np.array([0.1, 1.0, -0.3, 1e-30, 123456.789, np.float32(2.5)], dtype=np.float64)
+    floored = floor_float32(values)
+    assert floored.dtype == np.float32
+    assert np.all(floored.astype(np.float64) <= values)
+    # the next float32 up is above the value, so nothing tighter exists
+    assert np.all(np.nextafter(floored, np.float32(np.inf)).astype(np.float64) > values)
+    # every float32 input takes the same side of the float32 and the float64 threshold
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=10000).astype(np.float32)
+    t = rng.normal(size=10000)
+    assert np.array_equal(x <= t, x <= floor_float32(t))
+
+
+@pytest.mark.parametrize("n_trees,max_depth,leaf_bits", [(50, 8, 8), (25, None, 4), (300, 12, 0)])
+def test_compressed_forest(pipeline, sample, n_trees, max_depth, leaf_bits):
+    small = compress_pipeline(pipeline, n_trees=n_trees, max_depth=max_depth, leaf_bits=leaf_bits)
+    compiled = CompiledPipeline(small)
+    for n_rows in (1, 30, FOREST_CROSSOVER_ROWS + 1):
+        assert_parity(small, compiled, sample.head(n_rows))
+    X = sample.head(100).copy()
+    X.loc[X.index[::4], "amount"] = np.nan
+    assert_parity(small, compiled, X)
+
+
+def test_sklearn_fallback_switch(pipeline, sample):
+    fast = load_version(BUNDLE, fast_path=True)
+    plain = load_version(BUNDLE, fast_path=False)
+    assert fast.engine is not None and plain.engine is None
+    assert plain.info()["fast_path"] is False
+    plain.model.steps[-1][1].n_jobs = 1
+    records = sample.head(10).to_dict("records")
+    assert np.array_equal(plain.predict_records(records), fast.predict_records(records))
+    assert np.array_equal(plain.predict_frame(sample), expected(pipeline, sample))
+
+
+def test_falls_back_when_parity_fails(pipeline, monkeypatch):
+    monkeypatch.setattr(fast_forest, "check_parity", lambda *args: False)
+    assert load_fast_path(pipeline) is None
+
+
+def test_falls_back_on_unsupported_pipeline():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"amount": rng.normal(size=200), "channel": rng.choice(["web", "mobile"], 200)})
+    y = (X["amount"] > 0).astype(int)
+    model = Pipeline([
+        ("preprocess", ColumnTransformer([
+            ("cat", OneHotEncoder(drop="first"), ["channel"]), ("num", "passthrough", ["amount"]),
+        ])),
+        ("model", RandomForestClassifier(n_estimators=5, random_state=0)),
+    ]).fit(X, y)
+    with pytest.raises(ValueError):
+        CompiledPipeline(model)
+    assert load_fast_path(model) is None
+
+
+def test_sample_covers_model_inputs(compiled):
+    assert set(compiled.input_columns) == set(NUMERIC_FEATURES) | set(CATEGORICAL_FEATURES)
@@ -0,0 +1,141 @@
+"""Background prediction writer against SQLite and a failing stand-in sink.
+
+Run with `python -m pytest -q`.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from prediction_log import PredictionLogWriter, SQLiteSink, prediction_row
+
+RECORD = {
+    "amount": 95000.0, "balance": 12000.0, "hour": 2, "day_of_week": 6,
+    "is_weekend": 1, "is_international_flag": 1, "age": 22,
+    "txns_per_account": 8, "avg_amount_account": 1500.0,
+    "txn_type": "ONLINE", "channel": "mobile", "account_type": "savings",
+    "gender": "M", "city": "Mumbai", "state": "Maharashtra",
+}
+CREATED_AT = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class FakeSink:
+    """Records written rows; fails while `down` is set and waits while `gate` is clear."""
+
+    def __init__(self):
+        self.rows = []
+        self.down = False
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def write(self, rows):
+        self.gate.wait()
+        if self.down:
+            raise ConnectionError("database is down")
+        self.rows.extend(rows)
+
+
+def rows(n):
+    # the amount tells the rows apart; every row is the same size on disk
+    return [prediction_row(dict(RECORD, amount=1000.0 + i), 0.5, 0, "test", CREATED_AT) for i in range(n)]
+
+
+def numbers(written):
+    return sorted(int(row[1]) - 1000 for row in written)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "spill.ndjson")
+
+
+def test_close_drains_queue_into_sqlite(tmp_path, spill_path):
+    sink = SQLiteSink(str(tmp_path / "log.db"))
+    writer = PredictionLogWriter(sink, batch_size=50, flush_interval=10.0, spill_path=spill_path)
+    for row in rows(1234):
+        writer.log(row)
+    writer.close()
+    conn = sqlite3.connect(sink.path)
+    assert conn.execute("SELECT COUNT(*) FROM fraud_predictions").fetchone()[0] == 1234
+    conn.close()
+    stats = writer.stats()
+    assert stats["written"] == 1234 and stats["spilled"] == 0 and not stats["spill_pending"]
+
+
+def test_full_queue_spills_instead_of_blocking(spill_path):
+    sink = FakeSink()
+    sink.gate.clear()
+    writer = PredictionLogWriter(sink, max_queue_size=2, batch_size=1, flush_interval=0.01,
+                                 spill_path=spill_path)
+    start = time.monotonic()
+    for row in rows(20):
+        writer.log(row)
+    assert time.monotonic() - start < 1.0
+    stats = writer.stats()
+    # at most one row in the stuck write and two in the queue
+    assert stats["spilled"] >= 17
+    assert stats["queued"] + stats["spilled"] == 20
+    with open(spill_path) as f:
+        assert len(f.readlines()) == stats["spilled"]
+    sink.gate.set()
+    # once the sink is free the spilled rows are replayed behind the queued ones
+    wait_for(lambda: len(sink.rows) == 20)
+    writer.close()
+    assert numbers(sink.rows) == list(range(20))
+    assert writer.stats()["replayed"] == stats["spilled"]
+
+
+def test_spilled_rows_are_replayed_once_when_sink_recovers(spill_path):
+    sink = FakeSink()
+    sink.down = True
+    writer = PredictionLogWriter(sink, batch_size=7, flush_interval=0.01, spill_path=spill_path,
+                                 retry_interval=0.05)
+    for row in rows(100):
+        writer.log(row)
+    wait_for(lambda: writer.stats()["spilled"] >= 100)
+    sink.down = False
+    wait_for(lambda: not writer.stats()["spill_pending"] and writer.stats()["replayed"] >= 100)
+    writer.close()
+    # failed replays go back to the spill file, so every row lands exactly once
+    assert numbers(sink.rows) == list(range(100))
+    assert writer.stats()["spill_bytes"] == 0
+
+
+def test_corrupt_spill_lines_are_skipped(spill_path):
+    good = rows(5)
+    with open(spill_path, "w") as f:
+        for row in good[:3]:
+            f.write(json.dumps(row) + "\n")
+        f.write(json.dumps(good[3])[:20] + "\n")     # torn by a crash mid-append
+        f.write(json.dumps(good[4]) + "\n")
+    sink = FakeSink()
+    writer = PredictionLogWriter(sink, flush_interval=0.01, spill_path=spill_path, retry_interval=0.0)
+    wait_for(lambda: not os.path.exists(spill_path) and writer.stats()["replayed"] == 4)
+    writer.close()
+    assert numbers(sink.rows) == [0, 1, 2, 4]
+    assert writer.stats()["spill_corrupt"] == 1
+
+
+def test_spill_file_stops_at_max_size(spill_path):
+    sink = FakeSink()
+    sink.down = True
+    line_size = len(json.dumps(rows(1)[0]) + "\n")
+    writer = PredictionLogWriter(sink, flush_interval=0.01, spill_path=spill_path, retry_interval=3600,
+                                 max_spill_bytes=10 * line_size)
+    for row in rows(25):
+        writer.log(row)
+    writer.close()
+    stats = writer.stats()
+    assert stats["spilled"] == 10 and stats["spill_dropped"] == 15
+    assert stats["spill_bytes"] == os.path.getsize(spill_path) == 10 * line_size
@@ -0,0 +1,369 @@
+"""Train the fraud model from chunked data instead of one pd.read_sql.
+
+    python train.py                                          # bundled SQL dump, new timestamped bundle
+    python train.py --source mysql --chunk-size 100000       # live database
+    python train.py --source transactions.parquet --output fraud_rf_new.joblib
+    python train.py --source transactions.csv.gz --report train.json
+
+Same model as fraud_detection.ipynb: the notebook's JOIN and feature
+engineering (features.py), a one-hot ColumnTransformer, SMOTE and a 300-tree
+balanced random forest, fitted on a stratified 70% split and checked on the
+other 30%.  The result is written as the usual {"model", "threshold"} bundle
+(plus a "training" summary), so api.py, score_file.py and compress.py load
+it as is.  The drift baseline (drift.py) of the test split is written next
+to it as `<output>.baseline.json`.  Without --output the bundle gets a new
+timestamped name (fraud_rf_pipeline.<YYYYmmdd-HHMMSS>.joblib), never the
+serving bundle: overwriting that in place would be hot-loaded by every API
+worker that watches it.  Promote a new bundle with POST /models/reload, or a
+shadow run first.
+
+Sources are read one chunk at a time:
+
+* mysql           keyset pagination on transaction_id (no OFFSET scans),
+* .parquet        row batches via pyarrow (optional dependency),
+* .sql            the bundled dump (sql_snapshot.py),
+* .csv / .ndjson  pandas chunked readers (score_file.read_chunks).
+
+Each chunk gets its row features and is cut down to the model columns with
+compact dtypes (float32 numerics, categoricals, int8 labels) before the next
+one is read; per-account counts and sums accumulate in AccountTotals and are
+joined once all chunks are in.  Wall time, RSS and peak RSS are reported for
+every stage.
+"""
+import argparse
+import json
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+from pandas.api.types import union_categoricals
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
+
+from compress import evaluate
+from drift import build_baseline, save_baseline
+from features import AccountTotals, add_row_features
+from score_file import read_chunks
+from scoring import CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES
+from sql_snapshot import joined_transactions
+
+
+# the notebook's JOIN, one keyset page at a time
+CHUNK_QUERY = """
+    SELECT
+        t.transaction_id,
+        t.account_id,
+        t.txn_timestamp,
+        t.amount,
+        t.txn_type,
+        t.channel,
+        t.is_international,
+        t.label_fraud,
+        a.account_type,
+        a.balance,
+        c.gender,
+        c.city,
+        c.state,
+        c.dob
+    FROM transactions t
+    JOIN accounts a   ON t.account_id = a.account_id
+    JOIN customers c  ON a.customer_id = c.customer_id
+    WHERE t.transaction_id > %s
+    ORDER BY t.transaction_id
+    LIMIT %s
+"""
+
+RAW_COLUMNS = ["transaction_id", "account_id", "txn_timestamp", "amount", "txn_type", "channel",
+               "is_international", "label_fraud", "account_type", "balance", "gender", "city",
+               "state", "dob"]
+
+# filled in from AccountTotals once every chunk has been seen
+ACCOUNT_FEATURES = ["txns_per_account", "avg_amount_account"]
+
+THRESHOLDS = [0.50, 0.40, 0.30, 0.25, 0.20]
+
+
+# ---------- Sources ----------
+
+def mysql_chunks(conn, chunk_size, after_id=-1):
+    """Raw joined rows with transaction_id > after_id in id order, chunk_size per round trip."""
+    cur = conn.cursor()
+    last_id = after_id
+    try:
+        while True:
+            cur.execute(CHUNK_QUERY, (last_id, chunk_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            chunk = pd.DataFrame(rows, columns=list(cur.column_names))
+            last_id = int(chunk["transaction_id"].iloc[-1])
+            yield chunk
+            if len(rows) < chunk_size:
+                break
+    finally:
+        cur.close()
+
+
+def parquet_chunks(path, chunk_size):
+    import pyarrow.parquet as pq      # optional dependency, only needed for Parquet snapshots
+    parquet = pq.ParquetFile(path)
+    columns = [c for c in RAW_COLUMNS + FEATURE_COLUMNS if c in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(dict.fromkeys(columns))):
+        yield batch.to_pandas()
+
+
+def dump_chunks(path, chunk_size):
+    # the dump is parsed whole; chunking still bounds the per-chunk feature work
+    df = joined_transactions(path)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size].copy()
+
+
+def source_chunks(source, chunk_size, db_config=None):
+    if source == "mysql":
+        import mysql.connector
+        conn = mysql.connector.connect(**db_config)
+        try:
+            yield from mysql_chunks(conn, chunk_size)
+        finally:
+            conn.close()
+    elif source.endswith(".parquet"):
+        yield from parquet_chunks(source, chunk_size)
+    elif source.endswith(".sql"):
+        yield from dump_chunks(source, chunk_size)
+    else:
+        yield from read_chunks(source, chunk_size)
+
+
+# ---------- Compact training frame ----------
+
+def compact_chunk(chunk):
+    """Row features of one raw chunk, reduced to the training columns in compact dtypes."""
+    df = add_row_features(chunk)
+    out = pd.DataFrame(index=df.index)
+    out["account_id"] = df["account_id"]
+    out["label_fraud"] = df["label_fraud"].astype(np.int8)
+    for column in NUMERIC_FEATURES:
+        if column in df.columns:
+            out[column] = pd.to_numeric(df[column]).astype(np.float32)
+    for column in CATEGORICAL_FEATURES:
+        out[column] = df[column].astype("category")
+    return out.reset_index(drop=True)
+
+
+def concat_compact(chunks):
+    """pd.concat that keeps categoricals categorical (plain concat falls back to object)."""
+    categorical = {c: union_categoricals([chunk[c] for chunk in chunks]) for c in CATEGORICAL_FEATURES}
+    df = pd.concat([chunk.drop(columns=CATEGORICAL_FEATURES) for chunk in chunks], ignore_index=True)
+    for column, values in categorical.items():
+        df[column] = values
+    return df
+
+
+def load_training_frame(chunks, report):
+    """(compact frame with every model feature, AccountTotals) from an iterable of raw chunks."""
+    totals = AccountTotals()
+    parts = []
+    with report.stage("load"):
+        for chunk in chunks:
+            totals.update(chunk[["account_id", "amount", "balance"]])
+            parts.append(compact_chunk(chunk))
+            del chunk
+            print(f"  {sum(len(p) for p in parts):>12,} rows  RSS {_rss_mb():.0f} MB")
+        if not parts:
+            raise ValueError("the source returned no rows")
+    with report.stage("account_features"):
+        df = concat_compact(parts)
+        del parts
+        totals.finish().add_account_features(df)
+        for column in ACCOUNT_FEATURES + ["balance"]:
+            df[column] = df[column].astype(np.float32)
+    return df, totals
+
+
+# ---------- Model ----------
+
+def build_pipeline(n_estimators=300, n_jobs=-1, seed=42):
+    """The notebook's preprocess -> SMOTE -> random forest pipeline."""
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline as ImbPipeline
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+            ("num", "passthrough", NUMERIC_FEATURES),
+        ]
+    )
+    rf_model = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=None,
+        min_samples_split=4,
+        min_samples_leaf=2,
+        random_state=seed,
+        n_jobs=n_jobs,
+        class_weight="balanced"
+    )
+    return ImbPipeline(steps=[
+        ("preprocess", preprocessor),
+        ("smote", SMOTE(random_state=seed)),
+        ("model", rf_model)
+    ])
+
+
+def versioned_output(prefix="fraud_rf_pipeline"):
+    """A new bundle path named after the current time."""
+    return f"{prefix}.{time.strftime('%Y%m%d-%H%M%S')}.joblib"
+
+
+def train(chunks, output=None, threshold=0.40, test_size=0.3,
+          n_estimators=300, n_jobs=-1, seed=42, source=None):
+    """Load, split, fit, evaluate and write the bundle; returns the training summary."""
+    output = output or versioned_output()
+    report = StageReport()
+    with report:
+        df, totals = load_training_frame(chunks, report)
+        print(f"training frame: {len(df):,} rows, {int(df['label_fraud'].sum()):,} fraud, "
+              f"{len(totals.count):,} accounts, {df.memory_usage(deep=True).sum() / 2**20:.1f} MB")
+
+        with report.stage("split"):
+            y = df.pop("label_fraud")
+            X_train, X_test, y_train, y_test = train_test_split(
+                df[FEATURE_COLUMNS], y, test_size=test_size, random_state=seed, stratify=y
+            )
+            del df
+
+        with report.stage("fit"):
+            model = build_pipeline(n_estimators, n_jobs, seed)
+            model.fit(X_train, y_train)
+
+        with report.stage("evaluate"):
+            probs = model.predict_proba(X_test)[:, 1]
+            metrics = {str(t): evaluate(probs, y_test.to_numpy(), t) for t in THRESHOLDS + [threshold]}
+
+        summary = {
+            "source": source,
+            "rows": len(X_train) + len(X_test),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test),
+            "fraud_rows": int(y_train.sum() + y_test.sum()),
+            "accounts": len(totals.count),
+            "n_estimators": n_estimators,
+            "seed": seed,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "test_metrics": metrics,
+        }
+        with report.stage("save"):
+            dump({"model": model, "threshold": threshold, "training": summary}, output)
+            # score / feature histograms of the test split for drift monitoring
+            from registry import bundle_version
+            save_baseline(build_baseline(X_test, probs, threshold, bundle_version(output)), output)
+    summary["stages"] = report.stages
+    summary["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return summary
+
+
+# ---------- Stage timing and memory ----------
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageReport:
+    """Wall time, end RSS and sampled peak RSS per named stage."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stages = []
+        self._peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, name="train-rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, _rss_mb())
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+
+class _Stage:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.report._peak = _rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        rss = _rss_mb()
+        entry = {"stage": self.name, "seconds": round(seconds, 3), "rss_mb": round(rss, 1),
+                 "peak_rss_mb": round(max(self.report._peak, rss), 1)}
+        self.report.stages.append(entry)
+        print(f"[{self.name}] {seconds:.2f}s  RSS {rss:.0f} MB  peak {entry['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fraud model bundle from chunked data.")
+    parser.add_argument("--source", default="Banking _Fraud Detection.sql",
+                        help="'mysql', a .parquet snapshot, a .sql dump or a CSV/NDJSON file")
+    parser.add_argument("--output", help="bundle path (default: a new fraud_rf_pipeline.<timestamp>.joblib)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--threshold", type=float, default=0.40, help="decision threshold stored in the bundle")
+    parser.add_argument("--trees", type=int, default=300, help="n_estimators of the forest")
+    parser.add_argument("--jobs", type=int, default=-1, help="n_jobs of the forest")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", help="write the training summary as JSON")
+    # MySQL connection (--source mysql); the password comes from FRAUD_DB_PASSWORD
+    parser.add_argument("--db-host", default=os.getenv("FRAUD_DB_HOST", "localhost"))
+    parser.add_argument("--db-port", type=int, default=int(os.getenv("FRAUD_DB_PORT", "3306")))
+    parser.add_argument("--db-user", default=os.getenv("FRAUD_DB_USER", "root"))
+    parser.add_argument("--db-name", default=os.getenv("FRAUD_DB_NAME", "banking_fraud_detection"))
+    args = parser.parse_args()
+
+    db_config = dict(host=args.db_host, port=args.db_port, user=args.db_user,
+                     password=os.getenv("FRAUD_DB_PASSWORD", ""), database=args.db_name)
+    start = time.perf_counter()
+    output = args.output or versioned_output()
+    summary = train(source_chunks(args.source, args.chunk_size, db_config), output, args.threshold,
+                    n_estimators=args.trees, n_jobs=args.jobs, seed=args.seed, source=args.source)
+
+    print(f"\n{'threshold':>10}{'recall':>10}{'precision':>11}{'flagged':>9}")
+    for t, m in summary["test_metrics"].items():
+        print(f"{t:>10}{m['recall']:>10.4f}{m['precision']:>11.4f}{m['flagged']:>9}")
+    print(f"\nbundle written to {output} in {time.perf_counter() - start:.1f}s, "
+          f"peak RSS {summary['peak_rss_mb']:.0f} MB")
+    print(f'activate it with POST /models/reload {{"path": "{output}"}}')
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+        print("report written to", args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,778 @@
+"""Precompiled pages for the /ui frontend.
+
+Everything static is built once at import: the form page and the result-page
+stylesheet are encoded, compressed (gzip, and brotli when the optional
+`brotli` package is installed) and given a strong ETag, so a request only
+picks the representation the client accepts -- or answers 304 when the
+client already has it.  The stylesheet URL carries its content hash and is
+cached by browsers for a year; the form page is revalidated on each visit.
+
+The result page is split into byte chunks around the two per-request values,
+probability and reason, with one set of chunks per outcome (label, badge and
+colours), so rendering is a join of five byte strings.
+
+Run `python ui.py` for a requests/sec comparison with per-request rendering.
+"""
+import gzip
+import hashlib
+from functools import lru_cache
+from html import escape
+
+from fastapi import Response
+
+try:
+    import brotli       # optional; without it pages are offered as gzip or identity
+except ImportError:
+    brotli = None
+
+
+# ---------- Static assets ----------
+
+def _accepted_codings(header):
+    """Content codings allowed by an Accept-Encoding header (q=0 excluded)."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding):
+    """Best coding we have for an Accept-Encoding header: "br", "gzip" or "identity"."""
+    accepted = _accepted_codings(accept_encoding)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+class StaticPage:
+    """A fixed body served from precomputed identity/gzip/brotli bytes with ETags."""
+
+    def __init__(self, body, media_type, cache_control):
+        raw = body.encode()
+        self.media_type = media_type
+        self.digest = hashlib.sha256(raw).hexdigest()[:16]
+        self.bodies = {"identity": raw, "gzip": gzip.compress(raw, 9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(raw, quality=11)
+        self.headers = {}
+        for coding in self.bodies:
+            # a strong ETag per representation; If-None-Match matches on the shared hash
+            etag = f'"{self.digest}"' if coding == "identity" else f'"{self.digest}-{coding}"'
+            headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+            if coding != "identity":
+                headers["Content-Encoding"] = coding
+            self.headers[coding] = headers
+
+    def sizes(self):
+        return {coding: len(body) for coding, body in self.bodies.items()}
+
+    def not_modified(self, if_none_match):
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag.split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def response(self, request):
+        coding = negotiate(request.headers.get("accept-encoding", ""))
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.not_modified(if_none_match):
+            return Response(status_code=304, headers=self.headers[coding])
+        return Response(self.bodies[coding], media_type=self.media_type, headers=self.headers[coding])
+
+
+# ---------- Form page ----------
+
+FORM_HTML = """
+    <html>
+    <head>
+        <title>SecureTrust Bank – Banking Fraud Detection</title>
+        <style>
+            * { box-sizing: border-box; }
+            body {
+                margin: 0;
+                padding: 0;
+                font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+                background: radial-gradient(circle at top left, #1f2937, #020617);
+                color: #0f172a;
+            }
+            .page {
+                min-height: 100vh;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                padding: 24px;
+            }
+            .card {
+                width: 100%;
+                max-width: 720px;
+                background: #ffffff;
+                border-radius: 16px;
+                box-shadow: 0 20px 40px rgba(15,23,42,0.35);
+                padding: 24px 28px 28px;
+                position: relative;
+                overflow: hidden;
+            }
+            .card::before {
+                content: "";
+                position: absolute;
+                inset: -80px auto auto -80px;
+                width: 180px;
+                height: 180px;
+                background: radial-gradient(circle, #38bdf8, transparent 60%);
+                opacity: 0.3;
+            }
+            .card::after {
+                content: "";
+                position: absolute;
+                inset: auto -60px -60px auto;
+                width: 160px;
+                height: 160px;
+                background: radial-gradient(circle, #22c55e, transparent 60%);
+                opacity: 0.25;
+            }
+            .card-content {
+                position: relative;
+                z-index: 1;
+            }
+            .header {
+                display: flex;
+                align-items: center;
+                justify-content: space-between;
+                margin-bottom: 10px;
+            }
+            .logo-wrap {
+                display: flex;
+                align-items: center;
+                gap: 10px;
+            }
+            .logo-circle {
+                width: 38px;
+                height: 38px;
+                border-radius: 999px;
+                background: linear-gradient(135deg, #0ea5e9, #22c55e);
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                color: white;
+                font-weight: 700;
+                font-size: 18px;
+                box-shadow: 0 6px 16px rgba(34,197,94,0.35);
+            }
+            .title {
+                font-size: 20px;
+                font-weight: 700;
+                color: #0f172a;
+            }
+            .subtitle {
+                font-size: 12px;
+                color: #64748b;
+            }
+            .badge {
+                font-size: 11px;
+                padding: 4px 10px;
+                border-radius: 999px;
+                background: #ecfdf5;
+                color: #16a34a;
+                border: 1px solid #bbf7d0;
+                font-weight: 600;
+            }
+            .demo-buttons {
+                display: flex;
+                gap: 10px;
+                margin-bottom: 10px;
+                flex-wrap: wrap;
+            }
+            .btn {
+                border-radius: 999px;
+                border: none;
+                padding: 8px 14px;
+                font-size: 13px;
+                font-weight: 600;
+                cursor: pointer;
+                display: inline-flex;
+                align-items: center;
+                gap: 6px;
+                box-shadow: 0 4px 10px rgba(15,23,42,0.15);
+            }
+            .btn-safe {
+                background: linear-gradient(135deg, #22c55e, #16a34a);
+                color: white;
+            }
+            .btn-fraud {
+                background: linear-gradient(135deg, #ef4444, #b91c1c);
+                color: white;
+            }
+            .btn span.icon {
+                font-size: 16px;
+            }
+            form {
+                margin-top: 4px;
+            }
+            .grid {
+                display: grid;
+                grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
+                gap: 12px 16px;
+            }
+            label {
+                display: block;
+                font-size: 12px;
+                font-weight: 600;
+                color: #0f172a;
+                margin-bottom: 3px;
+            }
+            input, select {
+                width: 100%;
+                padding: 7px 9px;
+                border-radius: 8px;
+                border: 1px solid #cbd5f5;
+                font-size: 13px;
+                outline: none;
+                transition: border-color 0.15s, box-shadow 0.15s, background 0.15s;
+                background: #f8fafc;
+            }
+            input:focus, select:focus {
+                border-color: #0ea5e9;
+                box-shadow: 0 0 0 1px rgba(14,165,233,0.3);
+                background: #ffffff;
+            }
+            .footer-actions {
+                margin-top: 16px;
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+                gap: 10px;
+                flex-wrap: wrap;
+            }
+            .primary-submit {
+                background: linear-gradient(135deg, #0ea5e9, #2563eb);
+                color: white;
+                border-radius: 999px;
+                border: none;
+                padding: 9px 18px;
+                font-size: 14px;
+                font-weight: 600;
+                cursor: pointer;
+                box-shadow: 0 6px 16px rgba(37,99,235,0.45);
+                display: inline-flex;
+                align-items: center;
+                gap: 6px;
+            }
+            .primary-submit:hover {
+                filter: brightness(1.05);
+            }
+            .hint {
+                font-size: 11px;
+                color: #6b7280;
+            }
+            @media (max-width: 640px) {
+                .card {
+                    padding: 18px 16px 20px;
+                }
+            }
+        </style>
+    </head>
+    <body>
+        <div class="page">
+            <div class="card">
+                <div class="card-content">
+                    <div class="header">
+                        <div class="logo-wrap">
+                            <div class="logo-circle">ST</div>
+                            <div>
+                                <div class="title">SecureTrust Bank</div>
+                                <!-- subtitle removed as requested -->
+                                <div class="subtitle">Banking Fraud Detection</div>
+                            </div>
+                        </div>
+                        <div class="badge">ML Model · v1.0</div>
+                    </div>
+
+                    <!-- Tooltip / helper box -->
+                    <div id="helpBox"
+                        style="
+                            background:#1f2937;
+                            border:1px solid #374151;
+                            padding:8px 14px;
+                            border-radius:8px;
+                            font-size:13px;
+                            color:white;
+                            margin-bottom:12px;
+                            opacity:0;
+                            transition:opacity 0.25s;
+                        ">
+                    </div>
+
+                    <div class="demo-buttons">
+                        <button type="button" class="btn btn-safe" onclick="runSafeDemo()">
+                            <span class="icon">✅</span> Demo Safe Transaction
+                        </button>
+                        <button type="button" class="btn btn-fraud" onclick="runFraudDemo()">
+                            <span class="icon">⚠️</span> Demo Fraud Transaction
+                        </button>
+                    </div>
+
+                    <form id="fraudForm" action="/ui/predict" method="post">
+                        <div class="grid">
+                            <div>
+                                <label>Amount (₹)</label>
+                                <input type="number" step="0.01" name="amount" required
+                                       onfocus="showHelp('amount')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>Balance (₹)</label>
+                                <input type="number" step="0.01" name="balance" required
+                                       onfocus="showHelp('balance')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>Hour (0–23)</label>
+                                <input type="number" name="hour" min="0" max="23" required
+                                       onfocus="showHelp('hour')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>Day of Week</label>
+                                <select name="day_of_week"
+                                        onfocus="showHelp('day_of_week')" onblur="hideHelp()">
+                                    <option value="0">0 – Monday</option>
+                                    <option value="1">1 – Tuesday</option>
+                                    <option value="2">2 – Wednesday</option>
+                                    <option value="3">3 – Thursday</option>
+                                    <option value="4">4 – Friday</option>
+                                    <option value="5">5 – Saturday</option>
+                                    <option value="6">6 – Sunday</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>Is Weekend?</label>
+                                <select name="is_weekend"
+                                        onfocus="showHelp('is_weekend')" onblur="hideHelp()">
+                                    <option value="0">0 – No</option>
+                                    <option value="1">1 – Yes</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>Is International?</label>
+                                <select name="is_international_flag"
+                                        onfocus="showHelp('is_international_flag')" onblur="hideHelp()">
+                                    <option value="0">0 – No</option>
+                                    <option value="1">1 – Yes</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>Transactions per Account</label>
+                                <input type="number" name="txns_per_account" min="0" required
+                                       onfocus="showHelp('txns_per_account')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>Transaction Type</label>
+                                <select name="txn_type"
+                                        onfocus="showHelp('txn_type')" onblur="hideHelp()">
+                                    <option>ATM</option>
+                                    <option>POS</option>
+                                    <option>Online</option>
+                                    <option>Transfer</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>Channel</label>
+                                <select name="channel"
+                                        onfocus="showHelp('channel')" onblur="hideHelp()">
+                                    <option>Branch</option>
+                                    <option>ATM</option>
+                                    <option>Online</option>
+                                    <option>Mobile</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>Account Type</label>
+                                <select name="account_type"
+                                        onfocus="showHelp('account_type')" onblur="hideHelp()">
+                                    <option>savings</option>
+                                    <option>current</option>
+                                    <option>credit_card</option>
+                                </select>
+                            </div>
+
+                            <div>
+                                <label>City</label>
+                                <input type="text" name="city" value="Hyderabad"
+                                       onfocus="showHelp('city')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>State</label>
+                                <input type="text" name="state" value="Telangana"
+                                       onfocus="showHelp('state')" onblur="hideHelp()">
+                            </div>
+
+                            <div>
+                                <label>Country</label>
+                                <input type="text" name="country" value="India"
+                                       onfocus="showHelp('country')" onblur="hideHelp()">
+                            </div>
+                        </div>
+
+                        <!-- hidden defaults for model-only fields: age, avg_amount_account, gender -->
+                        <input type="hidden" name="age" value="35">
+                        <input type="hidden" name="avg_amount_account" value="2000">
+                        <input type="hidden" name="gender" value="M">
+
+                        <div class="footer-actions">
+                            <button type="submit" class="primary-submit">
+                                <span>Predict Fraud</span> <span class="icon">➜</span>
+                            </button>
+                            <div class="hint">
+                                Tip: hover / focus on any field to see what it means.  
+                                Use the demo buttons above for instant examples.
+                            </div>
+                        </div>
+                    </form>
+                </div>
+            </div>
+        </div>
+
+        <script>
+            // Help-text dictionary
+            const helpText = {
+                amount: "Total transaction amount in rupees.",
+                balance: "Customer's account balance before the transaction.",
+                hour: "Time of the transaction (0 = midnight, 23 = 11PM).",
+                day_of_week: "Day of the transaction (0=Mon … 6=Sun).",
+                is_weekend: "Whether the transaction happened on a weekend (Sat/Sun).",
+                is_international_flag: "Indicates if the transaction is international.",
+                txns_per_account: "Total number of previous transactions for this account.",
+                txn_type: "Type of transaction: ATM, POS, Online, Transfer, etc.",
+                channel: "Channel used for the transaction (Branch/ATM/Online/Mobile).",
+                account_type: "Account category: savings, current, or credit card.",
+                city: "City where the customer lives or account is registered.",
+                state: "State where the customer lives or account is registered.",
+                country: "Country of the customer (not used directly by the model, for display only)."
+            };
+
+            function showHelp(name) {
+                const helpBox = document.getElementById("helpBox");
+                helpBox.innerText = helpText[name] || "";
+                helpBox.style.opacity = "1";
+            }
+
+            function hideHelp() {
+                document.getElementById("helpBox").style.opacity = "0";
+            }
+
+            function setValue(name, value) {
+                const el = document.querySelector('[name="' + name + '"]');
+                if (el) el.value = value;
+            }
+
+            function runSafeDemo() {
+                setValue("amount", 1500);
+                setValue("balance", 25000);
+                setValue("hour", 14);
+                setValue("day_of_week", 2);
+                setValue("is_weekend", 0);
+                setValue("is_international_flag", 0);
+                setValue("txns_per_account", 120);
+                setValue("txn_type", "ATM");
+                setValue("channel", "Branch");
+                setValue("account_type", "savings");
+                setValue("city", "Hyderabad");
+                setValue("state", "Telangana");
+                setValue("country", "India");
+                // hidden model fields:
+                setValue("age", 35);
+                setValue("avg_amount_account", 1800);
+                setValue("gender", "M");
+
+                document.getElementById("fraudForm").submit();
+            }
+
+            function runFraudDemo() {
+                setValue("amount", 95000);
+                setValue("balance", 12000);
+                setValue("hour", 2);
+                setValue("day_of_week", 6);
+                setValue("is_weekend", 1);
+                setValue("is_international_flag", 1);
+                setValue("txns_per_account", 8);
+                setValue("txn_type", "Online");
+                setValue("channel", "Mobile");
+                setValue("account_type", "savings");
+                setValue("city", "Mumbai");
+                setValue("state", "Maharashtra");
+                setValue("country", "India");
+                // hidden model fields:
+                setValue("age", 22);
+                setValue("avg_amount_account", 1500);
+                setValue("gender", "M");
+
+                document.getElementById("fraudForm").submit();
+            }
+        </script>
+    </body>
+    </html>
+    """
+
+FORM_PAGE = StaticPage(FORM_HTML, "text/html; charset=utf-8", "no-cache")
+
+
+# ---------- Result page ----------
+
+RESULT_CSS_TEXT = """
+body {
+    margin: 0;
+    padding: 0;
+    font-family: system-ui, sans-serif;
+    background: radial-gradient(circle at top left, #0f172a, #020617);
+    color: #e5e7eb;
+}
+.page {
+    padding: 30px;
+    display: flex;
+    justify-content: center;
+}
+.card {
+    width: 720px;
+    background: #020617;
+    border-radius: 18px;
+    padding: 28px;
+    box-shadow: 0 20px 40px rgba(0,0,0,0.6);
+}
+.bank {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+.logo {
+    display: flex;
+    align-items: center;
+    gap: 12px;
+}
+.circle {
+    width: 38px;
+    height: 38px;
+    border-radius: 100px;
+    background: linear-gradient(135deg, #0ea5e9, #22c55e);
+    color: white;
+    font-weight: 700;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+}
+.badge {
+    padding: 5px 12px;
+    border-radius: 12px;
+    border: 1px solid #4ade80;
+    background: #052e16;
+    color: #bbf7d0;
+    font-size: 12px;
+}
+.title {
+    font-size: 24px;
+    font-weight: 700;
+    margin-top: 20px;
+}
+.result-box {
+    margin-top: 20px;
+    border-radius: 12px;
+    padding: 18px;
+}
+.result-box.fraud {
+    background: #450a0a;
+    border: 1px solid #f87171;
+}
+.result-box.safe {
+    background: #022c22;
+    border: 1px solid #34d399;
+}
+a {
+    color: #38bdf8;
+    text-decoration: none;
+    font-size: 14px;
+}
+"""
+
+# content-hashed URL, so browsers can keep it for a year
+RESULT_CSS = StaticPage(RESULT_CSS_TEXT, "text/css; charset=utf-8", "public, max-age=31536000, immutable")
+RESULT_CSS_URL = f"/ui/static/result.css?v={RESULT_CSS.digest}"
+
+RESULT_HTML = """
+    <html>
+    <head>
+        <title>Banking Fraud Detection Result</title>
+        <link rel="stylesheet" href="{css_url}">
+    </head>
+
+    <body>
+        <div class="page">
+            <div class="card">
+
+                <div class="bank">
+                    <div class="logo">
+                        <div class="circle">ST</div>
+                        <div>
+                            <b>SecureTrust Bank</b><br>
+                            <span style="font-size:11px;color:#9ca3af;">Transaction Fraud Engine</span>
+                        </div>
+                    </div>
+                    <div class="badge">{badge}</div>
+                </div>
+
+                <div class="title">Banking Fraud Detection Result</div>
+
+                <div class="result-box {outcome}">
+                    <h3>PREDICTION: {label}</h3>
+                    <p><b>Fraud probability:</b> {probability}</p>
+                    <p><b>Reason:</b> {reason}</p>
+                </div>
+
+                <div style="margin-top:20px;">
+                    <a href="/ui">⟵ Test another transaction</a>
+                </div>
+
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def _compile_result(is_fraud):
+    """(head, middle, tail) bytes of the result page for one outcome."""
+    page = (RESULT_HTML
+            .replace("{css_url}", RESULT_CSS_URL)
+            .replace("{badge}", "High Risk" if is_fraud else "Low Risk")
+            .replace("{outcome}", "fraud" if is_fraud else "safe")
+            .replace("{label}", "FRAUD" if is_fraud else "NOT FRAUD"))
+    head, rest = page.split("{probability}")
+    middle, tail = rest.split("{reason}")
+    return head.encode(), middle.encode(), tail.encode()
+
+
+_RESULT_CHUNKS = {True: _compile_result(True), False: _compile_result(False)}
+
+
+@lru_cache(maxsize=1024)
+def _reason_bytes(reason):
+    # reason texts come from a small fixed set of rules
+    return escape(reason).encode()
+
+
+def render_result(is_fraud, probability, reason):
+    """Result page bytes for one scored transaction."""
+    head, middle, tail = _RESULT_CHUNKS[bool(is_fraud)]
+    return b"".join((head, f"{probability:.4f}".encode(), middle, _reason_bytes(reason), tail))
+
+
+if __name__ == "__main__":
+    import asyncio
+    import time
+
+    from fastapi import FastAPI, Request
+    from fastapi.responses import HTMLResponse
+
+    REASON = "high transaction amount compared to balance, international transaction"
+
+    # per-request rendering as /ui/predict did it before: an f-string page with the
+    # stylesheet inlined, formatted and encoded on every request
+    legacy_template = RESULT_HTML.replace(
+        '        <link rel="stylesheet" href="{css_url}">\n',
+        "        <style>" + RESULT_CSS_TEXT.replace("{", "{{").replace("}", "}}") + "        </style>\n",
+    ).replace(
+        '<div class="result-box {outcome}">',
+        '<div class="result-box" style="background: {background}; border: 1px solid {border};">',
+    )
+
+    def legacy_render():
+        return legacy_template.format(badge="High Risk", label="FRAUD", probability=f"{0.91234:.4f}",
+                                      reason=REASON, background="#450a0a", border="#f87171")
+
+    def render():
+        return render_result(True, 0.91234, REASON)
+
+    app = FastAPI()
+
+    @app.get("/old/ui", response_class=HTMLResponse)
+    def old_form():
+        return FORM_HTML
+
+    @app.get("/new/ui")
+    async def new_form(request: Request):
+        return FORM_PAGE.response(request)
+
+    @app.get("/old/result", response_class=HTMLResponse)
+    def old_result():
+        return legacy_render()
+
+    @app.get("/new/result")
+    def new_result():
+        return HTMLResponse(render())
+
+    async def call(path, headers):
+        # one request straight through the ASGI app (no HTTP client in the measurement)
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "root_path": "", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+                 "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+        return sent
+
+    async def bench():
+        first = await call("/new/ui", {"Accept-Encoding": "gzip"})
+        etag = dict(first[0]["headers"])[b"etag"].decode()
+        gzip_ui = {"Accept-Encoding": "gzip, deflate"}
+        cases = [
+            ("GET /ui      before", "/old/ui", gzip_ui),
+            ("GET /ui      after", "/new/ui", gzip_ui),
+            ("GET /ui      after, revalidated", "/new/ui", {**gzip_ui, "If-None-Match": etag}),
+            ("result page  before", "/old/result", {}),
+            ("result page  after", "/new/result", {}),
+        ]
+        for label, path, headers in cases:
+            for _ in range(100):
+                await call(path, headers)
+            n = 3000
+            start = time.perf_counter()
+            for _ in range(n):
+                await call(path, headers)
+            print(f"{label:<34} {n / (time.perf_counter() - start):>8,.0f} req/s")
+
+    print("form page bytes:", FORM_PAGE.sizes())
+    print("result page bytes: before", len(legacy_render().encode()), "after", len(render()),
+          "+ stylesheet (cached)", RESULT_CSS.sizes())
+    for label, fn in [("render before", legacy_render), ("render after", render)]:
+        n = 100000
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"{label:<34} {(time.perf_counter() - start) / n * 1e6:>8.2f} us")
+    asyncio.run(bench())
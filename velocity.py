@@ -0,0 +1,318 @@
+"""Per-account velocity features over sliding windows: bursts the static aggregates miss.
+
+For every account the engine keeps, per window, a ring of time buckets:
+
+    5m   5 buckets of 60 s        txn_count_5m,  amount_sum_5m
+    1h   6 buckets of 10 min      txn_count_1h,  amount_sum_1h
+    24h  6 buckets of 4 h         txn_count_24h, amount_sum_24h
+
+plus the time of its last transaction (seconds_since_last_txn).  An update
+clears the buckets that slid out of the window since the account was last
+seen (at most one ring's worth) and adds to the current one, so it is O(1)
+and memory is a fixed 106 bytes per account (uint16 counts, float32 sums,
+uint32 last-seen), all in NumPy arrays like feature_store.  A window spans
+its current bucket plus the previous ones: between (n-1)/n and all of its
+nominal length.  Counts saturate at 65535 per bucket.
+
+Features include the transaction being observed, like txns_per_account.
+Times are wall-clock seconds of naive datetimes, the convention of the
+DATETIME columns, so live scoring and the offline hook bucket identically.
+A transaction older than the account's last one is counted at that last time.
+
+With `max_accounts` set, a new account that would go over it first evicts
+the least recently seen tenth of the accounts (their slots are reused), so
+ids a client makes up cannot grow memory without bound.
+
+velocity_features() runs the same engine over a table of raw transactions
+in time order: the notebook (or train.py chunks, with one engine carried
+across them) gets exactly the values scoring would have produced.
+
+Run `python velocity.py` for the memory / throughput benchmark
+(10M accounts by default).
+"""
+import calendar
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# name -> (window seconds, buckets)
+WINDOWS = {"5m": (300, 5), "1h": (3600, 6), "24h": (86400, 6)}
+MAX_COUNT = np.iinfo(np.uint16).max
+
+# transactions that can still be inside the longest window, oldest first
+BOOTSTRAP_QUERY = """
+    SELECT account_id, txn_timestamp, amount
+    FROM transactions
+    WHERE txn_timestamp >= NOW() - INTERVAL 1 DAY
+    ORDER BY txn_timestamp
+"""
+
+
+def to_seconds(at=None):
+    """Naive datetime (default now) -> whole seconds on the engine's clock."""
+    return calendar.timegm((at or datetime.now()).timetuple())
+
+
+class VelocityEngine:
+    """Time-bucketed per-account counters with O(1) updates and fixed memory per account."""
+
+    def __init__(self, windows=WINDOWS, capacity=1024, max_accounts=None):
+        # (name, bucket seconds, buckets, first column) per window
+        self._spec = []
+        width = 0
+        for name, (seconds, buckets) in windows.items():
+            self._spec.append((name, seconds // buckets, buckets, width))
+            width += buckets
+        self._slot = {}
+        self._ids = []          # slot -> account_id, None once evicted
+        self._free = []         # evicted slots, reused first
+        self.max_accounts = max_accounts
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.counts = np.zeros((capacity, width), dtype=np.uint16)
+        self.sums = np.zeros((capacity, width), dtype=np.float32)
+        self.last_seen = np.zeros(capacity, dtype=np.uint32)    # 0 = never
+
+    def __len__(self):
+        return len(self._slot)
+
+    @property
+    def names(self):
+        return [f"{kind}_{name}" for name, *_ in self._spec for kind in ("txn_count", "amount_sum")] + [
+            "seconds_since_last_txn"
+        ]
+
+    def nbytes(self):
+        """Bytes held by the per-account arrays (the account_id index comes on top)."""
+        return self.counts.nbytes + self.sums.nbytes + self.last_seen.nbytes
+
+    # ---------- updates ----------
+
+    def observe(self, account_id, amount, at=None):
+        """Count one transaction and return the account's features including it."""
+        t = to_seconds(at) if at is None or isinstance(at, datetime) else int(at)
+        # rounded like the float32 arrays observe_many adds into
+        amount = float(np.float32(amount))
+        with self._lock:
+            if account_id not in self._slot:
+                self._make_room(1)
+            slot = self._slot_for(account_id)
+            last = int(self.last_seen[slot])
+            t = max(t, last)
+            # one row is a few dozen numbers: plain lists beat NumPy scalar indexing
+            counts, sums = self.counts[slot].tolist(), self.sums[slot].tolist()
+            for name, size, n, first in self._spec:
+                cur, prev = t // size, last // size
+                for bucket in range(max(prev + 1, cur - n + 1), cur + 1):
+                    counts[first + bucket % n] = 0
+                    sums[first + bucket % n] = 0.0
+                i = first + cur % n
+                counts[i] = min(counts[i] + 1, MAX_COUNT)
+                sums[i] += amount
+            self.counts[slot] = counts
+            self.sums[slot] = sums
+            sums = self.sums[slot].tolist()
+            self.last_seen[slot] = t
+        features = {}
+        for name, size, n, first in self._spec:
+            features["txn_count_" + name] = sum(counts[first:first + n])
+            features["amount_sum_" + name] = sum(sums[first:first + n])
+        features["seconds_since_last_txn"] = t - last if last else None
+        return features
+
+    def observe_many(self, account_ids, amounts, at=None):
+        """Vectorised observe for a batch, in time order; returns an (n, len(names)) array.
+
+        `at` is one time for the whole batch (default now) or one per row
+        (datetimes or engine seconds).  seconds_since_last_txn is NaN for an
+        account's first transaction.
+        """
+        n = len(account_ids)
+        amounts = np.asarray(amounts, dtype=np.float32)
+        if at is None or isinstance(at, datetime):
+            t = np.full(n, to_seconds(at), dtype=np.int64)
+        else:
+            t = np.asarray(at)
+            if np.issubdtype(t.dtype, np.datetime64):
+                t = t.astype("datetime64[s]").astype(np.int64)
+            t = t.astype(np.int64)
+        out = np.empty((n, len(self._spec) * 2 + 1), dtype=np.float64)
+        if not n:
+            return out
+        with self._lock:
+            if self.max_accounts is not None:
+                self._make_room(sum(a not in self._slot for a in set(account_ids)))
+            slots = np.fromiter((self._slot_for(a) for a in account_ids), dtype=np.intp, count=n)
+            # rows in time order; round r takes every account's r-th transaction,
+            # so no account appears twice in one vectorised step
+            order = np.argsort(t, kind="stable")
+            by_account = np.argsort(slots[order], kind="stable")
+            grouped = slots[order][by_account]
+            starts = np.r_[0, np.flatnonzero(grouped[1:] != grouped[:-1]) + 1]
+            rank = np.empty(n, dtype=np.intp)
+            rank[by_account] = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+            for r in range(int(rank.max()) + 1):
+                rows = order[rank == r]
+                out[rows] = self._apply(slots[rows], amounts[rows], t[rows])
+        return out
+
+    def _apply(self, slots, amounts, t):
+        """One step for distinct slots (caller holds the lock)."""
+        last = self.last_seen[slots].astype(np.int64)
+        t = np.maximum(t, last)
+        columns = []
+        for name, size, n, first in self._spec:
+            cur, prev = t // size, last // size
+            gap = np.minimum(cur - prev, n)
+            for j in range(1, n + 1):
+                stale = gap >= j
+                if not stale.any():
+                    break
+                col = first + (prev[stale] + j) % n
+                self.counts[slots[stale], col] = 0
+                self.sums[slots[stale], col] = 0
+            col = first + cur % n
+            self.counts[slots, col] = np.minimum(self.counts[slots, col].astype(np.int32) + 1, MAX_COUNT)
+            self.sums[slots, col] += amounts
+            columns.append(self.counts[slots, first:first + n].sum(axis=1))
+            columns.append(self.sums[slots, first:first + n].sum(axis=1, dtype=np.float64))
+        self.last_seen[slots] = t
+        columns.append(np.where(last > 0, t - last, np.nan))
+        return np.column_stack(columns)
+
+    # ---------- bootstrap ----------
+
+    @classmethod
+    def from_mysql(cls, conn, batch_size=100000, max_accounts=None):
+        """Warm the windows with the last 24 h of the transactions table."""
+        engine = cls(max_accounts=max_accounts)
+        cur = conn.cursor()
+        cur.execute(BOOTSTRAP_QUERY)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=["account_id", "txn_timestamp", "amount"])
+            velocity_features(frame, engine)
+        cur.close()
+        return engine
+
+    # ---------- internals (caller holds the lock) ----------
+
+    def _slot_for(self, account_id):
+        slot = self._slot.get(account_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._ids[slot] = account_id
+            else:
+                slot = len(self._ids)
+                if slot == len(self.last_seen):
+                    self._grow()
+                self._ids.append(account_id)
+            self._slot[account_id] = slot
+        return slot
+
+    def _make_room(self, new):
+        """Evict the least recently seen accounts so `new` more fit under max_accounts."""
+        if self.max_accounts is None or not self._slot or len(self._slot) + new <= self.max_accounts:
+            return
+        # a tenth at a time, so a full engine does not search on every new account
+        k = min(max(len(self._slot) + new - self.max_accounts, self.max_accounts // 10), len(self._slot))
+        seen = self.last_seen[:len(self._ids)].astype(np.int64)
+        seen[self._free] = np.iinfo(np.int64).max
+        victims = np.argpartition(seen, k - 1)[:k] if k < len(seen) else np.arange(len(seen))
+        for slot in victims.tolist():
+            del self._slot[self._ids[slot]]
+            self._ids[slot] = None
+        self.counts[victims] = 0
+        self.sums[victims] = 0
+        self.last_seen[victims] = 0
+        self._free.extend(victims.tolist())
+        self.evictions += len(victims)
+
+    def _grow(self):
+        size = len(self.last_seen) * 2
+        counts = np.zeros((size, self.counts.shape[1]), dtype=np.uint16)
+        sums = np.zeros((size, self.sums.shape[1]), dtype=np.float32)
+        counts[:len(self.counts)] = self.counts
+        sums[:len(self.sums)] = self.sums
+        self.counts, self.sums = counts, sums
+        last_seen = np.zeros(size, dtype=np.uint32)
+        last_seen[:len(self.last_seen)] = self.last_seen
+        self.last_seen = last_seen
+
+
+def velocity_features(df, engine=None, account_col="account_id", time_col="txn_timestamp", amount_col="amount"):
+    """Velocity columns for raw transaction rows, as live scoring would have computed them.
+
+    Rows are fed to `engine` (a fresh one by default) in timestamp order;
+    pass the same engine for consecutive chunks of a time-ordered table.
+    """
+    if engine is None:
+        engine = VelocityEngine()
+    at = pd.to_datetime(df[time_col]).to_numpy(dtype="datetime64[s]")
+    values = engine.observe_many(df[account_col].tolist(), pd.to_numeric(df[amount_col]).to_numpy(), at)
+    return pd.DataFrame(values, index=df.index, columns=engine.names)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import resource
+    import time
+
+    def rss_mb():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+    parser = argparse.ArgumentParser(description="Velocity engine memory / throughput benchmark.")
+    parser.add_argument("--accounts", type=int, default=10_000_000)
+    parser.add_argument("--events", type=int, default=10_000_000, help="streamed after every account is seen")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = to_seconds(datetime(2026, 1, 1))
+    start_rss = rss_mb()
+    engine = VelocityEngine(capacity=args.accounts)
+
+    # one transaction per account, spread over the first day
+    start = time.perf_counter()
+    step = 1_000_000
+    for lo in range(0, args.accounts, step):
+        ids = np.arange(lo, min(lo + step, args.accounts))
+        engine.observe_many(ids.tolist(), rng.lognormal(7.5, 1.3, len(ids)),
+                            base + np.sort(rng.integers(0, 86400, len(ids))))
+    fill_seconds = time.perf_counter() - start
+    total_rss = rss_mb() - start_rss
+
+    # a day of traffic: random accounts, 10% of events from 1000 bursting accounts
+    bursty = rng.integers(0, args.accounts, 1000)
+    t0 = base + 86400
+    start = time.perf_counter()
+    for lo in range(0, args.events, args.batch_size):
+        n = min(args.batch_size, args.events - lo)
+        ids = np.where(rng.random(n) < 0.1, rng.choice(bursty, n), rng.integers(0, args.accounts, n))
+        at = t0 + (lo + np.arange(n)) * 86400 // args.events
+        engine.observe_many(ids.tolist(), rng.lognormal(7.5, 1.3, n), at)
+    stream_seconds = time.perf_counter() - start
+
+    singles = 200_000
+    ids = rng.integers(0, args.accounts, singles).tolist()
+    start = time.perf_counter()
+    for i, account_id in enumerate(ids):
+        engine.observe(account_id, 1500.0, t0 + 86400 + i // 100)
+    single_us = (time.perf_counter() - start) / singles * 1e6
+
+    arrays = engine.nbytes()
+    print(f"{len(engine):,} accounts, windows {', '.join(WINDOWS)}")
+    print(f"  arrays                {arrays / 2**20:10.0f} MB  ({arrays / len(engine):.0f} bytes/account)")
+    print(f"  RSS incl. id index    {total_rss:10.0f} MB  ({total_rss * 2**20 / len(engine):.0f} bytes/account)")
+    print(f"  peak RSS              {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:10.0f} MB")
+    print(f"  first touch           {args.accounts / fill_seconds:10,.0f} events/s")
+    print(f"  stream (batches of {args.batch_size:,}) {args.events / stream_seconds:10,.0f} events/s")
+    print(f"  observe() one event   {single_us:10.2f} us")